@@ -6,11 +6,22 @@ from datetime import datetime
 import time
 import random
 
-from src.legal_bot import LegalAdvisorBot
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from src.jobs import JobManager, STAGE_CANCELLED
+from src.chat_render import RenderCache, new_message, render_message_html, visible_window
+from src.glossary_matcher import get_glossary_matcher
 from src.config import Config
 from src.logger import logger, log_user_interaction
+from src.metrics import start_metrics_server
+from src.profiling import profiling_allowed
+from src.scheduler import scheduling_scope
+from src.tracing import new_request_id, trace_request
 from src.utils import save_uploaded_file, clean_temporary_file
-from src.legal_glossary import get_legal_glossary_html, get_random_legal_term
+from src.warmup import get_bot as get_shared_bot, start_warm_up
+from src.legal_glossary import get_random_legal_term
+from src.glossary_store import get_glossary_store
 from src.exceptions import (
     APIKeyError, 
     PDFExtractionError, 
@@ -22,6 +33,13 @@ from src.exceptions import (
 # Set up logging for the Streamlit app
 logger.info("Starting Streamlit application")
 
+# Expose metrics for scraping (only the first script run in the process starts the server)
+if Config.METRICS_PORT:
+    start_metrics_server(Config.METRICS_PORT)
+
+# Warm up in the background if the launcher (python -m src.serve) has not already started it
+start_warm_up()
+
 # Function to load and encode images for use in CSS
 def get_base64_encoded_image(image_path):
     with open(image_path, "rb") as img_file:
@@ -81,6 +99,46 @@ if "session_id" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+# Background jobs (e.g. document analyses) submitted by this session
+if "pending_jobs" not in st.session_state:
+    st.session_state.pending_jobs = []
+
+# Document analyzed in this conversation, which later questions follow up on,
+# and the document each pending analysis or comparison job is about
+if "active_document" not in st.session_state:
+    st.session_state.active_document = None
+if "job_documents" not in st.session_state:
+    st.session_state.job_documents = {}
+
+# Matter workspace of this session, kept across conversations
+if "workspace_id" not in st.session_state:
+    st.session_state.workspace_id = None
+
+# Uploaded document being prepared in the background before it is analyzed
+if "prepared_upload" not in st.session_state:
+    st.session_state.prepared_upload = None
+
+# Per-session profiling, switched on with ?profile=1 in the URL in debug mode, or ?profile=<PROFILE_TOKEN>
+if "debug_profile" not in st.session_state:
+    profile_param = st.query_params.get("profile")
+    st.session_state.debug_profile = bool(profile_param) and profiling_allowed(
+        None if profile_param == "1" else profile_param
+    )
+
+# Rendered message fragments and the number of messages currently shown
+if "glossary_page" not in st.session_state:
+    st.session_state.glossary_page = 0
+
+if "render_cache" not in st.session_state:
+    # Replies are rendered with glossary terms highlighted; the matcher is built once per process
+    glossary_matcher = get_glossary_matcher()
+    st.session_state.render_cache = RenderCache(
+        max_size=Config.RENDER_CACHE_SIZE,
+        renderer=lambda message: render_message_html(message, annotate=glossary_matcher.annotate_html)
+    )
+if "messages_shown" not in st.session_state:
+    st.session_state.messages_shown = Config.CHAT_PAGE_SIZE
+
 # Load external CSS
 def load_css(css_file):
     with open(css_file, "r") as f:
@@ -154,31 +212,134 @@ def load_javascript():
 @st.cache_resource
 def get_bot():
     try:
-        return LegalAdvisorBot()
+        # The process-wide bot, usually already built by warm-up
+        return get_shared_bot()
     except Exception as e:
         logger.error(f"Failed to initialize the bot: {e}")
         st.error(f"Error initializing the bot: {handle_exception(e)}")
         st.stop()
 
-def chat_with_bot(bot, user_input):
+# Shown while a question is being answered
+LOADING_INDICATOR = """
+<div class="loading-indicator">
+    <div class="loading-dot"></div>
+    <div class="loading-dot"></div>
+    <div class="loading-dot"></div>
+</div>
+"""
+
+# App session ids mapped to the Streamlit session that owns them, to find abandoned jobs
+@st.cache_resource
+def get_session_owners():
+    return {}
+
+# Shared background worker pool for document analysis
+@st.cache_resource
+def get_job_manager():
+    manager = JobManager()
+    owners = get_session_owners()
+    
+    def session_ended(job):
+        """Whether the browser session that submitted a job has gone away."""
+        runtime_session = owners.get(job.session_id)
+        return runtime_session is not None and not Runtime.instance().is_active_session(runtime_session)
+    
+    def forget_ended_sessions():
+        """Drop the owners of closed tabs once their jobs have been cancelled, so the map stays bounded."""
+        runtime = Runtime.instance()
+        for session_id, runtime_session in list(owners.items()):
+            if not runtime.is_active_session(runtime_session):
+                owners.pop(session_id, None)
+    
+    # Cancel the jobs of closed tabs instead of letting them run to completion
+    manager.start_reaper(session_ended, after_reap=forget_ended_sessions)
+    return manager
+
+def wait_for_job(job_id, placeholder):
+    """
+    Wait for an interactive job while keeping the script run interruptible.
+    
+    Each placeholder update gives Streamlit a chance to stop this run when the
+    user sends a new message, starts a new conversation or closes the page;
+    the job is then cancelled instead of running on unobserved.
+    
+    Args:
+        job_id (str): Identifier of the job
+        placeholder: Empty Streamlit element updated while waiting
+        
+    Returns:
+        Job: The finished job
+    """
+    job = job_manager.get(job_id)
+    try:
+        while not job.finished:
+            placeholder.markdown(LOADING_INDICATOR, unsafe_allow_html=True)
+            time.sleep(0.1)
+        return job
+    finally:
+        if not job.finished:
+            job_manager.cancel(job_id, "superseded")
+
+def discard_prepared_upload():
+    """Stop preparing the previously uploaded document and forget its prepared text."""
+    prepared = st.session_state.prepared_upload
+    st.session_state.prepared_upload = None
+    job = job_manager.get(prepared["job_id"]) if prepared else None
+    if job is None:
+        return
+    # A preparation that finished before it could be cancelled still leaves a result behind
+    if not job_manager.cancel(job.id, "upload removed") and job.result:
+        bot.discard_prepared(job.result)
+
+def chat_with_bot(bot, user_input, request_id=None, profile=None, use_glossary=True, active_document=None):
     """
     Get a response from the bot, handling the case where get_response may not exist.
     
     Args:
         bot: The LegalAdvisorBot instance
         user_input (str): The user's input message
+        request_id (str, optional): Id used to trace the request
+        profile (bool, optional): Profile this request; None follows the configuration
+        use_glossary (bool): Allow definitional questions to be answered from the glossary
+        active_document (str, optional): Document analyzed earlier in this conversation, see st.session_state
         
     Returns:
         str: The bot's response
     """
-    logger.info(f"Getting bot response for input: {user_input[:50]}...")
+    logger.info(f"Getting bot response for input: {user_input[:50]}... (request {request_id})")
     
     # Check if get_response method exists, otherwise use process_query
     if hasattr(bot, 'get_response'):
-        return bot.get_response(user_input)
+        return bot.get_response(user_input, request_id=request_id, profile=profile, use_glossary=use_glossary,
+                                active_document=active_document)
     else:
         logger.warning("get_response method not found, falling back to process_query")
-        return bot.process_query(user_input)
+        return bot.process_query(user_input, request_id=request_id, profile=profile, active_document=active_document)
+
+def answer_message(bot, user_input, request_id=None, profile=None, active_document=None):
+    """
+    Get the assistant message for a user input.
+    
+    Definitional questions are answered from the glossary first; those
+    messages are marked so the chat can offer to ask the AI for more.
+    
+    Args:
+        bot: The LegalAdvisorBot instance
+        user_input (str): The user's input message
+        request_id (str, optional): Id used to trace the request
+        profile (bool, optional): Profile this request; None follows the configuration
+        active_document (str, optional): Document analyzed earlier in this conversation
+        
+    Returns:
+        dict: Assistant message for st.session_state.messages
+    """
+    if hasattr(bot, 'answer_from_glossary'):
+        glossary_answer = bot.answer_from_glossary(user_input, request_id=request_id)
+        if glossary_answer is not None:
+            return new_message("assistant", glossary_answer, source="glossary", query=user_input)
+    response = chat_with_bot(bot, user_input, request_id=request_id, profile=profile, use_glossary=False,
+                             active_document=active_document)
+    return new_message("assistant", response)
 
 # Main container - use a cleaner layout more like ChatGPT
 st.markdown('<div class="main-container">', unsafe_allow_html=True)
@@ -207,6 +368,10 @@ if len(st.session_state.get("messages", [])) == 0:
 
 # Initialize the bot
 bot = get_bot()
+job_manager = get_job_manager()
+get_session_owners()[st.session_state.session_id] = get_script_run_ctx().session_id
+# The bot is shared by every session; each conversation keeps its own memory
+bot.open_conversation(st.session_state.session_id)
 
 # Initialize chat history
 if "messages" not in st.session_state:
@@ -216,7 +381,7 @@ if "messages" not in st.session_state:
         "Welcome to Legal Advisor AI. I'm here to provide professional legal assistance with "
         "questions, documents, and research. How may I assist you with your legal matter today?"
     )
-    st.session_state.messages.append({"role": "assistant", "content": welcome_msg})
+    st.session_state.messages.append(new_message("assistant", welcome_msg))
     logger.info("Initialized new chat session with welcome message")
 
 # Sidebar with legal term glossary and options
@@ -289,6 +454,15 @@ with st.sidebar:
         
         # Clear messages in session state
         st.session_state.messages = []
+        # Still-running jobs belong to the previous conversation; stop them rather than discard their results
+        for job_id in st.session_state.pending_jobs:
+            job_manager.cancel(job_id, "new conversation")
+        st.session_state.pending_jobs = []
+        st.session_state.job_documents = {}
+        st.session_state.active_document = None
+        st.session_state.messages_shown = Config.CHAT_PAGE_SIZE
+        # Forget the previous conversation's memory; the new session ID opens a fresh one
+        bot.end_conversation(st.session_state.session_id)
         # Generate a new session ID
         st.session_state.session_id = f"chat_{int(datetime.now().timestamp())}_{random.randint(1000, 9999)}"
         # Force page refresh
@@ -316,49 +490,60 @@ with st.sidebar:
                 unsafe_allow_html=True
             )
             logger.warning(f"User attempted to upload a large file: {file_size_mb:.2f}MB")
+            discard_prepared_upload()
         else:
             st.markdown(
                 f'<div class="status-msg success-msg">Document uploaded: {uploaded_file.name} ({file_size_mb:.2f}MB)</div>',
                 unsafe_allow_html=True
             )
             logger.info(f"File uploaded: {uploaded_file.name}, Size: {file_size_mb:.2f}MB")
+            
+            # Start extracting the document as soon as it lands, so the analysis only waits for the model
+            prepared = st.session_state.prepared_upload
+            if prepared is None or prepared["file_id"] != uploaded_file.file_id:
+                discard_prepared_upload()
+                try:
+                    job_id = job_manager.submit_preparation(
+                        bot,
+                        save_uploaded_file(uploaded_file),
+                        session_id=st.session_state.session_id,
+                        document_name=uploaded_file.name
+                    )
+                    st.session_state.prepared_upload = {"file_id": uploaded_file.file_id, "job_id": job_id}
+                except Exception as e:
+                    # The analysis prepares the document itself
+                    logger.warning(f"Could not start preparing {uploaded_file.name}: {e}")
         
             analyze_col1, analyze_col2 = st.columns([3, 1])
+            with analyze_col2:
+                force_reanalyze = st.checkbox(
+                    "Fresh",
+                    key="force_reanalyze",
+                    help="Re-analyze the document instead of reusing a previous analysis of the same file"
+                )
             with analyze_col1:
                 if st.button("Analyze Document", use_container_width=True):
                     try:
                         # Add a user message indicating document analysis
                         user_msg = f"Please analyze the content of this legal document: {uploaded_file.name}"
-                        st.session_state.messages.append({"role": "user", "content": user_msg})
+                        st.session_state.messages.append(new_message("user", user_msg))
                         
-                        # Save the uploaded file temporarily
+                        # Save the uploaded file temporarily; the job removes it when done
                         pdf_path = save_uploaded_file(uploaded_file)
                         
-                        with st.spinner(""):
-                            # Show professional loading indicator
-                            st.markdown("""
-                            <div class="loading-indicator">
-                                <div class="loading-dot"></div>
-                                <div class="loading-dot"></div>
-                                <div class="loading-dot"></div>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            # Get response from bot
-                            try:
-                                response = bot.analyze_document(pdf_path)
-                                st.session_state.messages.append({"role": "assistant", "content": response})
-                                
-                                # Clean up temporary file
-                                clean_temporary_file(pdf_path)
-                                
-                            except Exception as e:
-                                error_msg = handle_exception(e)
-                                st.session_state.messages.append({"role": "assistant", "content": f"❌ {error_msg}"})
-                                logger.error(f"Document analysis error: {e}")
-                                # Clean up temporary file if it exists
-                                if 'pdf_path' in locals():
-                                    clean_temporary_file(pdf_path)
+                        # Run the analysis in the background so the session stays responsive;
+                        # the job inherits the request id bound here
+                        with trace_request("analyze_request", session_id=st.session_state.session_id):
+                            job_id = job_manager.submit_analysis(
+                                bot,
+                                pdf_path,
+                                session_id=st.session_state.session_id,
+                                document_name=uploaded_file.name,
+                                force=force_reanalyze,
+                                profile=st.session_state.debug_profile or None
+                            )
+                        st.session_state.pending_jobs.append(job_id)
+                        st.session_state.job_documents[job_id] = uploaded_file.name
                         
                         # Re-run the app to show the new messages
                         st.rerun()
@@ -366,6 +551,102 @@ with st.sidebar:
                     except Exception as e:
                         st.error(f"Error: {handle_exception(e)}")
                         logger.error(f"Error in document analysis flow: {e}")
+                        # Clean up temporary file if it exists
+                        if 'pdf_path' in locals():
+                            clean_temporary_file(pdf_path)
+    elif st.session_state.prepared_upload is not None:
+        # The upload was removed before (or after) its analysis
+        discard_prepared_upload()
+    
+    # Redline review: only the clauses that changed between two versions go to the model
+    with st.expander("Compare Versions"):
+        old_file = st.file_uploader("Earlier version (PDF)", type=Config.ACCEPTED_FILE_TYPES, key="compare_old")
+        new_file = st.file_uploader("Later version (PDF)", type=Config.ACCEPTED_FILE_TYPES, key="compare_new")
+        if old_file is not None and new_file is not None:
+            too_large = [f.name for f in (old_file, new_file) if f.size / (1024 * 1024) > Config.MAX_PDF_SIZE_MB]
+            if too_large:
+                st.markdown(
+                    f'<div class="status-msg error-msg">{", ".join(too_large)} exceeds the maximum size of {Config.MAX_PDF_SIZE_MB}MB.</div>',
+                    unsafe_allow_html=True
+                )
+            elif st.button("Compare Documents", use_container_width=True):
+                try:
+                    user_msg = f"Please review the changes from {old_file.name} to {new_file.name}"
+                    st.session_state.messages.append(new_message("user", user_msg))
+                    
+                    old_path = save_uploaded_file(old_file)
+                    new_path = save_uploaded_file(new_file)
+                    with trace_request("compare_request", session_id=st.session_state.session_id):
+                        job_id = job_manager.submit_comparison(
+                            bot,
+                            old_path,
+                            new_path,
+                            session_id=st.session_state.session_id,
+                            document_names=[old_file.name, new_file.name],
+                            profile=st.session_state.debug_profile or None
+                        )
+                    st.session_state.pending_jobs.append(job_id)
+                    st.session_state.job_documents[job_id] = new_file.name
+                    st.rerun()
+                
+                except Exception as e:
+                    st.error(f"Error: {handle_exception(e)}")
+                    logger.error(f"Error in document comparison flow: {e}")
+                    for path in (locals().get("old_path"), locals().get("new_path")):
+                        if path:
+                            clean_temporary_file(path)
+    
+    # Matter workspace: questions are answered from passages across all of its documents
+    with st.expander("Matter Workspace"):
+        workspace = None
+        if st.session_state.workspace_id:
+            try:
+                workspace = bot.get_workspace(st.session_state.workspace_id)
+            except KeyError:
+                # The process restarted; the index is rebuilt by adding the documents again
+                st.session_state.workspace_id = None
+        
+        workspace_files = st.file_uploader(
+            "Matter documents (PDF)",
+            type=Config.ACCEPTED_FILE_TYPES,
+            accept_multiple_files=True,
+            key="workspace_files",
+            help="Agreements, amendments and schedules of one matter, searched together"
+        )
+        if workspace_files and st.button("Add to Workspace", use_container_width=True):
+            if workspace is None:
+                workspace = bot.create_workspace(f"Matter {st.session_state.session_id}")
+                st.session_state.workspace_id = workspace.id
+            for workspace_file in workspace_files:
+                if workspace_file.size / (1024 * 1024) > Config.MAX_PDF_SIZE_MB:
+                    st.error(f"{workspace_file.name} exceeds the maximum size of {Config.MAX_PDF_SIZE_MB}MB.")
+                    continue
+                try:
+                    pdf_path = save_uploaded_file(workspace_file)
+                    with trace_request("workspace_request", session_id=st.session_state.session_id):
+                        job_id = job_manager.submit_workspace_document(
+                            bot,
+                            workspace.id,
+                            pdf_path,
+                            session_id=st.session_state.session_id,
+                            document_name=workspace_file.name
+                        )
+                    st.session_state.pending_jobs.append(job_id)
+                except Exception as e:
+                    st.error(f"Error: {handle_exception(e)}")
+                    logger.error(f"Error adding {workspace_file.name} to the workspace: {e}")
+                    if 'pdf_path' in locals():
+                        clean_temporary_file(pdf_path)
+            st.rerun()
+        
+        if workspace is not None and workspace.documents:
+            st.markdown("\n".join(f"- {document.name} ({document.pages} pages)"
+                                   for document in workspace.documents.values()))
+            st.checkbox(
+                "Ask the workspace",
+                key="ask_workspace",
+                help="Answer chat questions from all workspace documents, citing document and page"
+            )
     
     # Add a separator
     st.markdown("<div class='sidebar-separator'></div>", unsafe_allow_html=True)
@@ -385,27 +666,49 @@ with st.sidebar:
         unsafe_allow_html=True
     )
     
+    # Searchable, paginated glossary; pages are rendered once per process by the store
+    with st.expander("Browse Legal Glossary"):
+        glossary_store = get_glossary_store()
+        glossary_query = st.text_input("Search terms", key="glossary_query", placeholder="e.g. afidavit")
+        if glossary_query.strip():
+            st.markdown(glossary_store.search_html(glossary_query), unsafe_allow_html=True)
+        else:
+            page_count = glossary_store.page_count(Config.GLOSSARY_PAGE_SIZE)
+            st.session_state.glossary_page = min(st.session_state.glossary_page, page_count - 1)
+            st.markdown(
+                glossary_store.page_html(st.session_state.glossary_page, Config.GLOSSARY_PAGE_SIZE),
+                unsafe_allow_html=True
+            )
+            if page_count > 1:
+                prev_col, page_col, next_col = st.columns([1, 2, 1])
+                with prev_col:
+                    if st.button("‹", key="glossary_prev", disabled=st.session_state.glossary_page == 0):
+                        st.session_state.glossary_page -= 1
+                        st.rerun()
+                with page_col:
+                    st.caption(f"Page {st.session_state.glossary_page + 1} of {page_count}")
+                with next_col:
+                    if st.button("›", key="glossary_next", disabled=st.session_state.glossary_page >= page_count - 1):
+                        st.session_state.glossary_page += 1
+                        st.rerun()
+    
     # Example questions to demonstrate functionality
     st.markdown("<h3>EXAMPLES</h3>", unsafe_allow_html=True)
     
-    # Add some example questions with better button styling
-    examples = [
-        "What are my rights if I'm facing wrongful termination?",
-        "Can you explain the process of filing for bankruptcy?"
-    ]
-    
-    for i, example in enumerate(examples):
+    # Example questions, answered from the answers precomputed during warm-up
+    for i, example in enumerate(Config.EXAMPLE_QUESTIONS):
         if st.button(example, key=f"example_{i}"):
             if example not in [msg["content"] for msg in st.session_state.messages if msg["role"] == "user"]:
                 # Add the example as a user message
-                st.session_state.messages.append({"role": "user", "content": example})
+                st.session_state.messages.append(new_message("user", example))
                 
-                with st.spinner(""):
-                    # Get response from bot
-                    response = bot.get_response(example)
-                    
-                    # Add assistant response
-                    st.session_state.messages.append({"role": "assistant", "content": response})
+                with st.spinner(""), scheduling_scope(session_id=st.session_state.session_id):
+                    # Get response from bot and add it to the chat
+                    st.session_state.messages.append(new_message("assistant", bot.answer_example(
+                        example,
+                        request_id=new_request_id(),
+                        profile=st.session_state.debug_profile or None
+                    )))
                 
                 # Re-run the app to show the new messages
                 st.rerun()
@@ -413,29 +716,78 @@ with st.sidebar:
 # Display chat messages
 st.markdown('<div class="chat-container">', unsafe_allow_html=True)
 
-# Function to display assistant response with typing effect
-def display_assistant_response(response):
-    # Add data-new-message attribute for JS to apply typing effect
-    st.markdown(
-        f'<div class="bot-message" data-new-message="true">{response}</div>',
-        unsafe_allow_html=True
-    )
-    log_user_interaction("assistant", response[:100] + "..." if len(response) > 100 else response)
+# Function to display a chat message, reusing its cached HTML fragment
+def display_message(message):
+    fragment, is_new = st.session_state.render_cache.get(message)
+    st.markdown(fragment, unsafe_allow_html=True)
+    # Only log messages the first time they are rendered, not on every rerun
+    if is_new:
+        content = message["content"]
+        log_user_interaction(message["role"], content[:100] + "..." if len(content) > 100 else content)
 
-# Function to display user message
-def display_user_message(message):
-    st.markdown(
-        f'<div class="user-message">{message}</div>',
-        unsafe_allow_html=True
-    )
-    log_user_interaction("user", message[:100] + "..." if len(message) > 100 else message)
+# Display the most recent window of the chat history from session state
+hidden_count, visible_messages = visible_window(
+    st.session_state.messages,
+    st.session_state.messages_shown
+)
+if hidden_count > 0:
+    if st.button(f"Load earlier messages ({hidden_count} hidden)", key="load_earlier"):
+        st.session_state.messages_shown += Config.CHAT_PAGE_SIZE
+        st.rerun()
 
-# Display chat history from session state
-for message in st.session_state.messages:
-    if message["role"] == "assistant":
-        display_assistant_response(message["content"])
-    else:
-        display_user_message(message["content"])
+for message in visible_messages:
+    display_message(message)
+    
+    # Glossary answers can be expanded into a full model answer once
+    if message.get("source") == "glossary" and not message.get("expanded"):
+        if st.button("Ask the AI for more", key=f"more_{message['id']}"):
+            with st.spinner(""), scheduling_scope(session_id=st.session_state.session_id):
+                response = chat_with_bot(
+                    bot,
+                    message["query"],
+                    request_id=new_request_id(),
+                    profile=st.session_state.debug_profile or None,
+                    use_glossary=False,
+                    active_document=st.session_state.active_document
+                )
+            message["expanded"] = True
+            st.session_state.messages.append(new_message("assistant", response))
+            st.rerun()
+
+# Show progress of background jobs and attach finished results to the chat
+if st.session_state.pending_jobs:
+    still_pending = []
+    for job_id in st.session_state.pending_jobs:
+        job = job_manager.get(job_id)
+        if job is None:
+            # The job expired or the process restarted; nothing left to attach
+            logger.warning(f"Background job {job_id} is no longer available")
+            st.session_state.job_documents.pop(job_id, None)
+            continue
+        
+        if job.stage == STAGE_CANCELLED:
+            st.session_state.job_documents.pop(job_id, None)
+            continue
+        if job.finished:
+            document_name = st.session_state.job_documents.pop(job_id, None)
+            if document_name and job.error is None:
+                st.session_state.active_document = document_name
+            content = job.result if job.error is None else f"❌ {job.error}"
+            message = new_message("assistant", content)
+            st.session_state.messages.append(message)
+            display_message(message)
+        else:
+            still_pending.append(job_id)
+            progress_col, cancel_col = st.columns([5, 1])
+            with progress_col:
+                st.progress(int(job.progress), text=f"{job.label}... {int(job.progress)}%")
+            with cancel_col:
+                if st.button("Cancel", key=f"cancel_{job_id}", disabled=job.cancelled):
+                    job_manager.cancel(job_id, "cancelled by user")
+                    st.rerun()
+            if job.preview:
+                st.markdown(job.preview)
+    st.session_state.pending_jobs = still_pending
 
 # Close chat container
 st.markdown('</div>', unsafe_allow_html=True)
@@ -446,35 +798,48 @@ user_input = st.chat_input("Ask a legal question...")
 if user_input:
     # Capture current time for response timing
     start_time = time.time()
+    request_id = new_request_id()
     
     # Add user message to chat history
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    user_message = new_message("user", user_input)
+    st.session_state.messages.append(user_message)
     
     # Display user message
-    display_user_message(user_input)
+    display_message(user_message)
     
     # Show professional loading indicator
     with st.spinner(""):
-        st.markdown("""
-        <div class="loading-indicator">
-            <div class="loading-dot"></div>
-            <div class="loading-dot"></div>
-            <div class="loading-dot"></div>
-        </div>
-        """, unsafe_allow_html=True)
+        loading = st.empty()
         
-        # Get response from bot
-        response = chat_with_bot(bot, user_input)
+        # Get response from bot, from the workspace documents when the user chose to ask them
+        profile = st.session_state.debug_profile or None
+        if st.session_state.get("ask_workspace") and st.session_state.workspace_id:
+            workspace_id = st.session_state.workspace_id
+            ask = lambda progress_callback=None: new_message("assistant", bot.query_workspace(
+                workspace_id, user_input, request_id=request_id, profile=profile, raise_errors=True
+            ))
+        else:
+            active_document = st.session_state.active_document
+            ask = lambda progress_callback=None: answer_message(
+                bot, user_input, request_id=request_id, profile=profile, active_document=active_document
+            )
+        
+        # Answer on a worker so a newer message or a new conversation can cancel this one
+        job_id = job_manager.submit(ask, session_id=st.session_state.session_id,
+                                    description="Answer question", interactive=True)
+        job = wait_for_job(job_id, loading)
+        loading.empty()
+        assistant_message = job.result if job.error is None else new_message("assistant", f"❌ {job.error}")
         
         # Calculate response time
         response_time = time.time() - start_time
-        logger.info(f"Bot response generated in {response_time:.2f} seconds")
+        logger.info(f"Bot response generated in {response_time:.2f} seconds (request {request_id})")
     
     # Add assistant response to chat history
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    st.session_state.messages.append(assistant_message)
     
     # Display assistant response
-    display_assistant_response(response)
+    display_message(assistant_message)
     
     # Re-run to clear the input field
     st.rerun()
@@ -501,3 +866,8 @@ st.markdown("""
 
 # Load JavaScript last
 load_javascript()
+
+# Poll background jobs until they finish
+if st.session_state.pending_jobs:
+    time.sleep(Config.JOB_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,83 @@
+"""
+Benchmark of chat rerun time against conversation length.
+
+Compares redrawing the full conversation on every rerun (the previous
+behaviour) with windowed rendering backed by the per-message fragment cache.
+The Streamlit call is approximated by encoding each fragment, which is the
+per-message serialization cost st.markdown pays before sending a delta.
+
+Usage:
+    python -m benchmarks.bench_chat_render
+"""
+
+import argparse
+import time
+
+from src.chat_render import RenderCache, new_message, render_message_html, visible_window
+
+SAMPLE_ANSWER = (
+    "**Summary:** The termination clause allows either party to end the agreement with 30 days notice.\n\n"
+    "**Key Clauses and Risks:**\n- Indemnity obligations survive termination.\n"
+    "- Liability is capped at fees paid in the previous 12 months.\n\n"
+    "**Expert Legal Advice:** Review the notice requirements carefully and keep written records. "
+) * 8
+
+
+def build_conversation(turns):
+    """Build a conversation with the given number of question/answer turns."""
+    messages = []
+    for i in range(turns):
+        messages.append(new_message("user", f"Question {i}: what does clause {i} of my lease mean?"))
+        messages.append(new_message("assistant", SAMPLE_ANSWER))
+    return messages
+
+
+def emit(fragment):
+    """Stand-in for st.markdown: serialize the fragment for sending to the browser."""
+    return len(fragment.encode("utf-8"))
+
+
+def rerun_full(messages):
+    """Previous behaviour: render and emit every message on every rerun."""
+    for message in messages:
+        emit(render_message_html(message))
+
+
+def rerun_windowed(messages, cache, window):
+    """New behaviour: emit only the visible window, reusing cached fragments."""
+    _, visible = visible_window(messages, window)
+    for message in visible:
+        fragment, _ = cache.get(message)
+        emit(fragment)
+
+
+def time_reruns(fn, reruns):
+    start = time.perf_counter()
+    for _ in range(reruns):
+        fn()
+    return (time.perf_counter() - start) / reruns * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 100, 250, 500, 1000],
+                        help="Conversation lengths (turns) to benchmark")
+    parser.add_argument("--window", type=int, default=20, help="Number of messages shown")
+    parser.add_argument("--reruns", type=int, default=50, help="Reruns timed per length")
+    args = parser.parse_args()
+
+    print(f"{'turns':>8} {'messages':>9} {'full (ms)':>11} {'windowed (ms)':>14} {'speedup':>8}")
+    for turns in args.lengths:
+        messages = build_conversation(turns)
+        cache = RenderCache(max_size=len(messages) + 1)
+        # Warm the cache as the first rerun after each message would
+        rerun_windowed(messages, cache, args.window)
+
+        full_ms = time_reruns(lambda: rerun_full(messages), args.reruns)
+        windowed_ms = time_reruns(lambda: rerun_windowed(messages, cache, args.window), args.reruns)
+        speedup = full_ms / windowed_ms if windowed_ms else float("inf")
+        print(f"{turns:>8} {len(messages):>9} {full_ms:>11.3f} {windowed_ms:>14.3f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark of the clause classifier against document length.
+
+Generates contracts of numbered sections, about 3000 characters per page,
+with a random mix of clause types, and reports the time to classify them in
+one pass, the throughput, and the time to select the prompt text. The
+alternative of one scan per clause type plus a separate heading scan is timed
+alongside. The share of generated clause sections that were tagged with
+their type is printed as a sanity check.
+
+Usage:
+    python -m benchmarks.bench_clause_classifier
+    python -m benchmarks.bench_clause_classifier --pages 100 1000 5000
+"""
+
+import argparse
+import random
+import re
+import time
+
+from src.clause_classifier import CLAUSE_TYPES, classify_clauses
+
+SECTION_BODIES = {
+    "indemnity": ("Indemnity", "The Supplier shall indemnify and hold harmless the Client against all losses."),
+    "liability": ("Limitation of Liability", "Aggregate liability is capped at the fees paid in the prior year."),
+    "termination": ("Termination", "Either party may terminate this Agreement on thirty days written notice."),
+    "arbitration": ("Dispute Resolution", "Any dispute shall be referred to arbitration in London."),
+    "jurisdiction": ("Governing Law", "This Agreement is subject to the governing law of England and Wales."),
+    "confidentiality": ("Confidentiality", "Each party shall keep the other's confidential information secret."),
+    "payment": ("Payment", "The Client shall pay each invoice within thirty days of receipt."),
+    "force_majeure": ("Force Majeure", "Neither party is liable for delay caused by force majeure events."),
+}
+FILLER = ("The parties acknowledge that the obligations in this section apply for the duration of the services "
+          "and survive completion to the extent stated. Notices shall be given in writing to the addresses above. ")
+
+PAGE_CHARS = 3000
+
+
+def make_document(pages, rng):
+    """Return (text, page_starts, section types) for a generated contract."""
+    parts = ["MASTER SERVICES AGREEMENT\nThis Agreement is made between the Supplier and the Client.\n"]
+    types = []
+    length = len(parts[0])
+    number = 1
+    while length < pages * PAGE_CHARS:
+        clause_type = rng.choice(list(SECTION_BODIES))
+        heading, body = SECTION_BODIES[clause_type]
+        section = f"{number}. {heading}\n{body} {FILLER * rng.randint(1, 6)}\n"
+        parts.append(section)
+        types.append(clause_type)
+        length += len(section)
+        number += 1
+    text = "".join(parts)
+    page_starts = [(offset, i + 1) for i, offset in enumerate(range(0, len(text), PAGE_CHARS))]
+    return text, page_starts, types
+
+
+_HEADING_LINE = re.compile(r"^[ \t]*(?:\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]|[A-Z][A-Z0-9 ,;&'/-]{3,60}[ \t]*$)", re.MULTILINE)
+_PER_TYPE = [(name, re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)) for name, _, pattern in CLAUSE_TYPES]
+
+
+def per_type_scan(text):
+    """Alternative approach: one scan for headings and one per clause type."""
+    starts = [match.start() for match in _HEADING_LINE.finditer(text)]
+    hits = []
+    for name, pattern in _PER_TYPE:
+        hits.extend((match.start(), name) for match in pattern.finditer(text))
+    hits.sort()
+    return starts, hits
+
+
+def timed_ms(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000], help="Document lengths in pages")
+    parser.add_argument("--max-chars", type=int, default=120000, help="Prompt budget for section selection")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per measurement; the best is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'MB':>6} {'classify (ms)':>14} {'MB/s':>7} {'per-type scan (ms)':>19} "
+          f"{'select (ms)':>12} {'sections':>9} {'recall':>7}")
+    for pages in args.pages:
+        rng = random.Random(args.seed)
+        text, page_starts, types = make_document(pages, rng)
+        size_mb = len(text) / 2 ** 20
+
+        classify_ms = timed_ms(lambda: classify_clauses(text, page_starts), args.repeats)
+        scan_ms = timed_ms(lambda: per_type_scan(text), args.repeats)
+        document = classify_clauses(text, page_starts)
+        select_ms = timed_ms(lambda: document.select_text(args.max_chars), args.repeats)
+
+        # Sections after the title, in order, should carry the type they were generated with
+        tagged = [set(section.scores) for section in document.sections[1:]]
+        found = sum(1 for expected, section_types in zip(types, tagged)
+                    if document.sections and expected in section_types)
+
+        print(f"{pages:>6} {size_mb:>6.1f} {classify_ms:>14.1f} {size_mb / (classify_ms / 1000):>7.1f} "
+              f"{scan_ms:>19.1f} {select_ms:>12.2f} {len(document.sections):>9} {found / len(types):>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark of the extracted-document store.
+
+Stores generated documents of about 3000 characters per page and reports the
+compressed size on disk, the time to store a document, the latency of
+reading a random page and a random clause-sized span, and the memory held by
+the process after reading pages of every document, compared with keeping
+each document's text as one Python string.
+
+Usage:
+    python -m benchmarks.bench_document_store
+    python -m benchmarks.bench_document_store --documents 500 --pages 200
+"""
+
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from src.document_store import DocumentStore
+
+WORDS = ("agreement party tenant landlord notice termination indemnify liability clause payment rent deposit "
+         "jurisdiction arbitration breach remedy warranty obligation confidential schedule period written").split()
+PAGE_CHARS = 3000
+
+
+def make_pages(pages, rng):
+    result = []
+    for number in range(1, pages + 1):
+        words = []
+        length = 0
+        while length < PAGE_CHARS:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        result.append(f"{number}. " + " ".join(words))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200, help="Documents stored")
+    parser.add_argument("--pages", type=int, default=100, help="Pages per document")
+    parser.add_argument("--reads", type=int, default=5000, help="Random reads timed")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="legal-bot-docstore-") as directory:
+        store = DocumentStore(directory, max_documents=args.documents, max_open=64)
+        documents = {f"{i:064x}": make_pages(args.pages, rng) for i in range(args.documents)}
+        raw_bytes = sum(len(page) for pages in documents.values() for page in pages)
+
+        start = time.perf_counter()
+        for document_hash, pages in documents.items():
+            store.put(document_hash, pages)
+        put_ms = (time.perf_counter() - start) * 1000 / args.documents
+        disk_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        hashes = list(documents)
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            store.get_page(rng.choice(hashes), rng.randint(1, args.pages))
+        page_us = (time.perf_counter() - start) / args.reads * 1e6
+
+        total_chars = store.page_starts(hashes[0])[-1][0] + PAGE_CHARS
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            offset = rng.randrange(total_chars - 2000)
+            store.get_text(rng.choice(hashes), offset, offset + 2000)
+        span_us = (time.perf_counter() - start) / args.reads * 1e6
+
+        # Memory held after touching every document, versus one string per document
+        store.close()
+        gc.collect()
+        tracemalloc.start()
+        for document_hash in hashes:
+            store.get_page(document_hash, 1)
+        store_kib = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+        del documents
+        gc.collect()
+        tracemalloc.start()
+        held = [" ".join(make_pages(args.pages, rng)) for _ in range(min(args.documents, 50))]
+        strings_kib = tracemalloc.get_traced_memory()[0] / 1024 * args.documents / len(held)
+        tracemalloc.stop()
+        del held
+        store.close()
+
+    print(f"{args.documents} documents x {args.pages} pages, {raw_bytes / 2 ** 20:.1f} MiB of text")
+    print(f"  on disk:                 {disk_bytes / 2 ** 20:>10.1f} MiB ({disk_bytes / raw_bytes:.1%} of text)")
+    print(f"  store one document:      {put_ms:>10.2f} ms")
+    print(f"  read random page:        {page_us:>10.1f} us")
+    print(f"  read random 2000 chars:  {span_us:>10.1f} us")
+    print(f"  heap after reads (store):{store_kib:>10.1f} KiB")
+    print(f"  heap as str per document:{strings_kib:>10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
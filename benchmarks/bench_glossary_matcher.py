@@ -0,0 +1,97 @@
+"""
+Benchmark of glossary term matching against glossary size.
+
+Compares the Aho-Corasick matcher, which scans the text once regardless of
+the number of terms, with the naive approach of running one word-bounded,
+case-insensitive regular expression per term. A synthetic glossary is built
+from the real glossary terms padded with generated terms, and the text is a
+legal-style document that mentions a sample of them.
+
+Usage:
+    python -m benchmarks.bench_glossary_matcher
+"""
+
+import argparse
+import random
+import re
+import time
+
+from src.glossary_matcher import GlossaryMatcher
+from src.legal_glossary import LEGAL_GLOSSARY
+
+WORDS = (
+    "agreement party notice clause tenant landlord payment obligation liability term "
+    "premises lease default remedy breach consent assignment schedule warranty period"
+).split()
+
+
+def build_glossary(size, rng):
+    """Build a glossary of the given size from the real terms plus generated ones."""
+    glossary = dict(LEGAL_GLOSSARY)
+    while len(glossary) < size:
+        term = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title() + f" {len(glossary)}"
+        glossary[term] = f"Definition of {term}."
+    return dict(list(glossary.items())[:size])
+
+
+def build_text(glossary, length, rng):
+    """Build a document of roughly length characters mentioning some glossary terms."""
+    terms = list(glossary)
+    pieces = []
+    size = 0
+    while size < length:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(12))
+        if rng.random() < 0.3:
+            sentence += " " + rng.choice(terms).lower()
+        pieces.append(sentence.capitalize() + ".")
+        size += len(pieces[-1]) + 1
+    return " ".join(pieces)
+
+
+def naive_matches(patterns, text):
+    """Previous approach: one regular expression search per term."""
+    found = []
+    for term, pattern in patterns:
+        for match in pattern.finditer(text):
+            found.append((match.start(), match.end(), term))
+    return found
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 100, 1000, 5000],
+                        help="Glossary sizes (terms) to benchmark")
+    parser.add_argument("--text-length", type=int, default=100_000, help="Characters of text to scan")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per measurement, best is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    print(f"{'terms':>7} {'build (ms)':>11} {'aho-corasick (ms)':>18} {'regex (ms)':>11} {'speedup':>8} {'matches':>8}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        glossary = build_glossary(size, rng)
+        text = build_text(glossary, args.text_length, rng)
+
+        start = time.perf_counter()
+        matcher = GlossaryMatcher(glossary)
+        build_ms = (time.perf_counter() - start) * 1000
+        patterns = [(term, re.compile(r"\b" + re.escape(term) + r"\b", re.IGNORECASE)) for term in glossary]
+
+        matcher_ms = best_of(lambda: matcher.find_matches(text), args.repeats)
+        naive_ms = best_of(lambda: naive_matches(patterns, text), args.repeats)
+        speedup = naive_ms / matcher_ms if matcher_ms else float("inf")
+        matches = len(matcher.find_matches(text))
+        print(f"{len(glossary):>7} {build_ms:>11.2f} {matcher_ms:>18.2f} {naive_ms:>11.2f} {speedup:>7.1f}x {matches:>8}")
+
+
+if __name__ == "__main__":
+    main()
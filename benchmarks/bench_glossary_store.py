@@ -0,0 +1,123 @@
+"""
+Benchmark of the glossary store against glossary size.
+
+Writes a synthetic tab-separated term file, loads it into a GlossaryStore,
+and reports load time plus per-query latency of exact lookup, prefix
+autocomplete and typo-tolerant lookup, and the cost of rendering a sidebar
+page cold and from the page cache. The previous approaches (a linear scan for
+prefixes and rebuilding the full HTML by concatenation) are timed alongside.
+
+Usage:
+    python -m benchmarks.bench_glossary_store
+"""
+
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from src.glossary_store import GlossaryStore, load_term_file
+
+# Consonant-vowel(-consonant) syllables, so generated terms share prefixes the way real vocabulary does
+SYLLABLES = [c + v + e for c in "bcdfghjlmnprstv" for v in "aeiou" for e in ("", "n", "r", "s", "t")]
+
+
+def make_term(rng):
+    words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+    return " ".join(word.capitalize() for word in words)
+
+
+def write_term_file(path, size, rng):
+    """Write a term file with size distinct terms."""
+    terms = set()
+    with open(path, "w", encoding="utf-8") as term_file:
+        while len(terms) < size:
+            term = make_term(rng)
+            if term.lower() in terms:
+                continue
+            terms.add(term.lower())
+            term_file.write(f"{term}\tDefinition of {term}, a term used in legal documents.\n")
+
+
+def add_typo(word, rng):
+    """Apply one random edit to a word."""
+    i = rng.randrange(len(word))
+    edit = rng.choice(("delete", "insert", "replace", "swap"))
+    if edit == "delete" and len(word) > 1:
+        return word[:i] + word[i + 1:]
+    if edit == "insert":
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if edit == "swap" and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def per_query_us(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def naive_complete(glossary, prefix, limit=10):
+    """Previous approach: scan every term."""
+    prefix = prefix.lower()
+    return sorted(term for term in glossary if term.lower().startswith(prefix))[:limit]
+
+
+def naive_html(glossary):
+    """Previous approach: rebuild the whole glossary HTML by concatenation."""
+    html = '<div class="legal-glossary"><ul>'
+    for term, definition in sorted(glossary.items()):
+        html += f"<li><span>{term}</span>: <span>{definition}</span></li>"
+    return html + "</ul></div>"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="Glossary sizes (terms) to benchmark")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries timed per operation")
+    parser.add_argument("--page-size", type=int, default=20, help="Terms per sidebar page")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+
+    print(f"{'terms':>7} {'load (ms)':>10} {'exact (us)':>11} {'prefix (us)':>12} {'scan prefix (us)':>17} "
+          f"{'fuzzy (us)':>11} {'fuzzy hit':>10} {'page cold (us)':>15} {'page cached (us)':>17} {'full html (ms)':>15}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "terms.tsv")
+            write_term_file(path, size, rng)
+            start = time.perf_counter()
+            glossary = load_term_file(path)
+            store = GlossaryStore(glossary)
+            load_ms = (time.perf_counter() - start) * 1000
+
+        terms = [rng.choice(store.terms) for _ in range(args.queries)]
+        prefixes = [term[:rng.randint(2, 5)] for term in terms]
+        typos = [add_typo(term.lower(), rng) for term in terms]
+
+        exact_us = per_query_us(store.get, terms)
+        prefix_us = per_query_us(store.complete, prefixes)
+        scan_queries = prefixes[:max(args.queries // 20, 1)]
+        scan_us = per_query_us(lambda prefix: naive_complete(glossary, prefix), scan_queries)
+        fuzzy_us = per_query_us(store.fuzzy_lookup, typos)
+        hits = sum(1 for term, typo in zip(terms, typos) if term in [t for t, _ in store.fuzzy_lookup(typo)])
+
+        pages = store.page_count(args.page_size)
+        page_numbers = [rng.randrange(pages) for _ in range(args.queries)]
+        cold_us = per_query_us(lambda page: store.page_html(page, args.page_size), range(pages))
+        cached_us = per_query_us(lambda page: store.page_html(page, args.page_size), page_numbers)
+        start = time.perf_counter()
+        naive_html(glossary)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{len(store):>7} {load_ms:>10.1f} {exact_us:>11.2f} {prefix_us:>12.2f} {scan_us:>17.1f} "
+              f"{fuzzy_us:>11.1f} {hits / len(terms):>9.1%} {cold_us:>15.1f} {cached_us:>17.2f} {full_ms:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
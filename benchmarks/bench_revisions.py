@@ -0,0 +1,65 @@
+"""
+Benchmark of re-analyzing a revised document.
+
+Generates a document and a revision of it with a few pages edited and one
+page inserted. Reports the time to extract the revision with and without the
+original's pages in the revision cache, and how many of the revision's
+sections would be summarized again.
+
+Usage:
+    python -m benchmarks.bench_revisions
+    python -m benchmarks.bench_revisions --pages 300 --edited 5
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.fixtures import page_lines, write_pages_pdf
+from src.revisions import RevisionCache, split_sections
+from src.utils import extract_pages_from_pdf, join_pages, page_hashes, page_offsets
+
+
+def sections_of(pages, target_chars):
+    return split_sections(join_pages(pages), page_offsets(pages), page_hashes(pages), target_chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=120, help="Pages of the original document")
+    parser.add_argument("--edited", type=int, default=1, help="Pages edited in the revision")
+    parser.add_argument("--section-chars", type=int, default=12000, help="Target section length")
+    args = parser.parse_args()
+
+    original = page_lines(args.pages)
+    revised = [list(lines) for lines in original]
+    step = max(1, args.pages // (args.edited + 1))
+    for page in range(step, step * (args.edited + 1), step):
+        revised[page][0] = revised[page][0].replace("shall", "may")
+    revised.insert(args.pages // 3, ["An inserted clause on the notice period."] * 45)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = RevisionCache(os.path.join(directory, "revisions.sqlite3"))
+        original_pages = extract_pages_from_pdf(
+            write_pages_pdf(os.path.join(directory, "original.pdf"), original), page_cache=cache
+        )
+        revised_path = write_pages_pdf(os.path.join(directory, "revised.pdf"), revised)
+
+        start = time.perf_counter()
+        extract_pages_from_pdf(revised_path)
+        uncached = time.perf_counter() - start
+        start = time.perf_counter()
+        revised_pages = extract_pages_from_pdf(revised_path, page_cache=cache)
+        cached = time.perf_counter() - start
+
+    known = {section.content_hash for section in sections_of(original_pages, args.section_chars)}
+    sections = sections_of(revised_pages, args.section_chars)
+    changed = sum(1 for section in sections if section.content_hash not in known)
+
+    print(f"{'pages':>6} {'extract (s)':>12} {'with cache (s)':>15} {'sections':>9} {'to summarize':>13}")
+    print(f"{len(revised):>6} {uncached:>12.3f} {cached:>15.3f} {len(sections):>9} {changed:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark of chat question latency while document analyses hold the model.
+
+Simulates a burst of long document analyses (each a series of slow model
+requests) from a few sessions, with short chat questions arriving at a steady
+rate, all sharing the same model slots. Compares first-come-first-served
+slots (every request in one class, no reserved slot, no aging) with the fair
+scheduler's priority classes, and reports question latency percentiles and
+how long the analyses took to finish.
+
+Usage:
+    python -m benchmarks.bench_scheduler
+    python -m benchmarks.bench_scheduler --slots 4 --analyses 12 --questions 40
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+from src.scheduler import PRIORITY_DOCUMENT, PRIORITY_INTERACTIVE, FairScheduler, scheduling_scope
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(scheduler, args, fair):
+    """Run the simulated load; return (question latencies, analysis durations) in seconds."""
+    question_latencies = []
+    analysis_durations = []
+    lock = threading.Lock()
+
+    def analysis(session):
+        start = time.perf_counter()
+        with scheduling_scope(PRIORITY_DOCUMENT if fair else PRIORITY_INTERACTIVE, f"analyses-{session}"):
+            for _ in range(args.requests_per_analysis):
+                with scheduler.slot():
+                    time.sleep(args.analysis_request_seconds)
+        with lock:
+            analysis_durations.append(time.perf_counter() - start)
+
+    def question(index):
+        start = time.perf_counter()
+        with scheduling_scope(PRIORITY_INTERACTIVE, f"chat-{index}"):
+            with scheduler.slot():
+                time.sleep(args.question_seconds)
+        with lock:
+            question_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=analysis, args=(i % args.sessions,)) for i in range(args.analyses)]
+    for thread in threads:
+        thread.start()
+    # Questions start once the analyses have taken every slot
+    time.sleep(args.analysis_request_seconds / 2)
+    for i in range(args.questions):
+        thread = threading.Thread(target=question, args=(i,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.question_interval)
+    for thread in threads:
+        thread.join()
+    return question_latencies, analysis_durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=4, help="Model requests allowed at once")
+    parser.add_argument("--reserved", type=int, default=1, help="Slots kept for interactive questions")
+    parser.add_argument("--analyses", type=int, default=12, help="Document analyses in the burst")
+    parser.add_argument("--sessions", type=int, default=3, help="Sessions the analyses come from")
+    parser.add_argument("--requests-per-analysis", type=int, default=4, help="Model requests per analysis")
+    parser.add_argument("--analysis-request-seconds", type=float, default=0.5, help="Duration of an analysis request")
+    parser.add_argument("--questions", type=int, default=40, help="Chat questions asked during the burst")
+    parser.add_argument("--question-seconds", type=float, default=0.05, help="Duration of a question request")
+    parser.add_argument("--question-interval", type=float, default=0.1, help="Seconds between questions")
+    parser.add_argument("--aging-seconds", type=float, default=15.0, help="Aging of the fair scheduler")
+    args = parser.parse_args()
+
+    configurations = [
+        ("first come first served", FairScheduler("bench_fifo", args.slots, aging_seconds=0), False),
+        ("fair scheduler", FairScheduler("bench_fair", args.slots, aging_seconds=args.aging_seconds,
+                                         reserved=args.reserved), True),
+    ]
+    print(f"{'scheduling':<26} {'question p50 (ms)':>18} {'question p95 (ms)':>18} "
+          f"{'analyses mean (s)':>18} {'analyses max (s)':>17}")
+    for name, scheduler, fair in configurations:
+        latencies, durations = run(scheduler, args, fair)
+        print(f"{name:<26} {percentile(latencies, 0.5) * 1000:>18.1f} {percentile(latencies, 0.95) * 1000:>18.1f} "
+              f"{statistics.mean(durations):>18.2f} {max(durations):>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
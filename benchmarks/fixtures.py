@@ -0,0 +1,196 @@
+"""
+Shared fixtures for offline benchmarks.
+
+- configure_offline_environment: points settings at a scratch directory and
+  sets a placeholder API key, so the bot can be built without network access
+- write_pdf: writes a text PDF with the requested number of pages
+- make_fake_llm: a LangChain LLM that returns a canned legal answer instantly
+- linear_slope: least-squares growth rate of a measured series
+
+configure_offline_environment must be called before anything imports
+src.config, since settings are read at import time.
+"""
+
+import os
+import time
+
+SAMPLE_RESPONSE = (
+    "**Summary:** The lease allows the landlord to terminate with 30 days notice, subject to the force majeure clause.\n\n"
+    "**Key Clauses and Risks:**\n"
+    "- Indemnity: the tenant must cover losses arising from negligence on the premises.\n"
+    "- Liability is capped at the fees paid in the previous 12 months.\n"
+    "- Disputes go to arbitration, which limits access to case law remedies.\n\n"
+    "**Expert Legal Advice:** A breach of contract by either party may give rise to damages. "
+    "Check the jurisdiction clause and any precedent on notice periods before acting.\n\n"
+    "**Recommended Actions:**\n1. Keep written records of all notices.\n2. Seek advice before signing an affidavit.\n"
+)
+
+_PARAGRAPH = (
+    "This Agreement is made between the Landlord and the Tenant. The Tenant shall pay rent monthly in advance. "
+    "Either party may terminate this Agreement by giving thirty days written notice. The Tenant shall indemnify "
+    "the Landlord against all claims arising from negligence. Neither party is liable for delay caused by force "
+    "majeure. Any dispute shall be referred to arbitration under the laws of the applicable jurisdiction."
+)
+
+
+def configure_offline_environment(directory):
+    """
+    Point the bot's settings at a scratch directory and set a placeholder API key.
+
+    Existing environment variables are left untouched.
+
+    Args:
+        directory (str): Directory for caches, traces and profiles
+    """
+    defaults = {
+        "GOOGLE_API_KEY": "offline-benchmark",
+        "LOG_LEVEL": "WARNING",
+        "TRACE_FILE": os.path.join(directory, "traces.jsonl"),
+        "ANALYSIS_CACHE_PATH": os.path.join(directory, "analysis_cache.sqlite3"),
+        "PROFILE_DIR": os.path.join(directory, "profiles"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def linear_slope(points):
+    """
+    Least-squares slope of a series of (x, y) points.
+
+    Args:
+        points (Sequence[Tuple[float, float]]): Measurements, e.g. (turn, bytes)
+
+    Returns:
+        float: Change in y per unit of x, or 0.0 with fewer than two distinct x values
+    """
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+    if not denominator:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / denominator
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text, width):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def page_lines(pages, lines_per_page=45):
+    """Lines of text of each page of a generated document, numbered by clause."""
+    body_lines = _wrap(_PARAGRAPH, 90)
+    return [[f"Clause {page + 1}.{i + 1}. {body_lines[i % len(body_lines)]}" for i in range(lines_per_page)]
+            for page in range(pages)]
+
+
+def write_pdf(path, pages, lines_per_page=45):
+    """
+    Write a PDF with a text layer on every page.
+
+    The file is assembled by hand (one Helvetica font, one content stream per
+    page), so no PDF library is needed to produce benchmark inputs.
+
+    Args:
+        path (str): Output path
+        pages (int): Number of pages
+        lines_per_page (int): Lines of text per page
+
+    Returns:
+        str: The path written
+    """
+    return write_pages_pdf(path, page_lines(pages, lines_per_page))
+
+
+def write_pages_pdf(path, pages):
+    """
+    Write a PDF with the given lines of text on each page, see write_pdf.
+
+    Args:
+        path (str): Output path
+        pages (list): Lines of text of each page
+
+    Returns:
+        str: The path written
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers = []
+    for lines in pages:
+        text = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 14 TL 50 780 Td {text} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_number
+        )
+        page_numbers.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % number for number in page_numbers)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(pages))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, "wb") as pdf_file:
+        pdf_file.write(output)
+    return path
+
+
+def make_fake_llm(response=SAMPLE_RESPONSE, latency=0.0):
+    """
+    Create a LangChain LLM that returns a fixed response without network access.
+
+    Args:
+        response (str): Text returned for every prompt
+        latency (float): Seconds to sleep per call, to simulate model time
+
+    Returns:
+        LLM: Fake model usable wherever the bot's GoogleGenerativeAI is
+    """
+    from langchain_core.language_models.llms import LLM
+    from langchain_core.outputs import GenerationChunk
+
+    class FakeLegalLLM(LLM):
+        response: str
+        latency: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return "fake-legal"
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            return self.response
+
+        def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            for i in range(0, len(self.response), 40):
+                yield GenerationChunk(text=self.response[i:i + 40])
+
+    return FakeLegalLLM(response=response, latency=latency)
@@ -0,0 +1,203 @@
+"""
+Memory soak test for a long-lived bot instance.
+
+Drives one LegalAdvisorBot, as the app's process-wide singleton would be,
+through thousands of turns against a fake LLM. The turns mix legal
+questions, glossary definitions and document analyses through the job
+manager (new and repeated documents). Two scenarios run on fresh bots: one
+with periodic "New conversation" resets, and one conversation that is never
+reset, since resets would hide growth of the conversation itself. Traced
+memory and RSS are sampled every --snapshot-every turns.
+
+After the warm-up turns, the steady-state growth per turn is the
+least-squares slope of traced memory. The report lists the allocation sites
+that grew most between the end of warm-up and the last turn. The exit
+status is 1 if growth exceeds --budget bytes per turn in any scenario.
+
+Usage:
+    python -m benchmarks.soak
+    python -m benchmarks.soak --turns 5000 --budget 256 --output soak.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fixtures import configure_offline_environment, linear_slope, make_fake_llm, write_pdf
+
+QUESTIONS = [
+    "What are my rights if my landlord refuses to return my deposit?",
+    "What is indemnity?",
+    "Can my employer change my contract without my consent?",
+    "Define force majeure",
+    "How long do I have to file a claim for breach of contract?",
+]
+
+
+def rss_bytes():
+    """Return the resident set size of this process, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def take_snapshot():
+    gc.collect()
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def run_turn(bot, job_manager, turn, documents, workdir, args, reset_every):
+    """Run one simulated user turn."""
+    if reset_every and turn % reset_every == 0:
+        bot.reset_conversation()
+
+    if args.document_every and turn % args.document_every == 0:
+        # Alternate repeated documents (analysis cache hits) with new ones
+        index = turn // args.document_every
+        if index % 2 == 0 or not documents:
+            path = write_pdf(os.path.join(workdir, f"upload_{index}.pdf"), args.document_pages)
+            documents.append(path)
+        else:
+            path = documents[index % len(documents)]
+        job_id = job_manager.submit_analysis(bot, path, session_id="soak", document_name=os.path.basename(path),
+                                             cleanup=False)
+        while not job_manager.get(job_id).finished:
+            time.sleep(0.001)
+        return
+
+    bot.get_response(QUESTIONS[turn % len(QUESTIONS)])
+
+
+def run_scenario(name, reset_every, workdir, args):
+    """Soak a fresh bot; return the scenario's report."""
+    from src.jobs import JobManager
+    from src.legal_bot import LegalAdvisorBot
+
+    print(f"\n== {name} ==")
+    bot = LegalAdvisorBot(llm=make_fake_llm())
+    job_manager = JobManager(max_workers=1)
+    documents = []
+
+    tracemalloc.start(args.frames)
+    samples = []
+    baseline_snapshot = None
+    start = time.perf_counter()
+    try:
+        for turn in range(1, args.turns + 1):
+            run_turn(bot, job_manager, turn, documents, workdir, args, reset_every)
+            if turn % args.snapshot_every == 0 or turn == args.warmup or turn == args.turns:
+                gc.collect()
+                traced = tracemalloc.get_traced_memory()[0]
+                samples.append({"turn": turn, "traced_bytes": traced, "rss_bytes": rss_bytes()})
+                if turn == args.warmup:
+                    baseline_snapshot = take_snapshot()
+                print(f"turn {turn:>6}: traced {traced / 1024:>10.1f} KiB"
+                      + (f", rss {samples[-1]['rss_bytes'] / 2 ** 20:.1f} MiB" if samples[-1]["rss_bytes"] else ""))
+        final_snapshot = take_snapshot()
+    finally:
+        tracemalloc.stop()
+        job_manager.shutdown()
+    elapsed = time.perf_counter() - start
+
+    steady = [s for s in samples if s["turn"] >= args.warmup]
+    traced_slope = linear_slope([(s["turn"], s["traced_bytes"]) for s in steady])
+    rss_points = [(s["turn"], s["rss_bytes"]) for s in steady if s["rss_bytes"] is not None]
+    rss_slope = linear_slope(rss_points) if rss_points else None
+
+    top_sites = []
+    for stat in final_snapshot.compare_to(baseline_snapshot, "traceback")[:args.top]:
+        top_sites.append({
+            "site": " <- ".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback),
+            "size_diff_bytes": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "size_bytes": stat.size,
+        })
+
+    print(f"\n{args.turns} turns in {elapsed:.1f}s")
+    print(f"Steady-state growth: {traced_slope:.1f} B/turn traced"
+          + (f", {rss_slope:.1f} B/turn RSS" if rss_slope is not None else ""))
+    print(f"\nTop {len(top_sites)} growing allocation sites since turn {args.warmup}:")
+    for site in top_sites:
+        print(f"  {site['size_diff_bytes'] / 1024:>+10.1f} KiB {site['count_diff']:>+8} blocks  {site['site']}")
+
+    passed = traced_slope <= args.budget
+    print(f"\n{'PASS' if passed else 'FAIL'} ({name}): budget {args.budget:.0f} B/turn")
+    return {
+        "scenario": name,
+        "reset_every": reset_every,
+        "elapsed_seconds": round(elapsed, 3),
+        "traced_bytes_per_turn": round(traced_slope, 3),
+        "rss_bytes_per_turn": round(rss_slope, 3) if rss_slope is not None else None,
+        "passed": passed,
+        "samples": samples,
+        "top_growing_sites": top_sites,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000, help="Simulated turns per scenario")
+    parser.add_argument("--warmup", type=int, default=200, help="Turns excluded from the steady-state estimate")
+    parser.add_argument("--document-every", type=int, default=25, help="Analyze a document every N turns (0 disables)")
+    parser.add_argument("--document-pages", type=int, default=5, help="Pages per generated document")
+    parser.add_argument("--reset-every", type=int, default=20,
+                        help="Start a new conversation every N turns in the resetting scenario (0 skips it)")
+    parser.add_argument("--scenarios", choices=("both", "resets", "no-resets"), default="both",
+                        help="Run the scenario with conversation resets, the one without, or both")
+    parser.add_argument("--snapshot-every", type=int, default=100, help="Turns between memory samples")
+    parser.add_argument("--frames", type=int, default=1, help="Traceback depth recorded per allocation")
+    parser.add_argument("--top", type=int, default=10, help="Growing allocation sites to report")
+    parser.add_argument("--budget", type=float, default=512,
+                        help="Allowed steady-state growth in bytes per turn, enforced on every scenario")
+    parser.add_argument("--output", help="Write the report to this JSON file")
+    args = parser.parse_args()
+    if not 0 < args.warmup < args.turns:
+        parser.error("--warmup must be at least 1 and smaller than --turns")
+
+    # A conversation that is never reset is what a long-lived session looks like; resets alone can hide growth
+    scenarios = []
+    if args.scenarios in ("both", "resets") and args.reset_every:
+        scenarios.append((f"reset every {args.reset_every} turns", args.reset_every))
+    if args.scenarios in ("both", "no-resets"):
+        scenarios.append(("no resets", 0))
+    if not scenarios:
+        parser.error("no scenario to run: --scenarios resets needs --reset-every above 0")
+
+    with tempfile.TemporaryDirectory(prefix="legal-bot-soak-") as workdir:
+        configure_offline_environment(workdir)
+        reports = [run_scenario(name, reset_every, workdir, args) for name, reset_every in scenarios]
+
+    passed = all(report["passed"] for report in reports)
+    print("\n" + "\n".join(f"{'PASS' if report['passed'] else 'FAIL'}: {report['scenario']}, "
+                            f"{report['traced_bytes_per_turn']:.1f} B/turn" for report in reports))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump({"arguments": vars(args), "passed": passed, "scenarios": reports}, output_file, indent=2)
+        print(f"Report written to {args.output}")
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+End-to-end benchmark suite for the query and document pipelines.
+
+Runs offline against a fake LLM and measures:
+
+- pdf_extraction: extract_text_from_pdf and lawbot read_file on generated PDFs
+- process_query: pipeline overhead per question and per document query, with no model time
+- memory: traced memory growth per conversation turn
+- format_response: cost per call for each response shape
+- glossary: glossary HTML, sidebar pages, term annotation and message rendering
+
+Results are written as JSON. Each metric records its unit and whether lower
+or higher is better, so two runs can be compared:
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --output current.json --compare baseline.json
+    python -m benchmarks.suite --results current.json --compare baseline.json
+
+When comparing, the exit status is 1 if any metric is worse than the baseline
+by more than --threshold.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from benchmarks.fixtures import SAMPLE_RESPONSE, configure_offline_environment, linear_slope, make_fake_llm, write_pdf
+
+QUESTIONS = [
+    "What are my rights if my landlord refuses to return my deposit?",
+    "Can my employer change my contract without my consent?",
+    "How long do I have to file a claim for breach of contract?",
+    "What should I do after receiving a court summons?",
+]
+
+BENCHMARKS = ["pdf_extraction", "process_query", "memory", "format_response", "glossary"]
+
+
+class Results:
+    """Collects named metrics with their unit and direction."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(value, 6), "unit": unit, "better": better}
+        print(f"  {name:<60} {value:>14.3f} {unit}")
+
+
+def timed(fn, repeats=3):
+    """Return the median wall time of fn in seconds over repeats runs."""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def per_call_us(fn, iterations):
+    """Return the mean time of fn in microseconds over iterations calls."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def bench_pdf_extraction(results, workdir, args):
+    from src.lawbot.utils import read_file
+    from src.utils import extract_text_from_pdf
+
+    for pages in args.pages:
+        path = write_pdf(os.path.join(workdir, f"document_{pages}.pages.pdf"), pages)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        repeats = 3 if pages <= 100 else 1
+
+        if extract_text_from_pdf(path) is None:
+            raise RuntimeError(f"No text extracted from generated {pages}-page PDF")
+        seconds = timed(lambda: extract_text_from_pdf(path), repeats)
+        results.add(f"pdf_extraction.extract_text_from_pdf.{pages}_pages.seconds", seconds, "s")
+        results.add(f"pdf_extraction.extract_text_from_pdf.{pages}_pages.pages_per_second",
+                    pages / seconds, "pages/s", better="higher")
+        results.add(f"pdf_extraction.extract_text_from_pdf.{pages}_pages.mb_per_second",
+                    size_mb / seconds, "MB/s", better="higher")
+
+        def read():
+            with open(path, "rb") as pdf_file:
+                read_file(pdf_file)
+
+        seconds = timed(read, repeats)
+        results.add(f"pdf_extraction.read_file.{pages}_pages.seconds", seconds, "s")
+        results.add(f"pdf_extraction.read_file.{pages}_pages.pages_per_second",
+                    pages / seconds, "pages/s", better="higher")
+
+
+def bench_process_query(results, workdir, args):
+    from src.legal_bot import LegalAdvisorBot
+
+    bot = LegalAdvisorBot(llm=make_fake_llm())
+    bot.process_query(QUESTIONS[0])
+
+    # Reset memory between questions so the prompt size stays constant
+    durations = []
+    for i in range(args.queries):
+        bot.reset_conversation()
+        start = time.perf_counter()
+        bot.process_query(QUESTIONS[i % len(QUESTIONS)])
+        durations.append(time.perf_counter() - start)
+    results.add("process_query.question.mean_ms", statistics.mean(durations) * 1000, "ms")
+    results.add("process_query.question.p95_ms", percentile(durations, 0.95) * 1000, "ms")
+
+    path = write_pdf(os.path.join(workdir, "query_document.pdf"), args.document_pages)
+    durations = []
+    for i in range(max(args.queries // 10, 3)):
+        bot.reset_conversation()
+        start = time.perf_counter()
+        bot.process_query("Summarize the termination clause.", pdf_path=path)
+        durations.append(time.perf_counter() - start)
+    results.add(f"process_query.document_{args.document_pages}_pages.mean_ms", statistics.mean(durations) * 1000, "ms")
+
+
+def bench_memory(results, workdir, args):
+    from src.legal_bot import LegalAdvisorBot
+
+    bot = LegalAdvisorBot(llm=make_fake_llm())
+    bot.process_query(QUESTIONS[0])
+    bot.reset_conversation()
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        samples = []
+        for turn in range(1, args.turns + 1):
+            bot.process_query(QUESTIONS[turn % len(QUESTIONS)])
+            gc.collect()
+            samples.append((turn, tracemalloc.get_traced_memory()[0] - baseline))
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    results.add("memory.bytes_per_turn", linear_slope(samples), "B")
+    results.add(f"memory.growth_after_{args.turns}_turns_kb", samples[-1][1] / 1024, "KiB")
+    results.add(f"memory.peak_during_{args.turns}_turns_kb", peak / 1024, "KiB")
+
+
+def bench_format_response(results, workdir, args):
+    from src.utils import format_response
+
+    cases = {
+        "string": SAMPLE_RESPONSE,
+        "text_key": {"text": SAMPLE_RESPONSE, "human_input": "question", "chat_history": []},
+        "fallback_dict": {"summary": SAMPLE_RESPONSE[:200], "advice": SAMPLE_RESPONSE[200:], "memory": []},
+    }
+    for name, response in cases.items():
+        results.add(f"format_response.{name}.us_per_call",
+                    per_call_us(lambda: format_response(response), args.iterations), "us")
+
+
+def bench_glossary(results, workdir, args):
+    from src.chat_render import new_message, render_message_html
+    from src.glossary_matcher import get_glossary_matcher
+    from src.glossary_store import get_glossary_store
+    from src.legal_glossary import get_legal_glossary_html
+
+    start = time.perf_counter()
+    store = get_glossary_store()
+    matcher = get_glossary_matcher()
+    results.add("glossary.load_ms", (time.perf_counter() - start) * 1000, "ms")
+
+    results.add("glossary.full_html.us_per_call", per_call_us(get_legal_glossary_html, args.iterations), "us")
+    results.add("glossary.page_html.us_per_call",
+                per_call_us(lambda: store.page_html(0, 20), args.iterations), "us")
+    results.add("glossary.annotate_response.us_per_call",
+                per_call_us(lambda: matcher.annotate_html(SAMPLE_RESPONSE), args.iterations // 10), "us")
+    message = new_message("assistant", SAMPLE_RESPONSE)
+    results.add("glossary.render_annotated_message.us_per_call",
+                per_call_us(lambda: render_message_html(message, annotate=matcher.annotate_html),
+                            args.iterations // 10), "us")
+    results.add("glossary.search.us_per_call", per_call_us(lambda: store.search("neglignce"), args.iterations), "us")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, threshold):
+    """
+    Print a comparison of two result sets.
+
+    Args:
+        baseline (dict): Earlier results
+        current (dict): New results
+        threshold (float): Relative change beyond which a worse metric is a regression
+
+    Returns:
+        int: Number of regressions
+    """
+    regressions = 0
+    print(f"\n{'metric':<60} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, metric in sorted(current["metrics"].items()):
+        old = baseline["metrics"].get(name)
+        if old is None or not old["value"]:
+            print(f"{name:<60} {'-':>12} {metric['value']:>12.3f} {'new':>9}")
+            continue
+        change = (metric["value"] - old["value"]) / abs(old["value"])
+        worse = change > threshold if metric["better"] == "lower" else change < -threshold
+        marker = "  REGRESSION" if worse else ""
+        regressions += worse
+        print(f"{name:<60} {old['value']:>12.3f} {metric['value']:>12.3f} {change:>+8.1%}{marker}")
+    for name in sorted(set(baseline["metrics"]) - set(current["metrics"])):
+        print(f"{name:<60} {baseline['metrics'][name]['value']:>12.3f} {'-':>12} {'removed':>9}")
+    print(f"\n{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run (default: all)")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000],
+                        help="Page counts of the generated PDFs")
+    parser.add_argument("--document-pages", type=int, default=10, help="Pages of the document used in queries")
+    parser.add_argument("--queries", type=int, default=200, help="Questions timed for process_query")
+    parser.add_argument("--turns", type=int, default=50, help="Conversation turns for the memory benchmark")
+    parser.add_argument("--iterations", type=int, default=10000, help="Calls timed for micro-benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast smoke run")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--results", help="Load results from this file instead of running the benchmarks")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Relative change counted as a regression (default: 0.15)")
+    args = parser.parse_args()
+    if args.quick:
+        args.pages = [1, 10, 100]
+        args.queries, args.turns, args.iterations = 20, 10, 1000
+
+    if args.results:
+        with open(args.results, "r", encoding="utf-8") as results_file:
+            current = json.load(results_file)
+    else:
+        with tempfile.TemporaryDirectory(prefix="legal-bot-bench-") as workdir:
+            configure_offline_environment(workdir)
+            results = Results()
+            for name in args.only or BENCHMARKS:
+                print(f"{name}:")
+                globals()[f"bench_{name}"](results, workdir, args)
+        current = {
+            "metadata": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "revision": git_revision(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "arguments": {k: v for k, v in vars(args).items() if k not in ("output", "results", "compare")},
+            },
+            "metrics": results.metrics,
+        }
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as output_file:
+                json.dump(current, output_file, indent=2)
+            print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
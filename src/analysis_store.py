@@ -0,0 +1,146 @@
+"""
+Shared store of completed document analyses.
+
+Analyses are keyed by the document's content hash, the analysis prompt
+version and the model, so identical documents uploaded by different users
+reuse one LLM pass. The store is a SQLite database, which makes it safe to
+share between sessions, threads and worker processes on the same host.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+from src.logger import logger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    document_hash TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL
+)
+"""
+
+
+def make_analysis_key(document_hash: str, prompt_version: str, model: str) -> str:
+    """
+    Build the cache key for an analysis.
+
+    Args:
+        document_hash (str): Content hash of the document
+        prompt_version (str): Version of the analysis prompt
+        model (str): Name of the model that produced the analysis
+
+    Returns:
+        str: Cache key
+    """
+    return hashlib.sha256(f"{document_hash}\0{prompt_version}\0{model}".encode("utf-8")).hexdigest()
+
+
+class AnalysisStore:
+    """SQLite-backed store of completed analyses with TTL and size-based eviction."""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        """
+        Open (and create if needed) an analysis store.
+
+        Args:
+            path (str): Path to the SQLite database file
+            ttl_seconds (int): Age after which an analysis is no longer reused
+            max_entries (int): Maximum number of analyses kept; least recently used are evicted
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL lets readers in other processes proceed while one process writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_last_accessed ON analyses (last_accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, document_hash: str, prompt_version: str, model: str) -> Optional[str]:
+        """
+        Look up a completed analysis.
+
+        Args:
+            document_hash (str): Content hash of the document
+            prompt_version (str): Version of the analysis prompt
+            model (str): Name of the model
+
+        Returns:
+            Optional[str]: The stored analysis, or None if there is no fresh entry
+        """
+        key = make_analysis_key(document_hash, prompt_version, model)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute(
+                    "SELECT response FROM analyses WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE analyses SET last_accessed = ? WHERE key = ?", (now, key))
+                return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading analysis store: {e}")
+            return None
+
+    def put(self, document_hash: str, prompt_version: str, model: str, response: str):
+        """
+        Save a completed analysis and evict expired or excess entries.
+
+        Args:
+            document_hash (str): Content hash of the document
+            prompt_version (str): Version of the analysis prompt
+            model (str): Name of the model
+            response (str): The analysis to store
+        """
+        key = make_analysis_key(document_hash, prompt_version, model)
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses "
+                    "(key, document_hash, prompt_version, model, response, created_at, last_accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, document_hash, prompt_version, model, response, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing analysis store: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Remove expired entries, then the least recently used ones beyond max_entries."""
+        conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM analyses WHERE key IN ("
+            "SELECT key FROM analyses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def invalidate(self, document_hash: str):
+        """Remove all stored analyses of a document, whatever the prompt version or model."""
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DELETE FROM analyses WHERE document_hash = ?", (document_hash,))
+        except sqlite3.Error as e:
+            logger.error(f"Error invalidating analysis store entry: {e}")
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
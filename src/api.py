@@ -0,0 +1,545 @@
+"""
+Headless HTTP API for the Legal Advisor Bot.
+
+Exposes the same LegalAdvisorBot used by the Streamlit app over an ASGI
+service, for integrations that need programmatic access. Run it with:
+
+    python -m src.api
+
+or under any ASGI server, e.g. ``uvicorn src.api:app``.
+
+Conversations are per session: a client opens one with POST /v1/sessions and
+passes its session_id, and requests without a session_id are answered without
+any conversation history.
+
+Background jobs, workspaces, sessions and metrics are held in the worker
+process, so a request only sees state created by the same worker. Run one
+worker per process group and scale out behind sticky routing.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, closing
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, File, Header, HTTPException, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from src.cancellation import CancellationToken, cancellation_scope
+from src.config import Config
+from src.exceptions import LegalBotException, handle_exception
+from src.jobs import JobManager
+from src.logger import logger
+from src.metrics import CONTENT_TYPE, render_metrics, start_metrics_server
+from src.profiling import profiling_allowed
+from src.scheduler import scheduling_scope
+from src.utils import clean_temporary_file
+from src.warmup import get_bot, get_readiness, start_warm_up
+
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up the worker in the background so the first request does not pay for it."""
+    if Config.API_WORKER_METRICS_PORT:
+        # Each worker serves its own metrics on a fixed port, so every worker can be scraped
+        start_metrics_server(Config.API_WORKER_METRICS_PORT, ports=Config.API_WORKERS)
+    start_warm_up()
+    yield
+
+
+app = FastAPI(title=f"{Config.APP_NAME} API", version=Config.VERSION, lifespan=lifespan)
+
+# One bot (see src.warmup.get_bot) and job manager per worker process, shared by all requests
+_job_manager = None
+_init_lock = threading.Lock()
+
+# Limits the number of requests doing work at once; extra requests get 429.
+# Created on first use so it binds to the server's event loop.
+_request_slots = None
+
+
+class QueryRequest(BaseModel):
+    """Body of a question request."""
+    query: str
+    # Answer definitional questions from the glossary; False always asks the model
+    use_glossary: bool = True
+    # Session from POST /v1/sessions whose conversation the question continues; none answers without history
+    session_id: Optional[str] = None
+    # Name of a document analyzed earlier in the session's conversation that the question follows up on
+    active_document: Optional[str] = None
+
+
+class WorkspaceRequest(BaseModel):
+    """Body of a workspace creation request."""
+    name: str = ""
+
+
+class WorkspaceQueryRequest(BaseModel):
+    """Body of a question asked across a workspace's documents."""
+    query: str
+    session_id: Optional[str] = None
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide JobManager, creating it on first use."""
+    global _job_manager
+    if _job_manager is None:
+        with _init_lock:
+            if _job_manager is None:
+                _job_manager = JobManager()
+    return _job_manager
+
+
+def request_slots() -> asyncio.Semaphore:
+    """Return the semaphore that bounds concurrent requests in this process."""
+    global _request_slots
+    if _request_slots is None:
+        _request_slots = asyncio.Semaphore(Config.API_MAX_CONCURRENT_REQUESTS)
+    return _request_slots
+
+
+async def acquire_slot():
+    """Reserve a request slot, rejecting the request with 429 if the server is saturated."""
+    if request_slots().locked():
+        logger.warning("API saturated, rejecting request")
+        raise HTTPException(status_code=429, detail="Server is busy, please retry later",
+                            headers={"Retry-After": "1"})
+    await request_slots().acquire()
+
+
+async def _wait_for_exit(task: asyncio.Future):
+    """Wait for cancelled work to stop, ignoring how it ended."""
+    try:
+        await task
+    except Exception:
+        pass
+
+
+async def run_with_timeout(fn, *args, session_id: Optional[str] = None):
+    """
+    Run a blocking call in the thread pool, failing with 504 if it exceeds the request timeout.
+
+    The call runs under its own cancellation token, in the request's session
+    (see request_session). On timeout, or if the client goes away, the token is
+    cancelled and this returns only once the thread has stopped at its next
+    check, so the caller's request slot stays held while the work still uses
+    the model.
+    """
+    token = CancellationToken()
+
+    def run():
+        with cancellation_scope(token), scheduling_scope(session_id=session_id):
+            return fn(*args)
+
+    task = asyncio.ensure_future(run_in_threadpool(run))
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), timeout=Config.API_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"API request timed out after {Config.API_REQUEST_TIMEOUT}s")
+        token.cancel("request timed out")
+        await _wait_for_exit(task)
+        raise HTTPException(status_code=504, detail="Request timed out")
+    except asyncio.CancelledError:
+        token.cancel("client disconnected")
+        await _wait_for_exit(task)
+        raise
+
+
+async def save_upload(upload: UploadFile) -> str:
+    """
+    Save an uploaded PDF to a temporary file, enforcing the size and type limits.
+
+    Args:
+        upload (UploadFile): The uploaded file
+
+    Returns:
+        str: Path to the saved temporary file
+    """
+    extension = os.path.splitext(upload.filename or "")[1].lstrip(".").lower()
+    if extension not in Config.ACCEPTED_FILE_TYPES:
+        raise HTTPException(status_code=415, detail="Invalid file type: Only PDF documents are supported.")
+
+    max_bytes = Config.MAX_PDF_SIZE_MB * 1024 * 1024
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        while True:
+            block = await upload.read(1024 * 1024)
+            if not block:
+                break
+            size += len(block)
+            if size > max_bytes:
+                tmp_file.close()
+                clean_temporary_file(tmp_file.name)
+                raise HTTPException(status_code=413,
+                                    detail=f"Document exceeds the maximum size of {Config.MAX_PDF_SIZE_MB}MB")
+            tmp_file.write(block)
+        return tmp_file.name
+
+
+async def request_session(session_id: Optional[str]) -> str:
+    """
+    Return the session a request runs in, failing with 404 if the session is unknown to this worker.
+
+    A request without a session_id gets a one-off session with no conversation,
+    so it is answered without history and never sees another client's.
+    """
+    if session_id is None:
+        return f"request-{uuid.uuid4().hex}"
+    bot = await run_in_threadpool(get_bot)
+    if not bot.has_conversation(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_id
+
+
+def requested_profile(profile: bool, token: Optional[str]) -> Optional[bool]:
+    """
+    Resolve a request's profile flag, failing with 403 if the client may not profile.
+
+    Returns:
+        Optional[bool]: True to profile the request, None to follow Config.PROFILING_ENABLED
+    """
+    if not profile:
+        return None
+    if not profiling_allowed(token):
+        raise HTTPException(status_code=403, detail="Profiling requires DEBUG_MODE or a valid X-Profile-Token")
+    return True
+
+
+def sse_event(event: str, data) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/health")
+async def health():
+    """Liveness check."""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once this worker has warmed up, 503 until then or if warm-up failed."""
+    state = get_readiness().to_dict()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus scrape endpoint for the worker process that handles the request.
+
+    With several workers each scrape reaches a different worker; scrape the
+    per-worker ports of API_WORKER_METRICS_PORT instead.
+    """
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.post("/v1/query")
+async def query(request: QueryRequest, profile: bool = False, x_profile_token: Optional[str] = Header(None)):
+    """Answer a legal question; set profile to write a profile of the request."""
+    profile = requested_profile(profile, x_profile_token)
+    session_id = await request_session(request.session_id)
+    await acquire_slot()
+    try:
+        start_time = time.time()
+        response = await run_with_timeout(lambda: get_bot().get_response(
+            request.query, profile=profile, use_glossary=request.use_glossary,
+            active_document=request.active_document
+        ), session_id=session_id)
+        return {"response": response, "elapsed_seconds": round(time.time() - start_time, 3)}
+    finally:
+        request_slots().release()
+
+
+@app.post("/v1/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Answer a legal question, streaming the response as server-sent events.
+
+    The stream runs on one worker thread under its own cancellation token, like
+    run_with_timeout. The request slot is held until that thread has stopped,
+    however the response ends.
+    """
+    session_id = await request_session(request.session_id)
+    await acquire_slot()
+    token = CancellationToken()
+    loop = asyncio.get_running_loop()
+    pieces = asyncio.Queue()
+
+    def produce(bot):
+        # Closing the stream aborts the model request once the token stops it at its next piece
+        with cancellation_scope(token), scheduling_scope(session_id=session_id), \
+                closing(bot.stream_query(request.query, use_glossary=request.use_glossary,
+                                         active_document=request.active_document)) as stream:
+            try:
+                for piece in stream:
+                    loop.call_soon_threadsafe(pieces.put_nowait, piece)
+            finally:
+                loop.call_soon_threadsafe(pieces.put_nowait, None)
+
+    try:
+        bot = await run_in_threadpool(get_bot)
+        producer = asyncio.ensure_future(run_in_threadpool(produce, bot))
+    except BaseException:
+        request_slots().release()
+        raise
+    # Stops the stream even if the response is never read
+    timer = loop.call_later(Config.API_REQUEST_TIMEOUT, token.cancel, "request timed out")
+
+    def stream_stopped(task: asyncio.Future):
+        timer.cancel()
+        request_slots().release()
+        if not task.cancelled() and task.exception() is not None and not token.cancelled:
+            logger.error(f"Streaming API request failed: {task.exception()}")
+
+    producer.add_done_callback(stream_stopped)
+    deadline = loop.time() + Config.API_REQUEST_TIMEOUT
+
+    async def events():
+        try:
+            while True:
+                try:
+                    # A stalled model sends no pieces, so the deadline is enforced while waiting for one
+                    piece = await asyncio.wait_for(pieces.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    piece = None
+                    token.cancel("request timed out")
+                if piece is None:
+                    break
+                yield sse_event("token", {"text": piece})
+            if token.cancelled:
+                logger.error("Streaming API request timed out")
+                yield sse_event("error", {"detail": "Request timed out"})
+            else:
+                yield sse_event("done", {})
+        finally:
+            # Does nothing once the stream has finished; on client disconnect it stops the stream
+            token.cancel("client disconnected")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/documents/analyze")
+async def analyze_document(file: UploadFile = File(...), force: bool = False, profile: bool = False,
+                           session_id: Optional[str] = None, x_profile_token: Optional[str] = Header(None)):
+    """
+    Upload a PDF and return its analysis; set force to bypass stored analyses.
+
+    With a session_id the analysis joins that session's conversation, so later questions can follow up on it.
+    """
+    profile = requested_profile(profile, x_profile_token)
+    session_id = await request_session(session_id)
+    await acquire_slot()
+    pdf_path = None
+    try:
+        pdf_path = await save_upload(file)
+        response = await run_with_timeout(
+            lambda: get_bot().analyze_document(pdf_path, force=force, profile=profile), session_id=session_id
+        )
+        return {"document": file.filename, "response": response}
+    finally:
+        if pdf_path:
+            clean_temporary_file(pdf_path)
+        request_slots().release()
+
+
+@app.post("/v1/documents/compare")
+async def compare_documents(old: UploadFile = File(...), new: UploadFile = File(...), force: bool = False,
+                            profile: bool = False, session_id: Optional[str] = None,
+                            x_profile_token: Optional[str] = Header(None)):
+    """Upload two versions of a PDF and return a review of the clauses that changed."""
+    profile = requested_profile(profile, x_profile_token)
+    session_id = await request_session(session_id)
+    await acquire_slot()
+    paths = []
+    try:
+        paths.append(await save_upload(old))
+        paths.append(await save_upload(new))
+        response = await run_with_timeout(
+            lambda: get_bot().compare_documents(paths[0], paths[1], force=force, profile=profile),
+            session_id=session_id
+        )
+        return {"old_document": old.filename, "new_document": new.filename, "response": response}
+    finally:
+        for path in paths:
+            clean_temporary_file(path)
+        request_slots().release()
+
+
+@app.post("/v1/documents/quiz")
+async def generate_quiz(file: UploadFile = File(...), questions_per_chunk: int = 0, max_chunks: int = 0):
+    """Upload a PDF and return multiple choice questions about it."""
+    await acquire_slot()
+    pdf_path = None
+    try:
+        pdf_path = await save_upload(file)
+        try:
+            questions = await run_with_timeout(lambda: get_bot().generate_quiz(
+                pdf_path, questions_per_chunk=questions_per_chunk or None, max_chunks=max_chunks or None
+            ))
+        except LegalBotException as e:
+            raise HTTPException(status_code=422, detail=handle_exception(e))
+        return {"document": file.filename, "questions": questions}
+    finally:
+        if pdf_path:
+            clean_temporary_file(pdf_path)
+        request_slots().release()
+
+
+async def workspace_or_404(workspace_id: str):
+    """Return a workspace of this process, failing with 404 if it does not exist."""
+    # get_bot blocks while the bot is being built, so it must not run on the event loop
+    bot = await run_in_threadpool(get_bot)
+    try:
+        return bot.get_workspace(workspace_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+
+
+def workspace_dict(workspace) -> dict:
+    """Serializable summary of a workspace and its documents."""
+    return {
+        "workspace_id": workspace.id,
+        "name": workspace.name,
+        "documents": [document._asdict() for document in workspace.documents.values()],
+        "passages": workspace.passage_count,
+    }
+
+
+@app.post("/v1/workspaces", status_code=201)
+async def create_workspace(request: WorkspaceRequest):
+    """Create a matter workspace. Workspaces live in the worker process that created them."""
+    workspace = await run_in_threadpool(lambda: get_bot().create_workspace(request.name))
+    return workspace_dict(workspace)
+
+
+@app.get("/v1/workspaces/{workspace_id}")
+async def get_workspace(workspace_id: str):
+    """Return a workspace and the documents in it."""
+    return workspace_dict(await workspace_or_404(workspace_id))
+
+
+@app.post("/v1/workspaces/{workspace_id}/documents")
+async def add_workspace_document(workspace_id: str, file: UploadFile = File(...)):
+    """Upload a PDF and add it to a workspace's index."""
+    await workspace_or_404(workspace_id)
+    await acquire_slot()
+    pdf_path = None
+    try:
+        pdf_path = await save_upload(file)
+        try:
+            document = await run_with_timeout(
+                lambda: get_bot().add_to_workspace(workspace_id, pdf_path, document_name=file.filename)
+            )
+        except LegalBotException as e:
+            raise HTTPException(status_code=422, detail=handle_exception(e))
+        return document._asdict()
+    finally:
+        if pdf_path:
+            clean_temporary_file(pdf_path)
+        request_slots().release()
+
+
+@app.delete("/v1/workspaces/{workspace_id}/documents/{document_hash}")
+async def remove_workspace_document(workspace_id: str, document_hash: str):
+    """Remove a document from a workspace's index."""
+    workspace = await workspace_or_404(workspace_id)
+    if not await run_in_threadpool(workspace.remove_document, document_hash):
+        raise HTTPException(status_code=404, detail="Document not found in workspace")
+    return {"status": "removed"}
+
+
+@app.post("/v1/workspaces/{workspace_id}/query")
+async def query_workspace(workspace_id: str, request: WorkspaceQueryRequest, profile: bool = False,
+                          x_profile_token: Optional[str] = Header(None)):
+    """Answer a question from all documents of a workspace, citing document and page."""
+    profile = requested_profile(profile, x_profile_token)
+    await workspace_or_404(workspace_id)
+    session_id = await request_session(request.session_id)
+    await acquire_slot()
+    try:
+        start_time = time.time()
+        response = await run_with_timeout(
+            lambda: get_bot().query_workspace(workspace_id, request.query, profile=profile), session_id=session_id
+        )
+        return {"response": response, "elapsed_seconds": round(time.time() - start_time, 3)}
+    finally:
+        request_slots().release()
+
+
+@app.post("/v1/documents/jobs", status_code=202)
+async def submit_analysis_job(file: UploadFile = File(...), force: bool = False, session_id: Optional[str] = None):
+    """Upload a PDF and analyze it in the background; poll the returned job for progress."""
+    session_id = await request_session(session_id)
+    if get_job_manager().unfinished() >= Config.API_MAX_QUEUED_JOBS:
+        logger.warning("Job queue full, rejecting analysis job")
+        raise HTTPException(status_code=429, detail="Too many analyses in progress, please retry later",
+                            headers={"Retry-After": "5"})
+    pdf_path = await save_upload(file)
+    try:
+        bot = await run_in_threadpool(get_bot)
+    except BaseException:
+        clean_temporary_file(pdf_path)
+        raise
+    job_id = get_job_manager().submit_analysis(bot, pdf_path, session_id=session_id, document_name=file.filename,
+                                               force=force)
+    return {"job_id": job_id}
+
+
+@app.get("/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Return the status, progress and (once finished) result of a background job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.delete("/v1/jobs/{job_id}", status_code=202)
+async def cancel_job(job_id: str):
+    """Cancel a background job; it stops at its next page, chunk or piece of model output."""
+    job_manager = get_job_manager()
+    if job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job_manager.cancel(job_id, "cancelled by API client"):
+        raise HTTPException(status_code=409, detail="Job already finished")
+    return {"status": "cancelling"}
+
+
+@app.post("/v1/sessions", status_code=201)
+async def create_session():
+    """Open a conversation; pass the returned session_id with requests that should share its history."""
+    session_id = await run_in_threadpool(lambda: get_bot().open_conversation())
+    return {"session_id": session_id}
+
+
+@app.post("/v1/sessions/{session_id}/reset")
+async def reset_session(session_id: str):
+    """Clear the history of one session's conversation."""
+    session_id = await request_session(session_id)
+    await run_in_threadpool(lambda: get_bot().reset_conversation(session_id))
+    return {"status": "reset"}
+
+
+@app.delete("/v1/sessions/{session_id}")
+async def end_session(session_id: str):
+    """End a session and forget its conversation."""
+    if not await run_in_threadpool(lambda: get_bot().end_conversation(session_id)):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "ended"}
+
+
+if __name__ == "__main__":
+    if Config.API_WORKERS > 1:
+        logger.warning(f"Starting {Config.API_WORKERS} API workers: jobs, workspaces and sessions "
+                       "are per worker, so clients must be routed to the same worker for follow-up requests")
+    uvicorn.run("src.api:app", host=Config.API_HOST, port=Config.API_PORT, workers=Config.API_WORKERS)
@@ -0,0 +1,67 @@
+"""
+Cooperative cancellation of queries and background jobs.
+
+A CancellationToken is bound to the current context with cancellation_scope,
+the same way a request id is bound for tracing, so it follows the work into
+job threads and quiz worker threads without being passed through every call.
+Long-running code calls check_cancelled between units of work (PDF pages, OCR
+pages, quiz chunks, pieces of a streamed model response); once the token is
+cancelled, the next check raises OperationCancelledError. Closing a streamed
+model response aborts the underlying request, so no further tokens are
+generated or billed.
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from src.exceptions import OperationCancelledError
+
+_current_token: contextvars.ContextVar = contextvars.ContextVar("cancellation_token", default=None)
+
+
+class CancellationToken:
+    """Flag shared between the code doing some work and whoever may cancel it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation has been requested."""
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Request cancellation. The work stops at its next check."""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    def raise_if_cancelled(self):
+        """Raise OperationCancelledError if cancellation has been requested."""
+        if self._event.is_set():
+            raise OperationCancelledError(self.reason)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """Return the token bound to the current context, if any."""
+    return _current_token.get()
+
+
+def check_cancelled():
+    """Raise OperationCancelledError if the current context's token has been cancelled."""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def cancellation_scope(token: CancellationToken):
+    """Bind a token to the current context for the duration of the block."""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
@@ -0,0 +1,129 @@
+"""
+Chat message rendering helpers for the Streamlit interface.
+
+Messages are rendered to HTML fragments once and cached by message id, and
+only a window of the most recent messages is drawn on each rerun.
+"""
+
+import hashlib
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def new_message(role: str, content: str, **metadata) -> Dict[str, Any]:
+    """
+    Create a chat message with a stable identifier.
+
+    Args:
+        role (str): Either "user" or "assistant"
+        content (str): Message text
+        **metadata: Extra fields stored on the message, e.g. source="glossary"
+
+    Returns:
+        Dict[str, Any]: Message dictionary for st.session_state.messages
+    """
+    return {"id": uuid.uuid4().hex, "role": role, "content": content, **metadata}
+
+
+def message_id(message: Dict[str, Any]) -> str:
+    """
+    Return the identifier of a message.
+
+    Messages created before ids were introduced (e.g. restored chat history)
+    get an id derived from their role and content.
+
+    Args:
+        message (Dict[str, Any]): Chat message
+
+    Returns:
+        str: Message identifier
+    """
+    if "id" in message:
+        return message["id"]
+    digest = hashlib.sha1(f"{message['role']}\0{message['content']}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def render_message_html(message: Dict[str, Any], annotate: Optional[Callable[[str], str]] = None) -> str:
+    """
+    Render a chat message to the HTML fragment displayed in the chat container.
+
+    Args:
+        message (Dict[str, Any]): Chat message
+        annotate (Callable, optional): Applied to assistant replies, e.g. to highlight glossary terms
+
+    Returns:
+        str: HTML fragment for the message
+    """
+    if message["role"] == "assistant":
+        content = annotate(message["content"]) if annotate else message["content"]
+        # data-new-message lets the JS apply the typing effect to the latest reply
+        return f'<div class="bot-message" data-new-message="true">{content}</div>'
+    return f'<div class="user-message">{message["content"]}</div>'
+
+
+class RenderCache:
+    """Least-recently-used cache of rendered message fragments keyed by message id."""
+
+    def __init__(self, max_size: int = 500, renderer: Callable[[Dict[str, Any]], str] = render_message_html):
+        """
+        Create a render cache.
+
+        Args:
+            max_size (int): Maximum number of fragments to keep
+            renderer (Callable): Function that renders a message to HTML
+        """
+        self.max_size = max_size
+        self.renderer = renderer
+        self._fragments: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, message: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Return the rendered fragment for a message, rendering it on a miss.
+
+        Args:
+            message (Dict[str, Any]): Chat message
+
+        Returns:
+            Tuple[str, bool]: The HTML fragment and whether it was freshly rendered
+        """
+        key = message_id(message)
+        fragment = self._fragments.get(key)
+        if fragment is not None:
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return fragment, False
+
+        self.misses += 1
+        fragment = self.renderer(message)
+        self._fragments[key] = fragment
+        if len(self._fragments) > self.max_size:
+            self._fragments.popitem(last=False)
+        return fragment, True
+
+    def clear(self):
+        """Drop all cached fragments."""
+        self._fragments.clear()
+
+    def __len__(self) -> int:
+        return len(self._fragments)
+
+
+def visible_window(messages: List[Dict[str, Any]], limit: Optional[int]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Select the most recent messages to display.
+
+    Args:
+        messages (List[Dict[str, Any]]): Full conversation
+        limit (int, optional): Maximum number of messages to show, None for all
+
+    Returns:
+        Tuple[int, List[Dict[str, Any]]]: Number of hidden earlier messages and the visible messages
+    """
+    if limit is None or limit >= len(messages):
+        return 0, messages
+    hidden = len(messages) - limit
+    return hidden, messages[hidden:]
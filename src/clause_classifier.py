@@ -0,0 +1,245 @@
+"""
+Rule-based classification of contract clauses.
+
+The keyword rules of every clause type are compiled into one regular
+expression and found in a single pass over the lowercased document; a second,
+line-anchored pass finds the headings. Each section, from one heading to the
+next, is tagged with the clause types it covers: a keyword in the heading is
+strong evidence, and keywords in the body count once each. Tags record the
+page the section starts on.
+
+The tags give an instant "clauses found" preview before the model answers,
+and decide which sections of a long document are sent to the model.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Clause types in priority order for prompt selection, with display labels and keyword patterns
+CLAUSE_TYPES: List[Tuple[str, str, str]] = [
+    ("indemnity", "Indemnity", r"indemnif\w*|indemnit(?:y|ies)|hold\s+harmless"),
+    ("liability", "Limitation of Liability",
+     r"limitation\s+of\s+liability|aggregate\s+liability|liability\s+(?:is|shall\s+be)\s+(?:capped|limited)"
+     r"|consequential\s+(?:loss|damages)"),
+    ("termination", "Termination", r"terminat\w*|expiry\s+of\s+(?:this|the)\s+agreement"),
+    ("arbitration", "Arbitration and Disputes", r"arbitrat\w*|mediation|dispute\s+resolution"),
+    ("jurisdiction", "Governing Law and Jurisdiction", r"governing\s+law|jurisdiction|exclusive\s+venue"),
+    ("penalty", "Penalties and Liquidated Damages", r"liquidated\s+damages|penalt(?:y|ies)"),
+    ("non_compete", "Non-Compete and Non-Solicitation", r"non-?compet\w*|non-?solicit\w*|restrictive\s+covenants?"),
+    ("renewal", "Automatic Renewal", r"automatic(?:ally)?\s+renew\w*|renewal\s+term"),
+    ("confidentiality", "Confidentiality", r"confidential\w*|non-?disclosure"),
+    ("intellectual_property", "Intellectual Property", r"intellectual\s+property|copyrights?|trade\s?marks?|patents?"),
+    ("data_protection", "Data Protection", r"personal\s+data|data\s+protection|gdpr"),
+    ("warranty", "Warranties", r"warrant(?:y|ies)|represents\s+and\s+warrants"),
+    ("force_majeure", "Force Majeure", r"force\s+majeure|acts?\s+of\s+god"),
+    ("payment", "Payment", r"payments?|invoices?|late\s+fees?"),
+    ("assignment", "Assignment", r"assign(?:ment)?\s+(?:of\s+)?(?:this|the)\s+agreement|may\s+not\s+assign"),
+]
+
+CLAUSE_LABELS = {name: label for name, label, _ in CLAUSE_TYPES}
+
+# Heading lines: "12. Indemnity", "12.3 Term", "Section 4", "ARTICLE IV", "TERMINATION"
+_HEADING = re.compile(
+    r"^[ \t]*(?:(?i:article|section|clause|schedule)\s+[\dIVXLC]+\b"
+    r"|\d+(?:\.\d+)*[.)]?[ \t]+[A-Z]"
+    r"|[A-Z][A-Z0-9 ,;&'/-]{3,60}[ \t]*$)",
+    re.MULTILINE
+)
+
+# One alternation of all keyword rules. Named groups per type make the scan several times slower,
+# so the type of each (rare) match is looked up afterwards.
+_KEYWORDS = r"\b(?=[a-z])(?:" + "|".join(pattern for _, _, pattern in CLAUSE_TYPES) + r")\b"
+_KEYWORD_SCANNER = re.compile(_KEYWORDS)
+_KEYWORD_SCANNER_IGNORECASE = re.compile(_KEYWORDS.replace("(?=[a-z])", "(?=[a-zA-Z])"), re.IGNORECASE)
+_TYPE_MATCHERS = [(name, re.compile(pattern)) for name, _, pattern in CLAUSE_TYPES]
+_keyword_types: Dict[str, str] = {}
+
+
+def _keyword_type(keyword: str) -> Optional[str]:
+    """Return the clause type of a matched keyword."""
+    if keyword not in _keyword_types:
+        _keyword_types[keyword] = next((name for name, matcher in _TYPE_MATCHERS if matcher.fullmatch(keyword)), None)
+    return _keyword_types[keyword]
+
+_OMITTED = "[... sections omitted ...]"
+
+# Weight of a keyword in a section's heading, and the score at which a section is tagged
+HEADING_WEIGHT = 3
+TAG_THRESHOLD = 2
+
+
+class Section(NamedTuple):
+    """Text from one heading to the next."""
+    heading: str
+    start: int
+    end: int
+    page: Optional[int]
+    scores: Dict[str, int]
+
+
+class ClauseTag(NamedTuple):
+    """A clause type found in a section."""
+    clause_type: str
+    label: str
+    section: int
+    start: int
+    end: int
+    page: Optional[int]
+    score: int
+
+
+class ClassifiedDocument:
+    """Sections of a document and the clause types found in them."""
+
+    def __init__(self, text: str, sections: List[Section]):
+        self.text = text
+        self.sections = sections
+        self.tags = [
+            ClauseTag(clause_type, CLAUSE_LABELS[clause_type], i, section.start, section.end, section.page, score)
+            for i, section in enumerate(sections)
+            for clause_type, score in section.scores.items()
+            if score >= TAG_THRESHOLD
+        ]
+
+    def found(self) -> Dict[str, List[Optional[int]]]:
+        """
+        Return the pages each clause type was found on.
+
+        Returns:
+            Dict[str, List[int]]: Pages by clause type, in priority order of the types
+        """
+        pages: Dict[str, List[Optional[int]]] = {}
+        for name, _, _ in CLAUSE_TYPES:
+            type_pages = sorted({tag.page for tag in self.tags if tag.clause_type == name},
+                                key=lambda page: page or 0)
+            if type_pages:
+                pages[name] = type_pages
+        return pages
+
+    def _found_items(self) -> List[str]:
+        items = []
+        for name, pages in self.found().items():
+            numbers = [str(page) for page in pages if page is not None]
+            if numbers:
+                prefix = "page" if len(numbers) == 1 else "pages"
+                items.append(f"{CLAUSE_LABELS[name]} ({prefix} {', '.join(numbers)})")
+            else:
+                items.append(CLAUSE_LABELS[name])
+        return items
+
+    def summary(self) -> str:
+        """One-line list of the clause types found, for the prompt."""
+        return "; ".join(self._found_items()) or "none"
+
+    def summary_markdown(self) -> str:
+        """Markdown "clauses found" preview shown before the model answers."""
+        items = self._found_items()
+        if not items:
+            return "**Clauses found:** none of the common clause types were detected."
+        return "**Clauses found:**\n" + "\n".join(f"- {item}" for item in items)
+
+    def select_text(self, max_chars: int) -> str:
+        """
+        Select the text sent to the model when the document is too long to send whole.
+
+        The opening section (parties and recitals) is always kept, then tagged
+        sections in priority order of their clause types until max_chars is
+        reached. Sections are returned in document order, with omissions marked.
+
+        Args:
+            max_chars (int): Maximum characters of document text; 0 keeps the whole document
+
+        Returns:
+            str: Document text, or the selected sections of it
+        """
+        if not max_chars or len(self.text) <= max_chars or len(self.sections) <= 1:
+            return self.text[:max_chars] if max_chars else self.text
+
+        priority = {name: rank for rank, (name, _, _) in enumerate(CLAUSE_TYPES)}
+        ranked = sorted(self.tags, key=lambda tag: (priority[tag.clause_type], -tag.score, tag.start))
+        selected = {0}
+        # Each selected section may add an omission marker and separators
+        overhead = len(_OMITTED) + 4
+        budget = max_chars - (self.sections[0].end - self.sections[0].start) - overhead
+        for tag in ranked:
+            if tag.section in selected:
+                continue
+            length = tag.end - tag.start + overhead
+            if length <= budget:
+                selected.add(tag.section)
+                budget -= length
+
+        parts = []
+        previous = -1
+        for index in sorted(selected):
+            if index != previous + 1:
+                parts.append(_OMITTED)
+            section = self.sections[index]
+            parts.append(self.text[section.start:section.end].strip())
+            previous = index
+        if previous != len(self.sections) - 1:
+            parts.append(_OMITTED)
+        return "\n\n".join(parts)[:max_chars]
+
+
+def classify_clauses(text: str, page_starts: Optional[Sequence[Tuple[int, int]]] = None) -> ClassifiedDocument:
+    """
+    Split a document into sections and tag the clause types in each.
+
+    Args:
+        text (str): Extracted document text
+        page_starts (Sequence[Tuple[int, int]], optional): (offset, page number) of each page in text,
+            in order, used to give tags page numbers
+
+    Returns:
+        ClassifiedDocument: Sections and clause tags
+    """
+    offsets = [offset for offset, _ in page_starts] if page_starts else []
+
+    def page_at(offset):
+        if not offsets:
+            return None
+        index = bisect_right(offsets, offset) - 1
+        return page_starts[max(index, 0)][1]
+
+    # Section boundaries
+    heading_starts = [0]
+    headings = [""]
+    for match in _HEADING.finditer(text):
+        start = match.start()
+        line_end = text.find("\n", start)
+        heading = text[start:line_end if line_end != -1 else len(text)].strip()[:80]
+        if start > heading_starts[-1]:
+            heading_starts.append(start)
+            headings.append(heading)
+        elif start == 0:
+            headings[0] = heading
+
+    # Keyword hits of every clause type in one scan; a case-sensitive scan of the lowercased
+    # text is much faster than a case-insensitive one, but only if lowercasing keeps the offsets
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        hits = [(match.start(), _keyword_type(match.group())) for match in _KEYWORD_SCANNER.finditer(lowered)]
+    else:
+        hits = [(match.start(), _keyword_type(match.group().lower()))
+                for match in _KEYWORD_SCANNER_IGNORECASE.finditer(text)]
+
+    scores: List[Dict[str, int]] = [{} for _ in heading_starts]
+    heading_ends = [start + len(heading) + 1 for start, heading in zip(heading_starts, headings)]
+    section = 0
+    for offset, kind in hits:
+        if kind is None:
+            continue
+        while section + 1 < len(heading_starts) and heading_starts[section + 1] <= offset:
+            section += 1
+        weight = HEADING_WEIGHT if section and offset < heading_ends[section] else 1
+        scores[section][kind] = scores[section].get(kind, 0) + weight
+
+    sections = []
+    for i, start in enumerate(heading_starts):
+        end = heading_starts[i + 1] if i + 1 < len(heading_starts) else len(text)
+        if i == 0 and start == end:
+            continue
+        sections.append(Section(headings[i], start, end, page_at(start), scores[i]))
+    return ClassifiedDocument(text, sections)
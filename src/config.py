@@ -27,10 +27,128 @@ class Config:
     # Memory settings
     MEMORY_TYPE = os.getenv("MEMORY_TYPE", "conversation_buffer")
     MAX_MEMORY_ITEMS = int(os.getenv("MAX_MEMORY_ITEMS", "10"))
+    # Session conversations kept per process, each with its own memory
+    CONVERSATIONS_MAX = int(os.getenv("CONVERSATIONS_MAX", "256"))
     
     # Logging settings
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     
+    # Chat display settings
+    CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+    RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "500"))
+    # Example questions offered in the sidebar; their answers are precomputed during warm-up
+    EXAMPLE_QUESTIONS = [
+        "What are my rights if I'm facing wrongful termination?",
+        "Can you explain the process of filing for bankruptcy?"
+    ]
+    
+    # Document processing settings
+    CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "4000"))
+    # Longest document text sent to the model; longer documents keep their highest-priority clauses (0 sends all)
+    DOCUMENT_PROMPT_MAX_CHARS = int(os.getenv("DOCUMENT_PROMPT_MAX_CHARS", "120000"))
+    # Extracted, classified and chunked documents kept in memory, e.g. prepared on upload before analysis
+    PREPARED_DOCUMENTS_MAX = int(os.getenv("PREPARED_DOCUMENTS_MAX", "16"))
+    
+    # Incremental analysis: documents of at least INCREMENTAL_ANALYSIS_MIN_CHARS characters (0 disables) are
+    # analyzed from summaries of sections of about ANALYSIS_SECTION_CHARS characters, several written at once;
+    # page text and summaries are kept by content hash so a revised draft is only re-done where it changed
+    INCREMENTAL_ANALYSIS_MIN_CHARS = int(os.getenv("INCREMENTAL_ANALYSIS_MIN_CHARS", "60000"))
+    ANALYSIS_SECTION_CHARS = int(os.getenv("ANALYSIS_SECTION_CHARS", "12000"))
+    ANALYSIS_SECTION_WORKERS = int(os.getenv("ANALYSIS_SECTION_WORKERS", "4"))
+    REVISION_CACHE_ENABLED = os.getenv("REVISION_CACHE_ENABLED", "True").lower() == "true"
+    REVISION_CACHE_PATH = os.getenv("REVISION_CACHE_PATH", "user_data/revision_cache.sqlite3")
+    REVISION_CACHE_MAX_ENTRIES = int(os.getenv("REVISION_CACHE_MAX_ENTRIES", "50000"))
+    
+    # Analysis cache settings (shared across sessions and processes)
+    ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() == "true"
+    ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "user_data/analysis_cache.sqlite3")
+    ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1000"))
+    
+    # Extracted document store (compressed page text, memory-mapped for reads)
+    DOCUMENT_STORE_ENABLED = os.getenv("DOCUMENT_STORE_ENABLED", "True").lower() == "true"
+    DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", "user_data/documents")
+    DOCUMENT_STORE_MAX_DOCUMENTS = int(os.getenv("DOCUMENT_STORE_MAX_DOCUMENTS", "1000"))
+    DOCUMENT_STORE_OPEN_FILES = int(os.getenv("DOCUMENT_STORE_OPEN_FILES", "64"))
+    
+    # OCR settings for scanned pages (needs pytesseract, pypdfium2 and the tesseract binary)
+    OCR_ENABLED = os.getenv("OCR_ENABLED", "True").lower() == "true"
+    OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "user_data/ocr_cache")
+    OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "50"))
+    OCR_TIMEOUT_SECONDS = float(os.getenv("OCR_TIMEOUT_SECONDS", "120"))
+    OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+    OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+    OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0"))
+    
+    # Document comparison settings (maximum characters of changed clauses sent to the model)
+    COMPARE_MAX_PROMPT_CHARS = int(os.getenv("COMPARE_MAX_PROMPT_CHARS", "24000"))
+    
+    # Matter workspace settings (passages retrieved per question and their length in characters)
+    WORKSPACE_TOP_K = int(os.getenv("WORKSPACE_TOP_K", "8"))
+    WORKSPACE_PASSAGE_CHARS = int(os.getenv("WORKSPACE_PASSAGE_CHARS", "1500"))
+    WORKSPACES_MAX = int(os.getenv("WORKSPACES_MAX", "64"))
+    
+    # Background job settings
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_INTERACTIVE_WORKERS = int(os.getenv("JOB_INTERACTIVE_WORKERS", "8"))
+    JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    # Seconds between checks for jobs whose session has ended, which are then cancelled
+    JOB_REAPER_INTERVAL = float(os.getenv("JOB_REAPER_INTERVAL", "30"))
+    
+    # Scheduler settings: model requests and extractions running at once, model slots kept for interactive
+    # questions, and seconds of waiting that raise queued work by one priority class
+    SCHEDULER_LLM_SLOTS = int(os.getenv("SCHEDULER_LLM_SLOTS", "4"))
+    SCHEDULER_LLM_RESERVED = int(os.getenv("SCHEDULER_LLM_RESERVED", "1"))
+    SCHEDULER_EXTRACTION_SLOTS = int(os.getenv("SCHEDULER_EXTRACTION_SLOTS", "2"))
+    SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", "15"))
+    
+    # Tracing settings
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    TRACE_RETENTION_DAYS = int(os.getenv("TRACE_RETENTION_DAYS", "7"))
+    
+    # Profiling settings (profiles can also be requested per request)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "logs/profiles")
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+    # Token a client must supply to profile its own requests outside DEBUG_MODE; unset disables on-demand profiling
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    
+    # Glossary settings (the term file itself is read from GLOSSARY_FILE by src.glossary_store)
+    GLOSSARY_PAGE_SIZE = int(os.getenv("GLOSSARY_PAGE_SIZE", "20"))
+    GLOSSARY_ANSWERS_ENABLED = os.getenv("GLOSSARY_ANSWERS_ENABLED", "True").lower() == "true"
+    
+    # Quiz generation settings
+    QUIZ_MAX_WORKERS = int(os.getenv("QUIZ_MAX_WORKERS", "4"))
+    QUIZ_QUESTIONS_PER_CHUNK = int(os.getenv("QUIZ_QUESTIONS_PER_CHUNK", "5"))
+    QUIZ_MAX_CHUNKS = int(os.getenv("QUIZ_MAX_CHUNKS", "8"))
+    
+    # Prompt settings: "compact" uses the short per-mode templates, "full" the original template,
+    # "ab" splits requests between the two by request id
+    PROMPT_STYLE = os.getenv("PROMPT_STYLE", "compact").lower()
+    
+    # Metrics settings (0 disables the standalone /metrics server)
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+    
+    # Warm-up settings: build the bot and caches at process start, optionally send a tiny probe request
+    # to the model and precompute the example answers; the process reports ready only once done
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    WARMUP_PROBE = os.getenv("WARMUP_PROBE", "False").lower() == "true"
+    WARMUP_EXAMPLES = os.getenv("WARMUP_EXAMPLES", "True").lower() == "true"
+    
+    # HTTP API settings
+    API_HOST = os.getenv("API_HOST", "0.0.0.0")
+    API_PORT = int(os.getenv("API_PORT", "8000"))
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+    API_MAX_CONCURRENT_REQUESTS = int(os.getenv("API_MAX_CONCURRENT_REQUESTS", "8"))
+    API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "120"))
+    API_MAX_QUEUED_JOBS = int(os.getenv("API_MAX_QUEUED_JOBS", "16"))
+    # First of API_WORKERS consecutive ports, one per worker, serving that worker's metrics (0 disables)
+    API_WORKER_METRICS_PORT = int(os.getenv("API_WORKER_METRICS_PORT", "0"))
+    
     @classmethod
     def validate(cls) -> Optional[str]:
         """
@@ -0,0 +1,214 @@
+"""
+Clause-level comparison of two versions of a contract.
+
+Both versions are split into clauses at their headings ("12.", "12.3",
+"Section 4", "ARTICLE IV", "TERMINATION", "(a)"), falling back to
+paragraphs when a document has no headings. The clause sequences are aligned
+with difflib.SequenceMatcher on normalized text, so renumbering, reflowed
+lines and moved page breaks are not reported as changes. Within a replaced
+block, clauses similar enough to each other are paired as modifications and
+the rest are reported as removed or added.
+
+Only the changed clauses, each with the heading of the clause before it, are
+formatted for the model, so the prompt grows with the size of the change
+rather than the size of the document.
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, NamedTuple, Optional
+
+ADDED = "added"
+REMOVED = "removed"
+MODIFIED = "modified"
+
+_NUMBERED_HEADING = re.compile(
+    r"^\s*(?:(?:article|section|clause|schedule|annex|exhibit)\s+[\dIVXLC]+\b[\w.]*|\d+(?:\.\d+)*[.)]\s+\S|\d+(?:\.\d+)+\s+\S|\([a-z]{1,3}\)\s+\S)",
+    re.IGNORECASE
+)
+_CAPITALIZED_HEADING = re.compile(r"^\s*[A-Z][A-Z0-9 ,;&'/-]{3,60}\s*$")
+# Page numbers and running footers move between versions and are not part of any clause
+_PAGE_MARKER = re.compile(r"^\s*(?:page\s+)?\d+(?:\s+of\s+\d+)?\s*$", re.IGNORECASE)
+_ENUMERATOR = re.compile(
+    r"^(?:(?:article|section|clause|schedule|annex|exhibit)\s+[\dIVXLC]+\b[\w.]*|\d+(?:\.\d+)*[.)]|\d+(?:\.\d+)+|\([a-z]{1,3}\))\s*",
+    re.IGNORECASE
+)
+
+# Minimum similarity for a removed and an added clause to be reported as one modification
+PAIRING_THRESHOLD = 0.5
+
+
+class Clause(NamedTuple):
+    """A clause of a document."""
+    index: int
+    heading: str
+    text: str
+
+
+class ClauseChange(NamedTuple):
+    """An added, removed or modified clause."""
+    kind: str
+    old: Optional[Clause]
+    new: Optional[Clause]
+    # Heading of the clause preceding the change, to locate it in the document
+    context: str
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_NUMBERED_HEADING.match(line) or _CAPITALIZED_HEADING.match(line))
+
+
+def _heading_of(text: str) -> str:
+    first_line = text.strip().split("\n", 1)[0].strip()
+    return first_line[:80]
+
+
+def segment_clauses(text: str) -> List[Clause]:
+    """
+    Split a document into clauses.
+
+    Args:
+        text (str): Extracted document text
+
+    Returns:
+        List[Clause]: Clauses in document order
+    """
+    lines = [line for line in text.splitlines() if not _PAGE_MARKER.match(line)]
+    segments = []
+    current = []
+    for line in lines:
+        if current and _is_heading(line):
+            segments.append("\n".join(current))
+            current = []
+        if line.strip() or current:
+            current.append(line)
+    if current:
+        segments.append("\n".join(current))
+
+    if len(segments) <= 1:
+        # No headings; compare paragraph by paragraph
+        segments = re.split(r"\n\s*\n", "\n".join(lines))
+
+    segments = [segment.strip() for segment in segments if segment.strip()]
+    return [Clause(i, _heading_of(segment), segment) for i, segment in enumerate(segments)]
+
+
+def normalize_clause(text: str) -> str:
+    """Normalize a clause for comparison: drop its number, case and whitespace differences."""
+    return " ".join(_ENUMERATOR.sub("", text.strip(), count=1).lower().split())
+
+
+def _similarity(old: str, new: str) -> float:
+    matcher = SequenceMatcher(None, old.split(), new.split(), autojunk=False)
+    # quick_ratio is an upper bound and much cheaper than ratio
+    if matcher.quick_ratio() < PAIRING_THRESHOLD:
+        return 0.0
+    return matcher.ratio()
+
+
+def _pair_block(old_clauses: List[Clause], new_clauses: List[Clause], old_keys: List[str],
+                new_keys: List[str]) -> List[ClauseChange]:
+    """Pair the clauses of a replaced block into modifications, removals and additions."""
+    pairs = {}
+    used = set()
+    for old_clause in old_clauses:
+        best, best_score = None, PAIRING_THRESHOLD
+        for new_clause in new_clauses:
+            if new_clause.index in used:
+                continue
+            score = _similarity(old_keys[old_clause.index], new_keys[new_clause.index])
+            if score >= best_score:
+                best, best_score = new_clause, score
+        if best is not None:
+            pairs[best.index] = old_clause
+            used.add(best.index)
+
+    changes = []
+    paired_old = {clause.index for clause in pairs.values()}
+    for old_clause in old_clauses:
+        if old_clause.index not in paired_old:
+            changes.append(ClauseChange(REMOVED, old_clause, None, ""))
+    for new_clause in new_clauses:
+        old_clause = pairs.get(new_clause.index)
+        if old_clause is None:
+            changes.append(ClauseChange(ADDED, None, new_clause, ""))
+        else:
+            changes.append(ClauseChange(MODIFIED, old_clause, new_clause, ""))
+    return changes
+
+
+def diff_clauses(old_clauses: List[Clause], new_clauses: List[Clause]) -> List[ClauseChange]:
+    """
+    Align two versions' clauses and return the changes.
+
+    Args:
+        old_clauses (List[Clause]): Clauses of the earlier version
+        new_clauses (List[Clause]): Clauses of the later version
+
+    Returns:
+        List[ClauseChange]: Changes in document order
+    """
+    old_keys = [normalize_clause(clause.text) for clause in old_clauses]
+    new_keys = [normalize_clause(clause.text) for clause in new_clauses]
+    matcher = SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # The clause before the change in the new version, or in the old one for a removal at the start
+        if j1 > 0:
+            context = new_clauses[j1 - 1].heading
+        elif i1 > 0:
+            context = old_clauses[i1 - 1].heading
+        else:
+            context = "start of document"
+        if tag == "delete":
+            block = [ClauseChange(REMOVED, clause, None, "") for clause in old_clauses[i1:i2]]
+        elif tag == "insert":
+            block = [ClauseChange(ADDED, None, clause, "") for clause in new_clauses[j1:j2]]
+        else:
+            block = _pair_block(old_clauses[i1:i2], new_clauses[j1:j2], old_keys, new_keys)
+        changes.extend(change._replace(context=context) for change in block)
+    return changes
+
+
+def count_changes(changes: List[ClauseChange]) -> Dict[str, int]:
+    """Count changes by kind."""
+    counts = {ADDED: 0, REMOVED: 0, MODIFIED: 0}
+    for change in changes:
+        counts[change.kind] += 1
+    return counts
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit].rstrip()} [...]"
+
+
+def format_changes(changes: List[ClauseChange], max_chars: int = 24000, max_clause_chars: int = 3000) -> str:
+    """
+    Format changes as the text sent to the model.
+
+    Args:
+        changes (List[ClauseChange]): Changes from diff_clauses
+        max_chars (int): Maximum length of the result; later changes are summarized as omitted
+        max_clause_chars (int): Maximum length of each clause version
+
+    Returns:
+        str: Changes with their location and old and new wording
+    """
+    parts = []
+    length = 0
+    for number, change in enumerate(changes, 1):
+        lines = [f"Change {number} ({change.kind}, after: {change.context})"]
+        if change.old is not None:
+            lines.append(f"OLD: {_truncate(change.old.text, max_clause_chars)}")
+        if change.new is not None:
+            lines.append(f"NEW: {_truncate(change.new.text, max_clause_chars)}")
+        part = "\n".join(lines)
+        if parts and length + len(part) > max_chars:
+            parts.append(f"[{len(changes) - number + 1} further changes omitted]")
+            break
+        parts.append(part)
+        length += len(part) + 2
+    return "\n\n".join(parts)
@@ -0,0 +1,258 @@
+"""
+Compressed store of extracted document text with random page access.
+
+Each document is one file named by its content hash. The file starts with a
+fixed-size index (page count, the offset of every compressed page block and
+each page's length in characters) followed by one zlib block per page:
+
+    magic (8 bytes) | page count (uint32) | reserved (uint32)
+    block offsets ((pages + 1) x uint64) | page lengths (pages x uint32)
+    page blocks
+
+Files are memory-mapped for reads, so fetching a page decompresses that page
+only, and the text of a clause is read from the pages it spans. The OS page
+cache holds the hot documents, shared by every worker process on the host,
+instead of each request keeping the full text as a Python string.
+
+Offsets and page numbers match join_pages and page_offsets in src.utils:
+pages with text are joined with a blank line and numbered from 1.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from src.logger import logger
+
+_MAGIC = b"LBDOCS1\0"
+_HEADER = struct.Struct("<8sII")
+_OFFSET = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+# Pages are joined with this separator, as in join_pages
+_SEPARATOR = "\n\n"
+
+
+class DocumentStore:
+    """Per-page compressed document text, memory-mapped for reads."""
+
+    def __init__(self, directory: str, max_documents: int = 1000, max_open: int = 64, compression_level: int = 6):
+        """
+        Open (and create if needed) a document store.
+
+        Args:
+            directory (str): Directory holding one file per document
+            max_documents (int): Documents kept; the least recently stored or read are removed
+            max_open (int): Memory-mapped files kept open at once
+            compression_level (int): zlib compression level, 1 (fastest) to 9 (smallest)
+        """
+        self.directory = directory
+        self.max_documents = max_documents
+        self.max_open = max_open
+        self.compression_level = compression_level
+        # document hash -> (mmap, page count, block offsets, page lengths), least recently used first
+        self._open: "OrderedDict[str, Tuple[mmap.mmap, int, List[int], List[int]]]" = OrderedDict()
+        # document hash -> number of holders; pinned documents are not pruned by this process
+        self._pins: Counter = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document_hash: str) -> str:
+        return os.path.join(self.directory, f"{document_hash}.pages")
+
+    def __contains__(self, document_hash: str) -> bool:
+        return os.path.exists(self._path(document_hash))
+
+    def put(self, document_hash: str, pages: Sequence[str]):
+        """
+        Store the pages of a document. Storing a document that is already present does nothing.
+
+        Args:
+            document_hash (str): Content hash of the document
+            pages (Sequence[str]): Text of each page, empty for pages without text
+        """
+        path = self._path(document_hash)
+        if os.path.exists(path):
+            return
+        blocks = [zlib.compress(page.encode("utf-8"), self.compression_level) for page in pages]
+        index_size = _HEADER.size + _OFFSET.size * (len(pages) + 1) + _LENGTH.size * len(pages)
+        offsets = [index_size]
+        for block in blocks:
+            offsets.append(offsets[-1] + len(block))
+
+        # Write then rename so readers never map a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as store_file:
+            store_file.write(_HEADER.pack(_MAGIC, len(pages), 0))
+            store_file.write(b"".join(_OFFSET.pack(offset) for offset in offsets))
+            store_file.write(b"".join(_LENGTH.pack(len(page)) for page in pages))
+            for block in blocks:
+                store_file.write(block)
+        os.replace(temp_path, path)
+        logger.info(f"Stored {len(pages)} pages of document {document_hash[:12]} "
+                    f"({offsets[-1] / 1024:.1f} KiB compressed)")
+        self.prune()
+
+    def _entry(self, document_hash: str):
+        """Return the open mapping of a document, opening it if needed. Caller holds the lock."""
+        entry = self._open.get(document_hash)
+        if entry is not None:
+            self._open.move_to_end(document_hash)
+            return entry
+
+        path = self._path(document_hash)
+        try:
+            with open(path, "rb") as store_file:
+                mapping = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise KeyError(document_hash) from None
+        magic, page_count, _ = _HEADER.unpack_from(mapping, 0)
+        if magic != _MAGIC:
+            mapping.close()
+            raise ValueError(f"Not a document store file: {path}")
+        position = _HEADER.size
+        offsets = [_OFFSET.unpack_from(mapping, position + i * _OFFSET.size)[0] for i in range(page_count + 1)]
+        position += _OFFSET.size * (page_count + 1)
+        lengths = [_LENGTH.unpack_from(mapping, position + i * _LENGTH.size)[0] for i in range(page_count)]
+
+        entry = (mapping, page_count, offsets, lengths)
+        self._open[document_hash] = entry
+        # Reading refreshes the file's age for pruning
+        os.utime(path)
+        while len(self._open) > self.max_open:
+            _, (old_mapping, _, _, _) = self._open.popitem(last=False)
+            old_mapping.close()
+        return entry
+
+    def page_count(self, document_hash: str) -> int:
+        """Return the number of pages of a stored document."""
+        with self._lock:
+            return self._entry(document_hash)[1]
+
+    def page_starts(self, document_hash: str) -> List[Tuple[int, int]]:
+        """
+        Return the (character offset, page number) of each page with text, as page_offsets does.
+
+        Args:
+            document_hash (str): Content hash of the document
+
+        Returns:
+            List[Tuple[int, int]]: Offsets in the joined text and page numbers from 1
+        """
+        with self._lock:
+            lengths = self._entry(document_hash)[3]
+        starts = []
+        position = 0
+        for number, length in enumerate(lengths, 1):
+            if length:
+                starts.append((position, number))
+                position += length + len(_SEPARATOR)
+        return starts
+
+    def get_pages(self, document_hash: str, first: int = 1, last: Optional[int] = None) -> List[str]:
+        """
+        Read a range of pages, decompressing only those pages.
+
+        Args:
+            document_hash (str): Content hash of the document
+            first (int): First page number, from 1
+            last (int, optional): Last page number, inclusive; defaults to the last page
+
+        Returns:
+            List[str]: Text of each page in the range
+
+        Raises:
+            KeyError: If the document is not stored
+        """
+        with self._lock:
+            mapping, page_count, offsets, _ = self._entry(document_hash)
+            last = page_count if last is None else min(last, page_count)
+            first = max(first, 1)
+            # Copy the compressed bytes under the lock, so the mapping cannot be closed mid-read
+            blocks = [mapping[offsets[i - 1]:offsets[i]] for i in range(first, last + 1)]
+        return [zlib.decompress(block).decode("utf-8") for block in blocks]
+
+    def get_page(self, document_hash: str, page_number: int) -> str:
+        """Read one page, numbered from 1."""
+        pages = self.get_pages(document_hash, page_number, page_number)
+        if not pages:
+            raise IndexError(f"Page {page_number} is out of range")
+        return pages[0]
+
+    def get_text(self, document_hash: str, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Read a span of the joined document text, decompressing only the pages it covers.
+
+        Args:
+            document_hash (str): Content hash of the document
+            start (int): Character offset of the span in the joined text
+            end (int, optional): End offset, exclusive; defaults to the end of the document
+
+        Returns:
+            str: The text between start and end
+        """
+        starts = self.page_starts(document_hash)
+        if not starts:
+            return ""
+        with self._lock:
+            lengths = self._entry(document_hash)[3]
+        total = starts[-1][0] + lengths[starts[-1][1] - 1] + len(_SEPARATOR)
+        end = total if end is None else min(end, total)
+        if start >= end:
+            return ""
+
+        # Pages overlapping [start, end)
+        covered = [(offset, number) for offset, number in starts
+                   if offset < end and offset + lengths[number - 1] + len(_SEPARATOR) > start]
+        first_offset, first_number = covered[0]
+        pages = self.get_pages(document_hash, first_number, covered[-1][1])
+        text = "".join(page + _SEPARATOR for page in pages if page)
+        return text[start - first_offset:end - first_offset]
+
+    def delete(self, document_hash: str):
+        """Remove a stored document."""
+        with self._lock:
+            entry = self._open.pop(document_hash, None)
+            if entry is not None:
+                entry[0].close()
+        try:
+            os.remove(self._path(document_hash))
+        except FileNotFoundError:
+            pass
+
+    def pin(self, document_hash: str):
+        """Keep a document from being pruned until it is unpinned as many times as it was pinned."""
+        with self._lock:
+            self._pins[document_hash] += 1
+
+    def unpin(self, document_hash: str):
+        """Release one pin of a document."""
+        with self._lock:
+            self._pins[document_hash] -= 1
+            if self._pins[document_hash] <= 0:
+                del self._pins[document_hash]
+
+    def prune(self):
+        """Remove the least recently used unpinned documents beyond max_documents."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".pages")]
+        except FileNotFoundError:
+            return
+        excess = len(names) - self.max_documents
+        if excess <= 0:
+            return
+        with self._lock:
+            pinned = set(self._pins)
+        paths = [os.path.join(self.directory, name) for name in names if name[:-len(".pages")] not in pinned]
+        for path in sorted(paths, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0)[:excess]:
+            self.delete(os.path.basename(path)[:-len(".pages")])
+
+    def close(self):
+        """Close all memory-mapped files."""
+        with self._lock:
+            for mapping, _, _, _ in self._open.values():
+                mapping.close()
+            self._open.clear()
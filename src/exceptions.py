@@ -26,6 +26,10 @@ class ConfigurationError(LegalBotException):
     """Exception raised when there is a configuration error."""
     pass
 
+class OperationCancelledError(LegalBotException):
+    """Exception raised when a query or job is cancelled before it finishes."""
+    pass
+
 # Helper functions for exception handling
 
 def handle_exception(exception, default_message="An error occurred"):
@@ -62,6 +66,9 @@ def handle_exception(exception, default_message="An error occurred"):
     
     elif isinstance(exception, ConfigurationError):
         return "Configuration error: Please check the application configuration."
+    
+    elif isinstance(exception, OperationCancelledError):
+        return "Cancelled: The request was cancelled before it finished."
         
     else:
         # For unexpected exceptions, return the default message
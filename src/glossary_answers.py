@@ -0,0 +1,99 @@
+"""
+Glossary answers for definitional questions.
+
+Questions like "What is indemnity?" or "Define habeas corpus" are answered
+directly from the glossary store when the term is found with confidence,
+instead of making a model call.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from src.glossary_store import GlossaryStore, normalize_term
+
+# Whole-question patterns that ask for the meaning of a single term
+_DEFINITION_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r"^(?:what\s+is|what's|whats)\s+(?:the\s+)?(?:meaning|definition)\s+of\s+(?P<term>.+)$",
+        r"^(?:what\s+is|what's|whats|what\s+are|who\s+is)\s+(?P<term>.+)$",
+        r"^what\s+(?:does|do)\s+(?P<term>.+?)\s+mean$",
+        r"^(?:define|explain\s+the\s+term|meaning\s+of|definition\s+of)\s+(?P<term>.+)$",
+        r"^(?P<term>.+?)\s+(?:meaning|definition)$",
+    )
+]
+
+# Leading words and trailing qualifiers that are not part of the term
+_TERM_PREFIX = re.compile(r"^(?:the\s+(?:legal\s+)?term\s+|the\s+|an?\s+)", re.IGNORECASE)
+_TERM_SUFFIX = re.compile(r"\s+(?:in\s+(?:\w+\s+)?law|in\s+legal\s+terms|legally|exactly)$", re.IGNORECASE)
+
+# Fuzzy matches are only trusted for terms long enough that one typo cannot make them another word
+_MIN_FUZZY_LENGTH = 5
+
+
+def extract_definition_term(query: str) -> Optional[str]:
+    """
+    Extract the term from a question that only asks for a definition.
+
+    Args:
+        query (str): User's question
+
+    Returns:
+        Optional[str]: The term asked about, or None if the question is not definitional
+    """
+    question = " ".join(query.split()).rstrip("?!. ")
+    for pattern in _DEFINITION_PATTERNS:
+        match = pattern.match(question)
+        if match:
+            term = _TERM_SUFFIX.sub("", _TERM_PREFIX.sub("", match.group("term")))
+            term = term.strip(" \"'“”‘’`")
+            return term or None
+    return None
+
+
+def find_definition(query: str, store: GlossaryStore) -> Optional[Tuple[str, str]]:
+    """
+    Find the glossary entry a definitional question asks about.
+
+    A match is confident if the term is in the glossary, or if it is one typo
+    away from exactly one glossary term of reasonable length.
+
+    Args:
+        query (str): User's question
+        store (GlossaryStore): Glossary to search
+
+    Returns:
+        Optional[Tuple[str, str]]: (term, definition) on a confident match
+    """
+    term = extract_definition_term(query)
+    if not term:
+        return None
+
+    entry = store.get(term)
+    if entry is not None:
+        return entry
+
+    if len(normalize_term(term)) < _MIN_FUZZY_LENGTH:
+        return None
+    candidates = store.fuzzy_lookup(term, limit=2, max_distance=1)
+    if len(candidates) == 1:
+        return store.get(candidates[0][0])
+    return None
+
+
+def format_definition_answer(term: str, definition: str) -> str:
+    """
+    Format a glossary definition in the bot's response style.
+
+    Args:
+        term (str): Glossary term
+        definition (str): Its definition
+
+    Returns:
+        str: Markdown response
+    """
+    return (
+        f"**Summary:** **{term}**: {definition}\n\n"
+        f"**Recommended Actions:** For how {term.lower()} applies to your situation, with the relevant laws "
+        f"and cases, ask the AI for more detail.\n\n"
+        f"*Answered from the legal glossary.*"
+    )
@@ -0,0 +1,233 @@
+"""
+Multi-pattern glossary term matcher for the Legal Advisor AI.
+
+Builds an Aho-Corasick automaton once from the glossary, then finds every
+glossary term in a text in a single linear pass, independent of the number
+of terms. Matching is case-insensitive and respects word boundaries, so
+multi-word terms like "Breach of Contract" match but "tort" inside "retort"
+does not.
+"""
+
+import html
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from src.glossary_store import get_glossary_store
+
+# Matches HTML tags, so annotation never rewrites text inside a tag's attributes
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+class GlossaryMatch(NamedTuple):
+    """A glossary term found in a text."""
+    start: int
+    end: int
+    term: str
+
+
+def _normalize(text: str) -> str:
+    """
+    Lowercase text and map all whitespace to spaces, keeping every character at the same offset.
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: Normalized text of the same length
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters expand when lowercased (e.g. "İ"); keep those as-is to preserve offsets
+        lowered = "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+    return "".join(" " if c.isspace() else c for c in lowered)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class GlossaryMatcher:
+    """Aho-Corasick automaton over the terms of a glossary."""
+
+    def __init__(self, glossary: Dict[str, str]):
+        """
+        Build the automaton.
+
+        Args:
+            glossary (Dict[str, str]): Mapping of term to definition
+        """
+        self.glossary = dict(glossary)
+        self.terms: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for term in self.glossary:
+            pattern = " ".join(_normalize(term).split())
+            if pattern:
+                self._add_pattern(pattern, len(self.terms))
+                self.terms.append(term)
+        self._pattern_lengths = [len(" ".join(_normalize(term).split())) for term in self.terms]
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, term_index: int):
+        state = 0
+        for c in pattern:
+            next_state = self._goto[state].get(c)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][c] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append(term_index)
+
+    def _build_failure_links(self):
+        # Breadth-first, so each state's failure target is processed before the state itself
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for c, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and c not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(c, 0)
+                self._fail[child] = target if target != child else 0
+                # Inherit matches of the longest proper suffix
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> List[GlossaryMatch]:
+        """
+        Find every whole-word occurrence of every term, including overlapping ones.
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            List[GlossaryMatch]: Matches in order of their end position
+        """
+        normalized = _normalize(text)
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self._pattern_lengths
+        matches = []
+        state = 0
+        text_length = len(normalized)
+        for i, c in enumerate(normalized):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if not output[state]:
+                continue
+            end = i + 1
+            if end < text_length and _is_word_char(normalized[end]):
+                continue
+            for term_index in output[state]:
+                start = end - lengths[term_index]
+                if start > 0 and _is_word_char(normalized[start - 1]):
+                    continue
+                matches.append(GlossaryMatch(start, end, self.terms[term_index]))
+        return matches
+
+    def find_matches(self, text: str) -> List[GlossaryMatch]:
+        """
+        Find non-overlapping term occurrences, preferring the leftmost and then the longest.
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            List[GlossaryMatch]: Matches in order of position
+        """
+        selected = []
+        last_end = 0
+        for match in sorted(self.find_all(text), key=lambda m: (m.start, -m.end)):
+            if match.start >= last_end:
+                selected.append(match)
+                last_end = match.end
+        return selected
+
+    def find_terms(self, text: str) -> List[str]:
+        """
+        List the distinct glossary terms that appear in a text, in order of first appearance.
+
+        Args:
+            text (str): Text to search
+
+        Returns:
+            List[str]: Glossary terms found
+        """
+        seen = {}
+        for match in self.find_matches(text):
+            seen.setdefault(match.term, None)
+        return list(seen)
+
+    def annotate_html(self, text: str, first_only: bool = True) -> str:
+        """
+        Wrap glossary terms in a text with highlighted elements carrying their definition.
+
+        Text inside HTML tags is left untouched, so the input may already contain markup.
+
+        Args:
+            text (str): Text or HTML fragment to annotate
+            first_only (bool): Only annotate the first occurrence of each term
+
+        Returns:
+            str: Annotated text
+        """
+        tag_spans = [(m.start(), m.end()) for m in _TAG_PATTERN.finditer(text)]
+        annotated_terms = set()
+        pieces = []
+        position = 0
+        tag_index = 0
+        for match in self.find_matches(text):
+            # Skip matches that fall inside an HTML tag
+            while tag_index < len(tag_spans) and tag_spans[tag_index][1] <= match.start:
+                tag_index += 1
+            if tag_index < len(tag_spans) and tag_spans[tag_index][0] < match.end:
+                continue
+            if first_only and match.term in annotated_terms:
+                continue
+            annotated_terms.add(match.term)
+
+            definition = html.escape(self.glossary[match.term], quote=True)
+            pieces.append(text[position:match.start])
+            pieces.append(
+                f'<span class="legal-term" title="{definition}" data-term="{html.escape(match.term, quote=True)}">'
+                f'{text[match.start:match.end]}</span>'
+            )
+            position = match.end
+        pieces.append(text[position:])
+        return "".join(pieces)
+
+    def glossary_section(self, terms: Iterable[str]) -> str:
+        """
+        Build a markdown section listing terms with their definitions.
+
+        Args:
+            terms (Iterable[str]): Glossary terms to include
+
+        Returns:
+            str: Markdown section, or an empty string if there are no terms
+        """
+        lines = [f"- **{term}**: {self.glossary[term]}" for term in terms]
+        if not lines:
+            return ""
+        return "**Legal Terms in this Document:**\n" + "\n".join(lines)
+
+
+_matcher: Optional[GlossaryMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_glossary_matcher() -> GlossaryMatcher:
+    """Return the process-wide matcher for the glossary store's terms, building it on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = GlossaryMatcher(get_glossary_store().as_dict())
+    return _matcher
@@ -0,0 +1,361 @@
+"""
+Indexed glossary store for the Legal Advisor AI.
+
+Loads the glossary once per process, from the built-in terms or from a term
+file named by the GLOSSARY_FILE environment variable, into compact sorted
+arrays. On top of them it provides:
+
+- exact lookup, case- and whitespace-insensitive
+- prefix autocomplete by binary search over the sorted keys
+- typo-tolerant lookup with a symmetric-delete index (as in SymSpell), which
+  only generates deletions of a short key prefix so the index stays small
+- paginated HTML fragments for the sidebar, rendered once and cached
+
+Term files are either JSON (an object mapping term to definition, or a list
+of {"term": ..., "definition": ...} objects) or tab-separated lines of
+"term<TAB>definition".
+"""
+
+import bisect
+import html
+import json
+import os
+import random
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from src.legal_glossary import LEGAL_GLOSSARY
+from src.logger import logger
+
+
+def normalize_term(term: str) -> str:
+    """Normalize a term for lookup: lowercase with single spaces."""
+    return " ".join(term.lower().split())
+
+
+def _deletes(key: str, max_distance: int) -> List[str]:
+    """Return key and every string obtained by deleting up to max_distance characters from it."""
+    results = {key}
+    frontier = {key}
+    for _ in range(max_distance):
+        frontier = {word[:i] + word[i + 1:] for word in frontier for i in range(len(word))} - results
+        results |= frontier
+    return list(results)
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance between a and b, with transpositions.
+
+    Only the diagonal band of width max_distance is computed, so the cost is
+    linear in the length of the strings.
+
+    Args:
+        a (str): First string
+        b (str): Second string
+        max_distance (int): Distances above this are not needed exactly
+
+    Returns:
+        int: The distance, or max_distance + 1 if it exceeds max_distance
+    """
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    if a == b:
+        return 0
+    previous2: List[int] = []
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+def load_term_file(path: str) -> Dict[str, str]:
+    """
+    Load a glossary term file.
+
+    Args:
+        path (str): Path to a .json or tab-separated term file
+
+    Returns:
+        Dict[str, str]: Mapping of term to definition
+    """
+    with open(path, "r", encoding="utf-8") as term_file:
+        if path.lower().endswith(".json"):
+            data = json.load(term_file)
+            if isinstance(data, dict):
+                return {str(term): str(definition) for term, definition in data.items()}
+            return {str(entry["term"]): str(entry["definition"]) for entry in data}
+
+        glossary = {}
+        for line_number, line in enumerate(term_file, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            term, separator, definition = line.partition("\t")
+            if not separator:
+                logger.warning(f"Skipping line {line_number} of {path}: expected term<TAB>definition")
+                continue
+            glossary[term.strip()] = definition.strip()
+        return glossary
+
+
+class GlossaryStore:
+    """Sorted, indexed glossary with prefix and typo-tolerant search."""
+
+    def __init__(self, glossary: Dict[str, str], max_distance: int = 2, prefix_length: int = 7):
+        """
+        Build the indexes.
+
+        Args:
+            glossary (Dict[str, str]): Mapping of term to definition
+            max_distance (int): Maximum number of typos tolerated by fuzzy lookup
+            prefix_length (int): Number of leading characters indexed for fuzzy lookup
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+        entries = sorted(
+            ((normalize_term(term), term, definition) for term, definition in glossary.items() if term.strip()),
+            key=lambda entry: entry[0]
+        )
+        # Parallel arrays sorted by normalized key; terms are referred to by position
+        self._keys: List[str] = []
+        self.terms: List[str] = []
+        self.definitions: List[str] = []
+        for key, term, definition in entries:
+            if self._keys and self._keys[-1] == key:
+                # Later duplicates (differing only in case or spacing) replace earlier ones
+                self.terms[-1], self.definitions[-1] = term, definition
+                continue
+            self._keys.append(key)
+            self.terms.append(term)
+            self.definitions.append(definition)
+
+        # Keys are sorted, so terms sharing an indexed prefix are adjacent and share one set of deletions
+        self._deletes: Dict[str, List[int]] = {}
+        deletes_index = self._deletes
+        start = 0
+        while start < len(self._keys):
+            prefix = self._keys[start][:prefix_length]
+            end = start + 1
+            while end < len(self._keys) and self._keys[end][:prefix_length] == prefix:
+                end += 1
+            group = range(start, end)
+            for deleted in _deletes(prefix, max_distance):
+                indexes = deletes_index.get(deleted)
+                if indexes is None:
+                    deletes_index[deleted] = list(group)
+                else:
+                    indexes.extend(group)
+            start = end
+
+        self._page_cache_lock = threading.Lock()
+        self._page_cache: Dict[Tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) is not None
+
+    def _find(self, term: str) -> Optional[int]:
+        key = normalize_term(term)
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return index
+        return None
+
+    def as_dict(self) -> Dict[str, str]:
+        """Return the glossary as a mapping of term to definition, in sorted order."""
+        return dict(zip(self.terms, self.definitions))
+
+    def get(self, term: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a term exactly, ignoring case and spacing.
+
+        Args:
+            term (str): Term to look up
+
+        Returns:
+            Optional[Tuple[str, str]]: (term, definition) if found
+        """
+        index = self._find(term)
+        if index is None:
+            return None
+        return self.terms[index], self.definitions[index]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Autocomplete a term prefix.
+
+        Args:
+            prefix (str): Beginning of a term
+            limit (int): Maximum number of suggestions
+
+        Returns:
+            List[str]: Terms starting with the prefix, in sorted order
+        """
+        key = normalize_term(prefix)
+        if not key:
+            return []
+        results = []
+        index = bisect.bisect_left(self._keys, key)
+        while index < len(self._keys) and len(results) < limit and self._keys[index].startswith(key):
+            results.append(self.terms[index])
+            index += 1
+        return results
+
+    def fuzzy_lookup(self, query: str, limit: int = 5, max_distance: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Find the terms closest to a possibly misspelled query.
+
+        Args:
+            query (str): Term to look up
+            limit (int): Maximum number of results
+            max_distance (int, optional): Maximum edit distance, at most the index's max_distance
+
+        Returns:
+            List[Tuple[str, int]]: (term, edit distance) pairs, closest first
+        """
+        key = normalize_term(query)
+        if not key:
+            return []
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        candidates = set()
+        for deleted in _deletes(key[:self.prefix_length], max_distance):
+            candidates.update(self._deletes.get(deleted, ()))
+
+        results = []
+        for index in candidates:
+            candidate = self._keys[index]
+            if abs(len(candidate) - len(key)) > max_distance:
+                continue
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                results.append((distance, self._keys[index], index))
+        results.sort()
+        return [(self.terms[index], distance) for distance, _, index in results[:limit]]
+
+    def search(self, query: str, limit: int = 10) -> List[str]:
+        """
+        Search for terms as the user types: exact match, then prefix completions, then typo corrections.
+
+        Args:
+            query (str): Search text
+            limit (int): Maximum number of results
+
+        Returns:
+            List[str]: Matching terms
+        """
+        results = {}
+        exact = self.get(query)
+        if exact:
+            results[exact[0]] = None
+        for term in self.complete(query, limit):
+            results.setdefault(term, None)
+        if len(results) < limit:
+            for term, _ in self.fuzzy_lookup(query, limit):
+                results.setdefault(term, None)
+        return list(results)[:limit]
+
+    def random_term(self) -> Tuple[str, str]:
+        """Return a random (term, definition) pair."""
+        index = random.randrange(len(self.terms))
+        return self.terms[index], self.definitions[index]
+
+    def page_count(self, page_size: int) -> int:
+        """Return the number of pages of page_size terms."""
+        return max((len(self.terms) + page_size - 1) // page_size, 1)
+
+    def page_html(self, page: int, page_size: int) -> str:
+        """
+        Render one page of the glossary, in sorted order, as an HTML fragment.
+
+        Pages are rendered once and cached for the life of the store.
+
+        Args:
+            page (int): Zero-based page number
+            page_size (int): Terms per page
+
+        Returns:
+            str: HTML fragment for the page
+        """
+        cache_key = (page, page_size)
+        fragment = self._page_cache.get(cache_key)
+        if fragment is None:
+            start = page * page_size
+            fragment = self.terms_html(range(start, min(start + page_size, len(self.terms))))
+            with self._page_cache_lock:
+                self._page_cache[cache_key] = fragment
+        return fragment
+
+    def terms_html(self, indexes) -> str:
+        """
+        Render glossary entries as an HTML list.
+
+        Args:
+            indexes (Iterable[int]): Positions of the terms to render
+
+        Returns:
+            str: HTML fragment
+        """
+        items = "".join(
+            f'<li style="margin-bottom: 12px;">'
+            f'<span style="font-weight: 600; color: var(--legal-term-color);">{html.escape(self.terms[i])}</span>: '
+            f'<span style="color: #333; font-size: 0.95em;">{html.escape(self.definitions[i])}</span>'
+            f'</li>'
+            for i in indexes
+        )
+        return f'<div class="legal-glossary"><ul style="list-style-type: none; padding-left: 0;">{items}</ul></div>'
+
+    def search_html(self, query: str, limit: int = 10) -> str:
+        """Render the results of search() as an HTML fragment."""
+        return _search_html(self, query, limit)
+
+
+@lru_cache(maxsize=256)
+def _search_html(store: GlossaryStore, query: str, limit: int) -> str:
+    return store.terms_html(store._find(term) for term in store.search(query, limit))
+
+
+_store: Optional[GlossaryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_glossary_store() -> GlossaryStore:
+    """
+    Return the process-wide glossary store, loading it on first use.
+
+    The terms are read from GLOSSARY_FILE if it is set, falling back to the
+    built-in glossary if the file cannot be read.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                glossary = LEGAL_GLOSSARY
+                path = os.getenv("GLOSSARY_FILE", "")
+                if path:
+                    try:
+                        glossary = load_term_file(path)
+                    except (OSError, ValueError, KeyError, TypeError) as e:
+                        logger.error(f"Error loading glossary file {path}, using built-in glossary: {e}")
+                _store = GlossaryStore(glossary)
+                logger.info(f"Glossary store loaded with {len(_store)} terms")
+    return _store
@@ -0,0 +1,466 @@
+"""
+Background job queue for long-running work such as document analysis.
+
+Jobs run on a shared worker pool so the Streamlit script thread is never
+blocked. Each job reports the stage it is in and an overall progress
+percentage that the UI can poll.
+
+Every job has a cancellation token bound while it runs (see src.cancellation).
+Cancelling a job stops it at its next check, between PDF pages, OCR pages,
+quiz chunks or pieces of the model's response; a job cancelled while still
+queued never starts.
+
+A job's session (and priority class, when given) is bound for the scheduler
+(see src.scheduler), so the model requests and extractions of different
+sessions take turns.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config import Config
+from src.logger import logger, log_exception
+from src.utils import clean_temporary_file
+from src.cancellation import CancellationToken, cancellation_scope
+from src.scheduler import PRIORITY_BATCH, scheduling_scope
+from src.exceptions import OperationCancelledError, handle_exception
+
+# Job stages in the order a document analysis moves through them
+STAGE_QUEUED = "queued"
+STAGE_EXTRACTION = "extraction"
+STAGE_OCR = "ocr"
+STAGE_CHUNKING = "chunking"
+STAGE_INDEXING = "indexing"
+STAGE_SUMMARIZING = "summarizing"
+STAGE_LLM = "llm"
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+STAGE_CANCELLED = "cancelled"
+
+# Overall progress range (start, end) covered by each stage, in percent
+STAGE_PROGRESS = {
+    STAGE_QUEUED: (0, 0),
+    STAGE_EXTRACTION: (5, 25),
+    STAGE_OCR: (25, 40),
+    STAGE_CHUNKING: (40, 50),
+    STAGE_INDEXING: (50, 95),
+    STAGE_SUMMARIZING: (50, 85),
+    STAGE_LLM: (50, 95),
+    STAGE_DONE: (100, 100),
+    STAGE_FAILED: (100, 100),
+    STAGE_CANCELLED: (100, 100),
+}
+
+# Human-readable labels for the UI
+STAGE_LABELS = {
+    STAGE_QUEUED: "Waiting in queue",
+    STAGE_EXTRACTION: "Extracting text",
+    STAGE_OCR: "Reading scanned pages",
+    STAGE_CHUNKING: "Preparing document",
+    STAGE_INDEXING: "Indexing document",
+    STAGE_SUMMARIZING: "Summarizing sections",
+    STAGE_LLM: "Analyzing with AI",
+    STAGE_DONE: "Completed",
+    STAGE_FAILED: "Failed",
+    STAGE_CANCELLED: "Cancelled",
+}
+
+
+class Job:
+    """State of a single background job."""
+
+    def __init__(self, job_id: str, session_id: Optional[str] = None, description: str = ""):
+        self.id = job_id
+        self.session_id = session_id
+        self.description = description
+        self.stage = STAGE_QUEUED
+        self.progress = 0.0
+        self.result = None
+        # Interim output shown while the job runs, e.g. the clauses found before the model answers
+        self.preview = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.token = CancellationToken()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has completed, successfully or not, or was cancelled."""
+        return self.stage in (STAGE_DONE, STAGE_FAILED, STAGE_CANCELLED)
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation of the job has been requested."""
+        return self.token.cancelled
+
+    @property
+    def label(self) -> str:
+        """Human-readable description of the current stage."""
+        return STAGE_LABELS.get(self.stage, self.stage)
+
+    def update(self, stage: str, fraction: float = 0.0):
+        """
+        Move the job to a stage and record progress within it.
+
+        Args:
+            stage (str): Stage the job is in
+            fraction (float): Progress within the stage, from 0.0 to 1.0
+        """
+        start, end = STAGE_PROGRESS.get(stage, (self.progress, self.progress))
+        fraction = min(max(fraction, 0.0), 1.0)
+        with self._lock:
+            self.stage = stage
+            # Progress never moves backwards, even if a stage is re-entered
+            self.progress = max(self.progress, start + (end - start) * fraction)
+
+    def set_preview(self, preview: str):
+        """Record interim output to show until the result is ready."""
+        with self._lock:
+            self.preview = preview
+
+    def complete(self, result: Any):
+        """Mark the job as done with its result."""
+        with self._lock:
+            self.result = result
+            self.stage = STAGE_DONE
+            self.progress = 100.0
+            self.finished_at = time.time()
+
+    def fail(self, error: str):
+        """Mark the job as failed with a user-facing error message."""
+        with self._lock:
+            self.error = error
+            self.stage = STAGE_FAILED
+            self.progress = 100.0
+            self.finished_at = time.time()
+
+    def mark_cancelled(self):
+        """Mark the job as stopped by cancellation."""
+        with self._lock:
+            self.error = f"Cancelled: {self.token.reason}"
+            self.stage = STAGE_CANCELLED
+            self.progress = 100.0
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of the job state suitable for display or serialization."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "session_id": self.session_id,
+                "description": self.description,
+                "stage": self.stage,
+                "label": self.label,
+                "progress": round(self.progress, 1),
+                "result": self.result,
+                "preview": self.preview,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Worker pool that runs jobs in the background and tracks their state."""
+
+    def __init__(self, max_workers: Optional[int] = None, retention_seconds: Optional[int] = None):
+        """
+        Create a job manager.
+
+        Args:
+            max_workers (int, optional): Number of worker threads, defaults to Config.JOB_WORKERS
+            retention_seconds (int, optional): How long finished jobs are kept, defaults to
+                Config.JOB_RETENTION_SECONDS
+        """
+        self.max_workers = max_workers or Config.JOB_WORKERS
+        self.retention_seconds = retention_seconds or Config.JOB_RETENTION_SECONDS
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="legal-bot-job")
+        # Chat questions run on their own pool so they never wait behind document analyses
+        self._interactive_executor = ThreadPoolExecutor(max_workers=Config.JOB_INTERACTIVE_WORKERS,
+                                                        thread_name_prefix="legal-bot-question")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        logger.info(f"Job manager started with {self.max_workers} workers")
+
+    def submit(self, fn: Callable[..., Any], *args, session_id: Optional[str] = None,
+               description: str = "", on_finish: Optional[Callable[[], None]] = None,
+               preview: bool = False, interactive: bool = False, priority: Optional[str] = None, **kwargs) -> str:
+        """
+        Submit a callable to run in the background.
+
+        The callable receives a ``progress_callback`` keyword argument that it
+        can call with (stage, fraction) to report progress.
+
+        Args:
+            fn (Callable): Function to run
+            session_id (str, optional): Session that owns the job
+            description (str): Short description of the job
+            on_finish (Callable, optional): Called after the job finishes, whatever the outcome
+            preview (bool): Also pass a ``preview_callback`` keyword argument that sets the job's preview
+            interactive (bool): Run on the pool reserved for chat questions, which the user is waiting on
+            priority (str, optional): Priority class of the job's model requests and extractions
+                (see src.scheduler); by default each bot method uses its own
+
+        Returns:
+            str: Identifier of the submitted job
+        """
+        self._prune()
+        job = Job(uuid.uuid4().hex, session_id=session_id, description=description)
+        with self._lock:
+            self._jobs[job.id] = job
+        if preview:
+            kwargs["preview_callback"] = job.set_preview
+
+        def run():
+            try:
+                with cancellation_scope(job.token), scheduling_scope(priority, session_id):
+                    job.token.raise_if_cancelled()
+                    result = fn(*args, progress_callback=job.update, **kwargs)
+                job.complete(result)
+                logger.info(f"Job {job.id} completed: {description}")
+            except OperationCancelledError:
+                job.mark_cancelled()
+                logger.info(f"Job {job.id} cancelled ({job.token.reason}): {description}")
+            except Exception as e:
+                log_exception(e, context=f"job {job.id}")
+                job.fail(handle_exception(e, "Background job failed"))
+            finally:
+                if on_finish:
+                    on_finish()
+
+        # Run in a copy of the submitter's context so the job joins its request trace
+        executor = self._interactive_executor if interactive else self._executor
+        executor.submit(contextvars.copy_context().run, run)
+        logger.info(f"Job {job.id} submitted: {description}")
+        return job.id
+
+    def submit_analysis(self, bot, pdf_path: str, session_id: Optional[str] = None,
+                        document_name: Optional[str] = None, cleanup: bool = True,
+                        force: bool = False, profile: Optional[bool] = None) -> str:
+        """
+        Submit a document analysis job.
+
+        Args:
+            bot: The LegalAdvisorBot instance that performs the analysis
+            pdf_path (str): Path to the PDF file to analyze
+            session_id (str, optional): Session that owns the job
+            document_name (str, optional): Display name of the document, defaults to the file name
+            cleanup (bool): Whether to delete the file once the job finishes
+            force (bool): Re-analyze even if a stored analysis of the document exists
+            profile (bool, optional): Profile the analysis; None follows Config.PROFILING_ENABLED
+
+        Returns:
+            str: Identifier of the submitted job
+        """
+        on_finish = (lambda: clean_temporary_file(pdf_path)) if cleanup else None
+        return self.submit(
+            bot.analyze_document,
+            pdf_path,
+            session_id=session_id,
+            description=f"Analyze document {document_name or os.path.basename(pdf_path)}",
+            on_finish=on_finish,
+            preview=True,
+            force=force,
+            profile=profile,
+            raise_errors=True,
+        )
+
+    def submit_comparison(self, bot, old_pdf_path: str, new_pdf_path: str, session_id: Optional[str] = None,
+                          document_names: Optional[List[str]] = None, cleanup: bool = True,
+                          force: bool = False, profile: Optional[bool] = None) -> str:
+        """
+        Submit a job comparing two versions of a document.
+
+        Args:
+            bot: The LegalAdvisorBot instance that performs the comparison
+            old_pdf_path (str): Path to the earlier version
+            new_pdf_path (str): Path to the later version
+            session_id (str, optional): Session that owns the job
+            document_names (List[str], optional): Display names of the old and new versions
+            cleanup (bool): Whether to delete both files once the job finishes
+            force (bool): Re-run even if a stored comparison of the documents exists
+            profile (bool, optional): Profile the comparison; None follows Config.PROFILING_ENABLED
+
+        Returns:
+            str: Identifier of the submitted job
+        """
+        old_name, new_name = document_names or (os.path.basename(old_pdf_path), os.path.basename(new_pdf_path))
+
+        def on_finish():
+            clean_temporary_file(old_pdf_path)
+            clean_temporary_file(new_pdf_path)
+
+        return self.submit(
+            bot.compare_documents,
+            old_pdf_path,
+            new_pdf_path,
+            session_id=session_id,
+            description=f"Compare {old_name} with {new_name}",
+            on_finish=on_finish if cleanup else None,
+            force=force,
+            profile=profile,
+            raise_errors=True,
+        )
+
+    def submit_workspace_document(self, bot, workspace_id: str, pdf_path: str, session_id: Optional[str] = None,
+                                  document_name: Optional[str] = None, cleanup: bool = True) -> str:
+        """
+        Submit a job adding a document to a matter workspace.
+
+        Args:
+            bot: The LegalAdvisorBot instance that owns the workspace
+            workspace_id (str): Id of the workspace
+            pdf_path (str): Path to the PDF file to add
+            session_id (str, optional): Session that owns the job
+            document_name (str, optional): Name used in citations, defaults to the file name
+            cleanup (bool): Whether to delete the file once the job finishes
+
+        Returns:
+            str: Identifier of the submitted job
+        """
+        document_name = document_name or os.path.basename(pdf_path)
+
+        def add_document(progress_callback=None):
+            document = bot.add_to_workspace(workspace_id, pdf_path, document_name, progress_callback)
+            return (f"Added **{document.name}** to the workspace ({document.pages} pages). "
+                    f"Questions now search all documents in the workspace.")
+
+        return self.submit(
+            add_document,
+            session_id=session_id,
+            description=f"Add {document_name} to workspace",
+            on_finish=(lambda: clean_temporary_file(pdf_path)) if cleanup else None,
+        )
+
+    def submit_preparation(self, bot, pdf_path: str, session_id: Optional[str] = None,
+                           document_name: Optional[str] = None, cleanup: bool = True) -> str:
+        """
+        Submit a job preparing an uploaded document before it is analyzed.
+
+        Its result is the document's content hash, to pass to the bot's
+        discard_prepared if the upload is removed.
+
+        Args:
+            bot: The LegalAdvisorBot instance that keeps the prepared document
+            pdf_path (str): Path to the PDF file to prepare
+            session_id (str, optional): Session that owns the job
+            document_name (str, optional): Display name of the document, defaults to the file name
+            cleanup (bool): Whether to delete the file once the job finishes
+
+        Returns:
+            str: Identifier of the submitted job
+        """
+        return self.submit(
+            bot.prepare_document,
+            pdf_path,
+            session_id=session_id,
+            description=f"Prepare document {document_name or os.path.basename(pdf_path)}",
+            on_finish=(lambda: clean_temporary_file(pdf_path)) if cleanup else None,
+            priority=PRIORITY_BATCH,
+        )
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> bool:
+        """
+        Request cancellation of a job. It stops at its next cancellation check.
+
+        Args:
+            job_id (str): Identifier of the job
+            reason (str): Why the job was cancelled, recorded in the log
+
+        Returns:
+            bool: Whether an unfinished job was found
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.token.cancel(reason)
+        logger.info(f"Cancellation requested for job {job_id}: {reason}")
+        return True
+
+    def cancel_session(self, session_id: str, reason: str = "session ended") -> int:
+        """
+        Cancel every unfinished job owned by a session.
+
+        Returns:
+            int: Number of jobs cancelled
+        """
+        return sum(self.cancel(job.id, reason) for job in self.jobs_for_session(session_id))
+
+    def start_reaper(self, is_orphaned: Callable[[Job], bool], interval: Optional[float] = None,
+                     after_reap: Optional[Callable[[], None]] = None):
+        """
+        Periodically cancel unfinished jobs whose owner has gone away, e.g. a closed browser tab.
+
+        Only the first call starts a reaper.
+
+        Args:
+            is_orphaned (Callable): Returns whether nobody is waiting for a job any more
+            interval (float, optional): Seconds between checks, defaults to Config.JOB_REAPER_INTERVAL
+            after_reap (Callable, optional): Called after each check, e.g. to forget owners that went away
+        """
+        interval = interval or Config.JOB_REAPER_INTERVAL
+        with self._lock:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap, args=(is_orphaned, interval, after_reap),
+                                            name="legal-bot-job-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self, is_orphaned: Callable[[Job], bool], interval: float,
+              after_reap: Optional[Callable[[], None]] = None):
+        while not self._stopped.wait(interval):
+            with self._lock:
+                running = [job for job in self._jobs.values() if not job.finished and not job.cancelled]
+            for job in running:
+                try:
+                    orphaned = is_orphaned(job)
+                except Exception as e:
+                    log_exception(e, context="job reaper")
+                    continue
+                if orphaned:
+                    self.cancel(job.id, "owner went away")
+            if after_reap is not None:
+                try:
+                    after_reap()
+                except Exception as e:
+                    log_exception(e, context="job reaper")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return the job with the given id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def unfinished(self) -> int:
+        """Return the number of jobs queued or running."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def jobs_for_session(self, session_id: str) -> List[Job]:
+        """Return all known jobs owned by a session, oldest first."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.session_id == session_id]
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def _prune(self):
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and optionally wait for running ones to finish."""
+        logger.info("Shutting down job manager")
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
+        self._interactive_executor.shutdown(wait=wait)
@@ -0,0 +1,150 @@
+"""
+Multiple choice quiz generation from legal documents.
+
+A quiz is requested for each chunk of a document, several chunks at a time,
+and each response is parsed as it streams so valid questions are kept even
+when part of the output is malformed.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain.prompts import PromptTemplate
+
+from src.cancellation import check_cancelled
+from src.exceptions import OperationCancelledError
+from src.lawbot.quiz_parser import MCQStreamParser
+from src.logger import logger
+from src.tracing import span
+
+QUIZ_TEMPLATE = """
+Text:{text}
+You are an expert legal educator. Using the text above, create a quiz of {number} multiple choice questions
+for readers without legal training, in a {tone} tone. Each question must be answerable from the text,
+must not repeat another question, and must have exactly one correct option.
+Respond only with JSON in the format below, with one entry per question:
+{response_json}
+"""
+
+RESPONSE_JSON = """{
+    "1": {"mcq": "question text", "options": {"a": "choice", "b": "choice", "c": "choice", "d": "choice"}, "correct": "a"},
+    "2": {"mcq": "question text", "options": {"a": "choice", "b": "choice", "c": "choice", "d": "choice"}, "correct": "b"}
+}"""
+
+
+def _question_key(question: Dict[str, Any]) -> str:
+    return " ".join(question["mcq"].lower().split())
+
+
+class QuizGenerator:
+    """Generates multiple choice quizzes with a LangChain LLM."""
+
+    def __init__(self, llm, max_workers: int = 4, scheduler=None):
+        """
+        Create a quiz generator.
+
+        Args:
+            llm: LangChain LLM supporting stream()
+            max_workers (int): Maximum number of quizzes requested at once
+            scheduler (FairScheduler, optional): Scheduler each model request waits for a slot from
+        """
+        self.llm = llm
+        self.max_workers = max_workers
+        self.scheduler = scheduler
+        self.prompt = PromptTemplate(
+            input_variables=["text", "number", "tone", "response_json"],
+            template=QUIZ_TEMPLATE
+        )
+
+    def stream_quiz(self, text: str, number: int = 5, tone: str = "simple",
+                    parser: Optional[MCQStreamParser] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Request a quiz about a text and yield each question as soon as it is complete.
+
+        Args:
+            text (str): Source text
+            number (int): Number of questions to request
+            tone (str): Tone of the questions
+            parser (MCQStreamParser, optional): Parser to use, e.g. to inspect its errors afterwards
+
+        Yields:
+            Dict[str, Any]: Validated questions
+        """
+        parser = parser or MCQStreamParser()
+        prompt_text = self.prompt.format(text=text, number=number, tone=tone, response_json=RESPONSE_JSON)
+        # Closing the stream aborts the model request when the quiz is cancelled or the
+        # consumer stops reading, instead of leaving it (and the slot) to the garbage collector
+        with self.scheduler.slot() if self.scheduler else nullcontext(), \
+                closing(self.llm.stream(prompt_text)) as stream:
+            for piece in stream:
+                check_cancelled()
+                yield from parser.feed(piece)
+        yield from parser.finish()
+        for error in parser.errors:
+            logger.warning(f"Quiz generation: {error}")
+
+    def generate_quiz(self, text: str, number: int = 5, tone: str = "simple") -> List[Dict[str, Any]]:
+        """
+        Request a quiz about a text.
+
+        Args:
+            text (str): Source text
+            number (int): Number of questions to request
+            tone (str): Tone of the questions
+
+        Returns:
+            List[Dict[str, Any]]: Validated questions, possibly fewer than requested
+        """
+        return list(self.stream_quiz(text, number, tone))[:number]
+
+    def _generate_chunk(self, index: int, chunk: str, number: int, tone: str) -> List[Dict[str, Any]]:
+        with span("quiz_chunk", chunk=index) as chunk_span:
+            try:
+                check_cancelled()
+                questions = self.generate_quiz(chunk, number, tone)
+            except OperationCancelledError:
+                raise
+            except Exception as e:
+                # One failed request should not discard the quizzes of the other chunks
+                logger.error(f"Quiz generation failed for chunk {index}: {e}")
+                chunk_span.set_attribute("error", str(e))
+                return []
+            chunk_span.set_attribute("questions", len(questions))
+            return questions
+
+    def generate_batch(self, chunks: Sequence[str], number_per_chunk: int = 5,
+                       tone: str = "simple") -> List[Dict[str, Any]]:
+        """
+        Request quizzes for several chunks concurrently and merge them.
+
+        Args:
+            chunks (Sequence[str]): Texts to generate quizzes from, e.g. the chunks of a document
+            number_per_chunk (int): Questions requested per chunk
+            tone (str): Tone of the questions
+
+        Returns:
+            List[Dict[str, Any]]: Questions in chunk order, without duplicates
+        """
+        if not chunks:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks)),
+                                thread_name_prefix="quiz") as executor:
+            # Run each request in a copy of the caller's context so its spans join the caller's trace
+            futures = [
+                executor.submit(contextvars.copy_context().run, self._generate_chunk, i, chunk, number_per_chunk, tone)
+                for i, chunk in enumerate(chunks)
+            ]
+            results = [future.result() for future in futures]
+
+        questions = []
+        seen = set()
+        for chunk_questions in results:
+            for question in chunk_questions:
+                key = _question_key(question)
+                if key not in seen:
+                    seen.add(key)
+                    questions.append(question)
+        logger.info(f"Generated {len(questions)} quiz questions from {len(chunks)} chunks")
+        return questions
@@ -0,0 +1,200 @@
+"""
+Incremental parser for multiple choice questions generated by the model.
+
+The model is asked for JSON, but its output may be wrapped in code fences or
+prose, cut off mid-item, or contain an item that is not valid JSON. The
+parser scans the output as it streams, tracking string and brace state, and
+emits each question object as soon as its closing brace arrives. Items that
+fail to parse or validate are skipped and recorded in ``errors``, so one bad
+item never discards the rest of the quiz.
+
+Each emitted question is normalized to::
+
+    {"mcq": "question text", "options": {"a": "...", "b": "...", ...}, "correct": "a"}
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+# Removes commas before a closing bracket, the most common JSON mistake in model output
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+_QUESTION_KEYS = ("mcq", "question")
+_ANSWER_KEYS = ("correct", "answer")
+
+
+class MCQValidationError(ValueError):
+    """Raised when a parsed object is not a valid multiple choice question."""
+    pass
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON, retrying once with trailing commas removed."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+
+
+def validate_mcq(item: Any) -> Dict[str, Any]:
+    """
+    Validate a question object and normalize it.
+
+    Accepts "question" for "mcq" and "answer" for "correct", options given as a
+    list, and a correct answer given as either the option key or its text.
+
+    Args:
+        item (Any): Parsed JSON object
+
+    Returns:
+        Dict[str, Any]: Normalized question
+
+    Raises:
+        MCQValidationError: If the object is not a usable question
+    """
+    if not isinstance(item, dict):
+        raise MCQValidationError("question is not an object")
+    question = next((item[k] for k in _QUESTION_KEYS if k in item), None)
+    if not isinstance(question, str) or not question.strip():
+        raise MCQValidationError("missing question text")
+
+    options = item.get("options")
+    if isinstance(options, list):
+        options = {chr(ord("a") + i): value for i, value in enumerate(options)}
+    if not isinstance(options, dict) or len(options) < 2:
+        raise MCQValidationError("a question needs at least two options")
+    options = {str(key).strip().lower(): value for key, value in options.items()}
+    if not all(isinstance(value, str) and value.strip() for value in options.values()):
+        raise MCQValidationError("options must be non-empty strings")
+
+    correct = next((item[k] for k in _ANSWER_KEYS if k in item), None)
+    if not isinstance(correct, str):
+        raise MCQValidationError("missing correct answer")
+    key = correct.strip().lower().rstrip(").")
+    if key not in options:
+        # The answer may be given as the option text rather than its key
+        key = next((k for k, value in options.items() if value.strip().lower() == correct.strip().lower()), None)
+        if key is None:
+            raise MCQValidationError(f"correct answer {correct!r} is not one of the options")
+
+    return {
+        "mcq": question.strip(),
+        "options": {k: value.strip() for k, value in options.items()},
+        "correct": key,
+    }
+
+
+class MCQStreamParser:
+    """Extracts valid questions from model output fed to it piece by piece."""
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._in_string = False
+        self._escaped = False
+        # Start offset of each open object, and whether a question was emitted inside it
+        self._open_objects: List[List[Any]] = []
+        self.errors: List[str] = []
+        self.count = 0
+
+    def feed(self, piece: str) -> List[Dict[str, Any]]:
+        """
+        Add the next piece of model output.
+
+        Args:
+            piece (str): Newly received text
+
+        Returns:
+            List[Dict[str, Any]]: Questions completed by this piece
+        """
+        self._text += piece
+        completed = []
+        text = self._text
+        i = self._position
+        while i < len(text):
+            c = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+                elif c == "\n":
+                    # JSON strings cannot span lines, so the quote was never closed; resynchronize here
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c == "{":
+                self._open_objects.append([i, False])
+            elif c == "}" and self._open_objects:
+                start, contains_question = self._open_objects.pop()
+                if not contains_question:
+                    question = self._parse_object(text[start:i + 1])
+                    if question is not None:
+                        completed.append(question)
+                        contains_question = True
+                if contains_question and self._open_objects:
+                    self._open_objects[-1][1] = True
+            i += 1
+
+        if not self._open_objects and not self._in_string:
+            # Nothing before this point can still be part of an object
+            self._text = ""
+            self._position = 0
+        else:
+            self._position = i
+        return completed
+
+    def _parse_object(self, candidate: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = _loads(candidate)
+        except json.JSONDecodeError as e:
+            if any(f'"{key}"' in candidate for key in _QUESTION_KEYS):
+                self.errors.append(f"Malformed question skipped: {e}")
+            return None
+        if not isinstance(item, dict) or not any(key in item for key in _QUESTION_KEYS):
+            # An options object or a wrapper around the questions
+            return None
+        try:
+            question = validate_mcq(item)
+        except MCQValidationError as e:
+            self.errors.append(f"Invalid question skipped: {e}")
+            return None
+        self.count += 1
+        return question
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Signal the end of the output.
+
+        Returns:
+            List[Dict[str, Any]]: Always empty; questions are emitted as soon as they close
+        """
+        if any(not contains_question for _, contains_question in self._open_objects):
+            self.errors.append("Output ended inside an unfinished question")
+        self._text = ""
+        self._position = 0
+        self._open_objects = []
+        self._in_string = False
+        return []
+
+
+def parse_mcqs(output: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Extract all valid questions from complete or streamed model output.
+
+    Args:
+        output (Iterable[str]): The full output as a string, or the pieces of a stream
+
+    Returns:
+        List[Dict[str, Any]]: Valid questions in order
+    """
+    parser = MCQStreamParser()
+    pieces = [output] if isinstance(output, str) else output
+    questions = []
+    for piece in pieces:
+        questions.extend(parser.feed(piece))
+    questions.extend(parser.finish())
+    return questions
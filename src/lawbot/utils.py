@@ -1,8 +1,11 @@
 import PyPDF2
 import pdfplumber
-import json
-import traceback
 import io
+import logging
+
+from src.lawbot.quiz_parser import MCQStreamParser, validate_mcq
+
+logger = logging.getLogger(__name__)
 
 def read_file(file):
     """Reads PDF or TXT file and extracts text."""
@@ -34,40 +37,41 @@ def read_file(file):
     else:
         raise Exception("Unsupported file format! Only PDF and text files are supported.")
 
-import json
-import traceback
+def get_table_data(quiz):
+    """
+    Converts AI-generated MCQs into a structured table format for Streamlit.
 
-import json
-import traceback
+    Accepts the raw model output, with or without code fences or surrounding text,
+    or questions already parsed by the quiz generator. Malformed questions are
+    skipped rather than discarding the whole quiz.
 
-def get_table_data(quiz_str):
-    """Converts AI-generated MCQ JSON string into a structured table format for Streamlit."""
+    Returns False if no valid question is found.
+    """
     try:
-        # Ensure quiz_str is not empty
-        if not quiz_str or not quiz_str.strip():
-            raise ValueError("Received empty response from the AI model.")
-
-        # Remove ```json and ``` if present
-        quiz_str = quiz_str.strip().strip("```").replace("json", "").strip()
-
-        # Try loading JSON
-        try:
-            quiz_dict = json.loads(quiz_str)
-        except json.JSONDecodeError:
-            raise ValueError(f"Invalid JSON format received: {quiz_str[:500]}...")  # Show part of the response for debugging
+        if isinstance(quiz, str):
+            # Ensure quiz is not empty
+            if not quiz.strip():
+                raise ValueError("Received empty response from the AI model.")
+            parser = MCQStreamParser()
+            questions = parser.feed(quiz) + parser.finish()
+            for error in parser.errors:
+                logger.warning(error)
+        else:
+            questions = [validate_mcq(question) for question in quiz]
+
+        if not questions:
+            raise ValueError(f"No valid questions found in the response: {str(quiz)[:500]}...")  # Show part of the response for debugging
 
         quiz_table_data = [
             {
-                "MCQ": value["mcq"],
-                "Choices": " || ".join([f"{option}-> {option_value}" for option, option_value in value["options"].items()]),
-                "Correct": value["correct"]
+                "MCQ": question["mcq"],
+                "Choices": " || ".join([f"{option}-> {option_value}" for option, option_value in question["options"].items()]),
+                "Correct": question["correct"]
             }
-            for key, value in quiz_dict.items()
+            for question in questions
         ]
         return quiz_table_data
 
     except Exception as e:
-        traceback.print_exception(type(e), e, e.__traceback__)
+        logger.error(f"Could not build quiz table: {e}")
         return False
-
-
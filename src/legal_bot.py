@@ -1,172 +1,771 @@
 import os
 import json
+import hashlib
+import threading
 import traceback
+import uuid
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
 from langchain_google_genai import GoogleGenerativeAI
-from langchain.chains import LLMChain
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory
 
 from src.config import Config
 from src.logger import logger, log_user_interaction, log_api_request, log_exception
-from src.utils import extract_text_from_pdf, format_response
+from src.utils import (
+    extract_pages_from_pdf, join_pages, page_offsets, page_hashes, chunk_text, format_response, get_file_hash,
+    estimate_tokens
+)
+from src.ocr import PageOCR, ocr_available
+from src.document_store import DocumentStore
+from src.analysis_store import AnalysisStore
+from src.metrics import (
+    time_stage, track_query, record_cache_lookup, average_stage_latency,
+    GLOSSARY_LATENCY_SAVED, PROMPT_REQUESTS, PROMPT_INSTRUCTION_TOKENS
+)
+from src.tracing import configure_tracing, get_request_id, new_request_id, span, start_span, trace_request
+from src.prompts import (
+    MODE_COMPARE, MODE_DOCUMENT, MODE_FOLLOWUP, MODE_GENERAL, MODE_WORKSPACE,
+    PROMPT_VARIANTS, SECTION_SUMMARY_TEMPLATE, SECTION_SUMMARY_VERSION, STYLE_AB, STYLE_COMPACT, STYLE_FULL,
+    get_prompt_variant
+)
+from src.contract_diff import segment_clauses, diff_clauses, count_changes, format_changes
+from src.cancellation import check_cancelled
+from src.scheduler import (
+    FairScheduler, current_scheduling, default_priority, shared_priority,
+    PRIORITY_BATCH, PRIORITY_DOCUMENT, PRIORITY_FOLLOW_UP, PRIORITY_INTERACTIVE
+)
+from src.clause_classifier import classify_clauses
+from src.workspace import Workspace, format_passages, format_sources
+from src.revisions import RevisionCache, format_section_summaries, section_key, split_sections
+from src.profiling import maybe_profile
+from src.glossary_matcher import get_glossary_matcher
+from src.glossary_store import get_glossary_store
+from src.glossary_answers import find_definition, format_definition_answer
+from src.lawbot.quiz import QuizGenerator
 from src.exceptions import (
     APIKeyError, 
     PDFExtractionError, 
     ModelResponseError, 
     DocumentTooLargeError,
+    OperationCancelledError,
     handle_exception
 )
 
-# Template for the legal expert model
-LEGAL_TEMPLATE = """
-Text:{text}
-### Instruction for Legal Expert Model:
-
-You are a highly trained legal expert with in-depth knowledge of laws, regulations, and case precedents across multiple jurisdictions. Your task is to:
-- **Interpret and analyze legal documents, contracts, and agreements.**
-- **Explain complex legal jargon and clauses in simple, easy-to-understand language for a non-legal audience.**
-- **Provide expert legal advice, suggest potential risks, identify legal loopholes, and recommend actionable steps.**
-- **Understand the nuances of various legal systems including but not limited to civil law, common law, contract law, corporate law, intellectual property law, and criminal law.**
-- **Identify critical sections such as indemnity clauses, liability, arbitration, jurisdiction, and termination provisions with detailed explanations.**
-- **When a document is uploaded, summarize its key points, highlight risks, and offer practical advice to the user.**
-- **When asked a legal question, provide detailed expert advice along with relevant case laws, statutes, or precedents, if applicable.**
-- **Answer general questions about law and legal concepts in clear, accessible language.**
-
----
+# Bump whenever a template in src.prompts or ANALYSIS_QUERY changes so stored analyses are not reused
+ANALYSIS_PROMPT_VERSION = "3"
 
-📚 **Document Analysis Capability:**
-- When provided with a legal document or contract, you should:
-    - Identify the core objective and key provisions of the document.
-    - Summarize in plain language, highlighting important clauses.
-    - Point out any risks, obligations, liabilities, and possible ambiguities.
-    - Suggest revisions or actions to mitigate legal risks.
+# Standard query used for full document analysis
+ANALYSIS_QUERY = "Please analyze this legal document and provide a comprehensive summary."
 
----
+# Standard query used to review the changes between two versions of a document
+COMPARE_QUERY = "Please review the changes between the old and new versions of this legal document."
 
-### ⚖️ **Legal Question Capability:**
-- When asked a legal question or problem, you should:
-    - Analyze the legal query and determine relevant laws.
-    - Provide a step-by-step explanation in simple language.
-    - Mention any potential remedies, risks, and solutions.
-    - Support the answer with applicable laws, sections, and case precedents.
+@contextmanager
+def pipeline_stage(name, **attributes):
+    """Record a pipeline stage both as a latency metric and as a span in the current trace."""
+    with span(name, **attributes) as stage_span, time_stage(name):
+        yield stage_span
 
----
+# Seconds between cancellation checks while waiting for another preparation of the same document
+PREPARATION_POLL_INTERVAL = 0.5
 
-### 🎯 **Response Format:**
-- **Summary:** [Brief, easy-to-understand summary]
-- **Key Clauses and Risks:** [Bullet points with details, if relevant to the query]
-- **Expert Legal Advice:** [Detailed advice with references to laws and cases]
-- **Recommended Actions:** [Clear, actionable next steps]
-
----
-
-### 📝 **Special Instructions:**
-- Ensure the response is accurate, concise, and formatted for easy reading.
-- Simplify complex legal language to ensure accessibility.
-- Where necessary, highlight important legal terms with definitions.
-- For general knowledge questions about law, provide clear explanations without unnecessary formality.
-
----
-
-### ⚡️ **Fallback Behavior:**
-- If the document is unclear or incomplete, ask for clarification.
-- If the legal query involves a jurisdiction-specific issue, mention the applicable jurisdiction and possible variations.
+class _Preparation:
+    """Lock for the preparation of one document, with the number of callers using it."""
+    
+    __slots__ = ("lock", "users", "priority")
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        # SharedPriority of the caller holding the lock, raised by callers waiting for it
+        self.priority = None
 
-{chat_history}
-Human: {human_input}
-AI:
-"""
+class ModelTracingHandler(BaseCallbackHandler):
+    """LangChain callback that records the raw model call as a span, separate from chain overhead."""
+    
+    def __init__(self):
+        self._spans = {}
+    
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        prompt_chars = sum(len(prompt) for prompt in prompts)
+        self._spans[run_id] = start_span(
+            "model",
+            prompt_chars=prompt_chars,
+            prompt_tokens=sum(estimate_tokens(prompt) for prompt in prompts)
+        )
+    
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        model_span = self._spans.pop(run_id, None)
+        if model_span:
+            output_chars = sum(len(g.text) for generations in response.generations for g in generations)
+            model_span.set_attribute("response_chars", output_chars)
+            model_span.end()
+    
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        model_span = self._spans.pop(run_id, None)
+        if model_span:
+            model_span.end(error=error)
 
 class LegalAdvisorBot:
-    def __init__(self):
-        """Initialize the Legal Advisor Bot with configuration settings."""
+    def __init__(self, llm=None):
+        """
+        Initialize the Legal Advisor Bot with configuration settings.
+        
+        Args:
+            llm (optional): LangChain LLM to use instead of the configured Gemini model,
+                e.g. a fake model for offline benchmarks
+        """
         logger.info("Initializing Legal Advisor Bot")
         
         try:
             # Initialize the LLM
-            llm_params = Config.get_llm_params()
-            self.llm = GoogleGenerativeAI(**llm_params)
+            if llm is None:
+                llm_params = Config.get_llm_params()
+                llm = GoogleGenerativeAI(**llm_params)
+            self.llm = llm
             
-            # Setup memory based on configuration
-            memory_params = Config.get_memory_params()
-            if Config.MEMORY_TYPE == "conversation_buffer_window":
-                self.memory = ConversationBufferWindowMemory(**memory_params)
-            else:
-                self.memory = ConversationBufferMemory(**memory_params)
+            # Memory of the conversation held outside any session, e.g. the console chat
+            self.memory = self._new_memory()
             
-            # Setup prompt template
-            self.prompt = PromptTemplate(
-                input_variables=["text", "chat_history", "human_input"],
-                template=LEGAL_TEMPLATE
-            )
+            # Conversations of sessions by session id (see open_conversation), least recently used first,
+            # at most Config.CONVERSATIONS_MAX; each session keeps its own memory
+            self._conversations = OrderedDict()
+            self._conversations_lock = threading.Lock()
+            
+            # Prompt template of each prompt variant by name, created on first use
+            self._prompts = {}
             
-            # Create LLM chain
-            self.chain = LLMChain(
-                llm=self.llm,
-                prompt=self.prompt,
-                memory=self.memory,
-                verbose=Config.DEBUG_MODE
+            # Completed analyses shared across sessions and processes
+            self.analysis_store = None
+            if Config.ANALYSIS_CACHE_ENABLED:
+                self.analysis_store = AnalysisStore(
+                    Config.ANALYSIS_CACHE_PATH,
+                    ttl_seconds=Config.ANALYSIS_CACHE_TTL_SECONDS,
+                    max_entries=Config.ANALYSIS_CACHE_MAX_ENTRIES
+                )
+            
+            # Extracted page text, reused instead of re-extracting a document seen before
+            self.document_store = None
+            if Config.DOCUMENT_STORE_ENABLED:
+                self.document_store = DocumentStore(
+                    Config.DOCUMENT_STORE_DIR,
+                    max_documents=Config.DOCUMENT_STORE_MAX_DOCUMENTS,
+                    max_open=Config.DOCUMENT_STORE_OPEN_FILES
+                )
+            
+            # Page text and section summaries by content hash, so a revised document
+            # is extracted and summarized again only where it changed
+            self.revision_cache = None
+            if Config.REVISION_CACHE_ENABLED:
+                self.revision_cache = RevisionCache(
+                    Config.REVISION_CACHE_PATH,
+                    max_entries=Config.REVISION_CACHE_MAX_ENTRIES
+                )
+            
+            # Extracted, classified and chunked documents by content hash, most recently used last,
+            # with a lock per document being prepared so concurrent preparations of the same content run once
+            self._prepared = OrderedDict()
+            self._preparing = {}
+            self._prepared_lock = threading.Lock()
+            
+            # Model requests and document extraction are shared by all sessions; the schedulers
+            # let interactive questions ahead of long analyses and give sessions turns
+            self.llm_scheduler = FairScheduler(
+                "llm",
+                Config.SCHEDULER_LLM_SLOTS,
+                aging_seconds=Config.SCHEDULER_AGING_SECONDS,
+                reserved=Config.SCHEDULER_LLM_RESERVED
+            )
+            self.extraction_scheduler = FairScheduler(
+                "extraction",
+                Config.SCHEDULER_EXTRACTION_SLOTS,
+                aging_seconds=Config.SCHEDULER_AGING_SECONDS
             )
             
+            # Answers to the app's example questions, filled in by warm-up
+            self._example_answers = {}
+            
+            # Matter workspaces by id, each indexing several documents for cross-document questions;
+            # least recently used first, at most Config.WORKSPACES_MAX
+            self.workspaces = OrderedDict()
+            self._workspaces_lock = threading.Lock()
+            
+            # OCR for scanned pages, when a local engine is installed
+            self.ocr = None
+            if Config.OCR_ENABLED:
+                if ocr_available():
+                    self.ocr = PageOCR(
+                        Config.OCR_CACHE_DIR,
+                        max_pages=Config.OCR_MAX_PAGES,
+                        timeout=Config.OCR_TIMEOUT_SECONDS,
+                        dpi=Config.OCR_DPI,
+                        language=Config.OCR_LANGUAGE,
+                        max_workers=Config.OCR_WORKERS or None
+                    )
+                else:
+                    logger.warning("OCR unavailable: install pytesseract, pypdfium2 and tesseract to read scanned PDFs")
+            
+            # Export request traces for offline inspection
+            if Config.TRACING_ENABLED:
+                configure_tracing(Config.TRACE_FILE, Config.TRACE_SAMPLE_RATE, Config.TRACE_RETENTION_DAYS)
+            
             logger.info("Legal Advisor Bot initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing Legal Advisor Bot: {e}")
             raise APIKeyError("Failed to initialize the Legal Advisor Bot") from e
     
-    def process_query(self, query, pdf_path=None):
+    def _new_memory(self):
+        """Create an empty conversation memory of the configured type."""
+        memory_params = Config.get_memory_params()
+        if Config.MEMORY_TYPE == "conversation_buffer_window":
+            return ConversationBufferWindowMemory(**memory_params)
+        return ConversationBufferMemory(**memory_params)
+    
+    def _conversation_memory(self):
         """
-        Process a legal query with or without an accompanying document.
+        Return the memory of the conversation the current request belongs to.
+        
+        Work bound to a session (see src.scheduler.scheduling_scope) uses the
+        conversation opened for it with open_conversation, and a session without
+        one is answered without history. Work outside any session uses self.memory.
+        
+        Returns:
+            The conversation memory, or None to answer without history
+        """
+        session_id = current_scheduling()[1]
+        if not session_id:
+            return self.memory
+        with self._conversations_lock:
+            memory = self._conversations.get(session_id)
+            if memory is not None:
+                self._conversations.move_to_end(session_id)
+            return memory
+    
+    def _chat_history(self, inputs):
+        """Return the prompt's chat_history input for the current conversation."""
+        memory = self._conversation_memory()
+        if memory is None:
+            return {"chat_history": ""}
+        return memory.load_memory_variables(inputs)
+    
+    def _remember(self, query, response):
+        """Save an exchange to the current conversation, if it has a memory."""
+        memory = self._conversation_memory()
+        if memory is not None:
+            memory.save_context({"human_input": query}, {"text": response})
+    
+    def _profiler(self, name, profile=None, track_memory=False):
+        """
+        Return a context manager that profiles the request if profiling is on.
+        
+        Args:
+            name (str): Name of the profiled operation
+            profile (bool, optional): Per-request override; None follows Config.PROFILING_ENABLED
+            track_memory (bool): Record the tracemalloc peak allocation
+        """
+        enabled = Config.PROFILING_ENABLED if profile is None else profile
+        return maybe_profile(
+            name,
+            enabled,
+            Config.PROFILE_DIR,
+            max_profiles=Config.PROFILE_MAX_FILES,
+            sample_interval=Config.PROFILE_SAMPLE_INTERVAL,
+            track_memory=track_memory
+        )
+    
+    def _extract_document(self, pdf_path, report=None, document_info=None):
+        """
+        Check a document's size and extract its text.
+        
+        Args:
+            pdf_path (str): Path to the PDF document
+            report (Callable, optional): Called with (stage, fraction) to report progress
+            document_info (dict, optional): Filled with the document's "hash" (when the document
+                store is enabled), its "pages", the "page_starts" of the pages in the text and the
+                "page_hashes" of their text; a "hash" already present is used as is
+            
+        Returns:
+            str: Extracted text
+        """
+        report = report or (lambda stage, fraction=0.0: None)
+        
+        # Check file size
+        with pipeline_stage("size_check"):
+            file_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
+        if file_size_mb > Config.MAX_PDF_SIZE_MB:
+            logger.warning(f"Document too large: {file_size_mb:.2f}MB")
+            raise DocumentTooLargeError(f"Document exceeds the maximum size of {Config.MAX_PDF_SIZE_MB}MB")
+        
+        # Reuse the pages of a document extracted before
+        document_hash = (document_info or {}).get("hash")
+        pages = None
+        if self.document_store:
+            if not document_hash:
+                with pipeline_stage("hashing"):
+                    document_hash = get_file_hash(pdf_path, "sha256")
+            with pipeline_stage("document_store_read"):
+                stored = document_hash in self.document_store
+                record_cache_lookup("document_store", stored)
+                if stored:
+                    pages = self.document_store.get_pages(document_hash)
+            if document_info is not None:
+                document_info["hash"] = document_hash
+        if pages is not None:
+            report("extraction", 1.0)
+            pdf_text = join_pages(pages)
+            if pdf_text:
+                if document_info is not None:
+                    document_info.update(pages=pages, page_starts=page_offsets(pages), page_hashes=page_hashes(pages))
+                return pdf_text
+        
+        # Extract PDF text
+        with self.extraction_scheduler.slot():
+            report("extraction")
+            with pipeline_stage("pdf_extraction"):
+                pages = extract_pages_from_pdf(
+                    pdf_path,
+                    progress_callback=lambda done, total: report("extraction", done / total),
+                    page_cache=self.revision_cache
+                )
+            
+            # Recognize pages without a text layer, such as scans
+            empty_pages = [i for i, page_text in enumerate(pages or []) if not page_text.strip()]
+            ocr_incomplete = False
+            if empty_pages and self.ocr:
+                report("ocr")
+                with pipeline_stage("ocr", pages=len(empty_pages)) as ocr_span:
+                    recognized = self.ocr.recognize(
+                        pdf_path,
+                        empty_pages,
+                        progress_callback=lambda done, total: report("ocr", done / total)
+                    )
+                    for index, page_text in recognized.items():
+                        pages[index] = page_text
+                    ocr_span.set_attribute("recognized", len(recognized))
+                    ocr_incomplete = len(recognized) < len(empty_pages)
+        
+        pdf_text = join_pages(pages) if pages is not None else None
+        if not pdf_text:
+            logger.error("Failed to extract text from PDF")
+            raise PDFExtractionError("Could not extract text from the provided PDF")
+        # Pages OCR skipped or could not read in time are retried on the next upload rather than stored empty
+        if self.document_store and not ocr_incomplete:
+            with pipeline_stage("document_store_write"):
+                self.document_store.put(document_hash, pages)
+        if document_info is not None:
+            document_info.update(pages=pages, page_starts=page_offsets(pages), page_hashes=page_hashes(pages))
+        return pdf_text
+    
+    def _prepare_document(self, pdf_path, report=None, document_info=None):
+        """
+        Extract, classify and chunk a document, or reuse an earlier preparation of the same content.
+        
+        Preparations are kept by content hash, so a document prepared speculatively
+        on upload (see prepare_document) is ready when its analysis starts. A
+        preparation of the same document already under way is waited for rather
+        than repeated.
+        
+        Args:
+            pdf_path (str): Path to the PDF document
+            report (Callable, optional): Called with (stage, fraction) to report progress
+            document_info (dict, optional): Filled with the document's "hash", "text", "chunks",
+                "page_starts", "page_hashes" and "clauses"; a "hash" already present is used as is
+            
+        Returns:
+            dict: document_info
+        """
+        report = report or (lambda stage, fraction=0.0: None)
+        document_info = document_info if document_info is not None else {}
+        if not document_info.get("hash"):
+            with pipeline_stage("hashing"):
+                document_info["hash"] = get_file_hash(pdf_path, "sha256")
+        document_hash = document_info["hash"]
+        
+        with self._prepared_lock:
+            preparation = self._preparing.setdefault(document_hash, _Preparation())
+            preparation.users += 1
+        try:
+            return self._prepare_locked(pdf_path, report, document_info, preparation)
+        finally:
+            with self._prepared_lock:
+                preparation.users -= 1
+                self._forget_preparation(document_hash)
+    
+    def _prepare_locked(self, pdf_path, report, document_info, preparation):
+        """Body of _prepare_document, run under the document's preparation lock."""
+        document_hash = document_info["hash"]
+        with self._preparation_turn(preparation):
+            with self._prepared_lock:
+                prepared = self._prepared.get(document_hash)
+                if prepared is not None:
+                    self._prepared.move_to_end(document_hash)
+            record_cache_lookup("prepared_document", prepared is not None)
+            if prepared is not None:
+                logger.info(f"Reusing prepared document {document_hash[:12]}")
+                report("chunking", 1.0)
+                document_info.update(prepared)
+                return document_info
+            
+            pdf_text = self._extract_document(pdf_path, report, document_info)
+            check_cancelled()
+            
+            with pipeline_stage("clause_classification") as classification_span:
+                clauses = classify_clauses(pdf_text, document_info.get("page_starts"))
+                classification_span.set_attributes(sections=len(clauses.sections), tags=len(clauses.tags))
+            
+            # Split the document into chunks for downstream processing
+            with pipeline_stage("chunking") as chunking_span:
+                report("chunking")
+                chunks = chunk_text(pdf_text, Config.CHUNK_SIZE)
+                logger.info(f"Document split into {len(chunks)} chunks")
+                chunking_span.set_attribute("chunks", len(chunks))
+                report("chunking", 1.0)
+            document_info.update(text=pdf_text, chunks=chunks, clauses=clauses)
+            
+            with self._prepared_lock:
+                self._prepared[document_hash] = {
+                    key: document_info[key] for key in ("text", "chunks", "page_starts", "page_hashes", "clauses")
+                    if key in document_info
+                }
+                while len(self._prepared) > Config.PREPARED_DOCUMENTS_MAX:
+                    self._prepared.popitem(last=False)
+        return document_info
+    
+    @contextmanager
+    def _preparation_turn(self, preparation):
+        """
+        Hold a document's preparation lock for the block.
+        
+        While waiting, the caller holding the lock is raised to the waiter's priority
+        class: a speculative preparation runs as batch work, and an analysis waiting
+        for it must not wait behind every other batch job for the extraction slot.
+        """
+        priority = current_scheduling()[0] or PRIORITY_INTERACTIVE
+        while True:
+            holder = preparation.priority
+            if holder is not None and holder.raise_to(priority):
+                logger.info(f"Raised a preparation waited for to {priority} priority")
+            if preparation.lock.acquire(timeout=PREPARATION_POLL_INTERVAL):
+                break
+            check_cancelled()
+        try:
+            with shared_priority() as preparation.priority:
+                yield
+        finally:
+            preparation.priority = None
+            preparation.lock.release()
+    
+    def _forget_preparation(self, document_hash):
+        """
+        Drop a document's preparation lock once no caller uses it, whether its preparation
+        was stored, failed or was cancelled. Called with _prepared_lock held.
+        """
+        preparation = self._preparing.get(document_hash)
+        if preparation is not None and not preparation.users:
+            del self._preparing[document_hash]
+    
+    def _summarize_sections(self, document_info, report):
+        """
+        Summarize the sections of a long document, reusing stored summaries of unchanged sections.
+        
+        Sections are summarized several at a time, and each summary is stored as
+        soon as it is written, so even an interrupted analysis is not lost.
+        
+        Args:
+            document_info (dict): The prepared document, see _prepare_document
+            report (Callable): Called with (stage, fraction) to report progress
+            
+        Returns:
+            str: Section summaries labelled with their pages and clause types
+        """
+        text = document_info["text"]
+        clauses = document_info["clauses"]
+        sections = split_sections(text, document_info["page_starts"], document_info["page_hashes"],
+                                  Config.ANALYSIS_SECTION_CHARS)
+        keys = [section_key(section, SECTION_SUMMARY_VERSION, Config.LLM_MODEL) for section in sections]
+        results = [self.revision_cache.get_section(key) if self.revision_cache else None for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        for result in results:
+            record_cache_lookup("section_summary", result is not None)
+        
+        def summarize(index):
+            section = sections[index]
+            tags = list(dict.fromkeys(tag.label for tag in clauses.tags if section.start <= tag.start < section.end))
+            prompt = SECTION_SUMMARY_TEMPLATE.format(text=text[section.start:section.end], tags=", ".join(tags) or "none")
+            pieces = []
+            with self.llm_scheduler.slot(), closing(self.llm.stream(prompt)) as stream:
+                for piece in stream:
+                    check_cancelled()
+                    pieces.append(piece)
+            summary = "".join(pieces).strip()
+            if self.revision_cache:
+                self.revision_cache.put_section(keys[index], summary, tags)
+            return summary, tags
+        
+        with pipeline_stage("section_summaries", sections=len(sections), reused=len(sections) - len(pending)):
+            logger.info(f"Summarizing {len(pending)} of {len(sections)} sections")
+            report("summarizing")
+            if pending:
+                with ThreadPoolExecutor(max_workers=min(Config.ANALYSIS_SECTION_WORKERS, len(pending)),
+                                        thread_name_prefix="section-summary") as executor:
+                    # Each summary runs in a copy of this context, so it keeps the trace, priority and cancellation
+                    futures = {executor.submit(contextvars.copy_context().run, summarize, i): i for i in pending}
+                    try:
+                        for done, future in enumerate(as_completed(futures), 1):
+                            results[futures[future]] = future.result()
+                            report("summarizing", done / len(pending))
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+        return format_section_summaries(sections, results)
+    
+    def _build_input_text(self, query, pdf_path=None, report=None, document_info=None, preview_callback=None,
+                          summarize=False, active_document=None):
+        """
+        Build the text passed to the model for a query, extracting the document if one is given.
+        
+        Long documents are cut down to the sections the clause classifier
+        ranks highest, or with summarize set, replaced by summaries of their
+        sections. The clause types found are listed in the prompt.
         
         Args:
             query (str): User's legal question
             pdf_path (str, optional): Path to PDF document to analyze
+            report (Callable, optional): Called with (stage, fraction) to report progress
+            document_info (dict, optional): Filled with the prepared document, see _prepare_document
+            preview_callback (Callable, optional): Called with a markdown "clauses found" preview
+                as soon as the document is classified
+            summarize (bool): Send section summaries instead of the text of documents of at least
+                Config.INCREMENTAL_ANALYSIS_MIN_CHARS characters
+            active_document (str, optional): Name of the document the question follows up on
             
         Returns:
-            str: Response from the legal advisor
+            str: Input text for the prompt
         """
-        try:
-            # If a PDF is provided, extract its text and include it in the query
-            if pdf_path:
-                logger.info(f"Processing query with document: {pdf_path}")
-                
-                # Check file size
-                file_size_mb = os.path.getsize(pdf_path) / (1024 * 1024)
-                if file_size_mb > Config.MAX_PDF_SIZE_MB:
-                    logger.warning(f"Document too large: {file_size_mb:.2f}MB")
-                    raise DocumentTooLargeError(f"Document exceeds the maximum size of {Config.MAX_PDF_SIZE_MB}MB")
-                
-                # Extract PDF text
-                pdf_text = extract_text_from_pdf(pdf_path)
-                if not pdf_text:
-                    logger.error("Failed to extract text from PDF")
-                    raise PDFExtractionError("Could not extract text from the provided PDF")
-                
-                # Combine the query with the extracted text
-                input_text = f"Document Analysis Request: {query}\n\nDocument Content:\n{pdf_text}"
-                
-            else:
+        report = report or (lambda stage, fraction=0.0: None)
+        
+        # If a PDF is provided, extract its text and include it in the query
+        if not pdf_path:
+            with pipeline_stage("prompt_assembly"):
+                if active_document:
+                    logger.info(f"Processing follow-up query about {active_document}")
+                    return f"Follow-up Question about {active_document}, analyzed earlier in this conversation: {query}"
                 logger.info(f"Processing general legal query")
-                input_text = f"Legal Question: {query}"
+                return f"Legal Question: {query}"
+        
+        logger.info(f"Processing query with document: {pdf_path}")
+        document_info = self._prepare_document(pdf_path, report, document_info)
+        check_cancelled()
+        
+        # Clause types were tagged locally, so the user sees them before the model answers
+        clauses = document_info["clauses"]
+        if preview_callback:
+            preview_callback(clauses.summary_markdown())
+        
+        # Long documents are analyzed from summaries of their sections, which a revised draft reuses
+        minimum = Config.INCREMENTAL_ANALYSIS_MIN_CHARS
+        if summarize and minimum and len(document_info["text"]) >= minimum:
+            summaries = self._summarize_sections(document_info, report)
+            with pipeline_stage("prompt_assembly") as assembly_span:
+                assembly_span.set_attribute("document_chars_sent", len(summaries))
+                return (f"Document Analysis Request: {query}\n\n"
+                        f"Clauses found by pre-screening: {clauses.summary()}\n\n"
+                        f"Section Summaries:\n{summaries}")
+        
+        with pipeline_stage("prompt_assembly") as assembly_span:
+            # Keep the highest-priority sections of documents too long to send whole
+            document_text = clauses.select_text(Config.DOCUMENT_PROMPT_MAX_CHARS)
+            assembly_span.set_attribute("document_chars_sent", len(document_text))
             
-            # Log the API request
-            log_api_request("llm_chain", {"query": query, "has_document": pdf_path is not None}, True)
+            # Combine the query with the extracted text
+            return (f"Document Analysis Request: {query}\n\n"
+                    f"Clauses found by pre-screening: {clauses.summary()}\n\n"
+                    f"Document Content:\n{document_text}")
+    
+    def _is_follow_up(self, pdf_path=None, active_document=None):
+        """
+        Whether a question follows up on a document analyzed earlier in its conversation.
+        
+        The analysis is only in the prompt through the conversation history, so a
+        request without a conversation (see _conversation_memory) is never a follow-up.
+        """
+        return not pdf_path and bool(active_document) and self._conversation_memory() is not None
+    
+    def _select_prompt(self, pdf_path=None, active_document=None):
+        """
+        Choose the prompt variant for a query from its mode and Config.PROMPT_STYLE.
+        
+        Args:
+            pdf_path (str, optional): Path to the document sent with the query
+            active_document (str, optional): Name of the document the question follows up on
             
-            # Get response from the chain
-            response = self.chain.invoke({
-                "text": input_text,
-                "human_input": query
-            })
+        Returns:
+            PromptVariant: The variant to use
+        """
+        if pdf_path:
+            mode = MODE_DOCUMENT
+        elif self._is_follow_up(pdf_path, active_document):
+            mode = MODE_FOLLOWUP
+        else:
+            mode = MODE_GENERAL
+        return get_prompt_variant(mode, Config.PROMPT_STYLE, get_request_id())
+    
+    def _query_priority(self, pdf_path=None):
+        """
+        Return the scheduling priority class of a query from the request itself.
+        
+        A chat question stays interactive even when it follows up on an analyzed document,
+        so it can use the reserved slots; the follow-up class is for workspace questions.
+        """
+        return PRIORITY_DOCUMENT if pdf_path else PRIORITY_INTERACTIVE
+    
+    def _prompt_for(self, variant):
+        """Return the prompt template of a prompt variant, creating it on first use."""
+        prompt = self._prompts.get(variant.name)
+        if prompt is None:
+            prompt = PromptTemplate(
+                input_variables=["text", "chat_history", "human_input"],
+                template=variant.template
+            )
+            self._prompts[variant.name] = prompt
+        return prompt
+    
+    def prepare_prompts(self):
+        """
+        Create the prompt templates of every prompt variant the configured style can select.
+        
+        Returns:
+            int: Number of prompts prepared
+        """
+        styles = (STYLE_COMPACT, STYLE_FULL) if Config.PROMPT_STYLE == STYLE_AB else (Config.PROMPT_STYLE,)
+        variants = [variant for variant in PROMPT_VARIANTS.values() if variant.style in styles]
+        for variant in variants:
+            self._prompt_for(variant)
+        return len(variants)
+    
+    def _run_query(self, query, pdf_path=None, report=None, document_info=None, variant=None, preview_callback=None,
+                   summarize=False, use_history=True, active_document=None):
+        """
+        Run a query through the model, raising on failure.
+        
+        Args:
+            query (str): User's legal question
+            pdf_path (str, optional): Path to PDF document to analyze
+            report (Callable, optional): Called with (stage, fraction) to report progress
+            document_info (dict, optional): Filled with the extracted document, see _build_input_text
+            variant (PromptVariant, optional): Prompt to use, chosen by _select_prompt if omitted
+            preview_callback (Callable, optional): Called with the "clauses found" preview, see _build_input_text
+            summarize (bool): Analyze long documents from section summaries, see _build_input_text
+            use_history (bool): Include the conversation history in the prompt, see _invoke_chain
+            active_document (str, optional): Name of the document the question follows up on
             
-            # Format the response
-            formatted_response = format_response(response)
+        Returns:
+            str: Formatted response from the model
+        """
+        report = report or (lambda stage, fraction=0.0: None)
+        variant = variant or self._select_prompt(pdf_path, active_document)
+        if variant.mode != MODE_FOLLOWUP:
+            active_document = None
+        input_text = self._build_input_text(query, pdf_path, report, document_info, preview_callback, summarize,
+                                            active_document)
+        request_params = {"query": query, "has_document": pdf_path is not None, "prompt_variant": variant.name}
+        formatted_response = self._invoke_chain(query, input_text, variant, request_params, report, use_history)
+        
+        # Log the user interaction
+        document_name = os.path.basename(pdf_path) if pdf_path else None
+        log_user_interaction(query, len(formatted_response), document_name)
+        
+        return formatted_response
+    
+    def _invoke_chain(self, query, input_text, variant, request_params, report, use_history=True):
+        """
+        Send prepared input to the model with a prompt variant and format the response.
+        
+        Args:
+            query (str): User's question, saved to the conversation memory
+            input_text (str): Text for the prompt's {text} placeholder
+            variant (PromptVariant): Prompt to use
+            request_params (dict): Parameters recorded in the API request log
+            report (Callable): Called with (stage, fraction) to report progress
+            use_history (bool): Include the conversation history in the prompt; results shared
+                with other users are built without it so they never carry someone else's conversation
             
-            # Log the user interaction
-            document_name = os.path.basename(pdf_path) if pdf_path else None
-            log_user_interaction(query, len(formatted_response), document_name)
+        Returns:
+            str: Formatted response from the model
+        """
+        PROMPT_REQUESTS.labels(variant=variant.name).inc()
+        PROMPT_INSTRUCTION_TOKENS.labels(variant=variant.name).inc(variant.token_cost)
+        
+        # Assemble the prompt from the variant's template and the chat history
+        inputs = {"text": input_text, "human_input": query}
+        if use_history:
+            inputs.update(self._chat_history(inputs))
+        else:
+            inputs["chat_history"] = ""
+        prompt_text = self._prompt_for(variant).format(**inputs)
+        
+        # Stream the response so a cancelled query stops at the next piece; closing
+        # the stream aborts the model request instead of letting it run to completion
+        report("llm")
+        check_cancelled()
+        pieces = []
+        try:
+            with pipeline_stage("llm_call", input_chars=len(input_text), input_tokens=estimate_tokens(input_text),
+                                prompt_variant=variant.name, instruction_tokens=variant.token_cost):
+                with self.llm_scheduler.slot(), \
+                        closing(self.llm.stream(prompt_text, config={"callbacks": [ModelTracingHandler()]})) as stream:
+                    for piece in stream:
+                        check_cancelled()
+                        pieces.append(piece)
+        except Exception:
+            log_api_request("llm_chain", request_params, False)
+            raise
+        
+        # Log the API request once its outcome is known, and save the exchange to the conversation memory
+        log_api_request("llm_chain", request_params, True)
+        response = "".join(pieces)
+        self._remember(query, response)
+        
+        # Format the response
+        with pipeline_stage("format_response") as format_span:
+            formatted_response = format_response(response)
+            format_span.set_attribute("response_chars", len(formatted_response))
+        return formatted_response
+    
+    def process_query(self, query, pdf_path=None, progress_callback=None, request_id=None, profile=None,
+                      active_document=None):
+        """
+        Process a legal query with or without an accompanying document.
+        
+        Args:
+            query (str): User's legal question
+            pdf_path (str, optional): Path to PDF document to analyze
+            progress_callback (Callable, optional): Called with (stage, fraction) as the
+                query moves through the extraction, chunking and llm stages
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            active_document (str, optional): Name of a document analyzed earlier in this conversation;
+                the question is answered as a follow-up on it
             
-            return formatted_response
+        Returns:
+            str: Response from the legal advisor
+        """
+        try:
+            kind = "document" if pdf_path else "question"
+            with trace_request("process_query", request_id, kind=kind), track_query(kind), \
+                    default_priority(self._query_priority(pdf_path)), \
+                    self._profiler("process_query", profile, track_memory=pdf_path is not None):
+                return self._run_query(query, pdf_path, progress_callback, active_document=active_document)
         
+        except OperationCancelledError:
+            # Cancelled work has no answer; the job or caller that cancelled it handles this
+            raise
         except (APIKeyError, PDFExtractionError, DocumentTooLargeError) as e:
             # Handle known exceptions
             return handle_exception(e)
@@ -175,48 +774,656 @@ class LegalAdvisorBot:
             log_exception(e, context="process_query")
             return handle_exception(e, "Failed to process your query")
     
-    def get_response(self, query):
+    def stream_query(self, query, pdf_path=None, use_glossary=True, active_document=None):
+        """
+        Process a legal query and yield the response incrementally as the model generates it.
+        
+        Uses the same prompt and conversation memory as process_query; the full
+        response is saved to memory once streaming completes.
+        
+        Args:
+            query (str): User's legal question
+            pdf_path (str, optional): Path to PDF document to analyze
+            use_glossary (bool): Answer definitional questions from the glossary in a single piece
+            active_document (str, optional): Name of the document the question follows up on, see process_query
+            
+        Yields:
+            str: Successive pieces of the response
+        """
+        if use_glossary and not pdf_path:
+            glossary_answer = self.answer_from_glossary(query)
+            if glossary_answer is not None:
+                yield glossary_answer
+                return
+        
+        try:
+            with trace_request("stream_query", kind="stream"), track_query("stream"), \
+                    default_priority(self._query_priority(pdf_path)):
+                variant = self._select_prompt(pdf_path, active_document)
+                if variant.mode != MODE_FOLLOWUP:
+                    active_document = None
+                input_text = self._build_input_text(query, pdf_path, active_document=active_document)
+                request_params = {"query": query, "has_document": pdf_path is not None, "prompt_variant": variant.name}
+                
+                # Assemble the prompt from the variant's template and the chat history
+                with pipeline_stage("prompt_assembly"):
+                    inputs = {"text": input_text, "human_input": query}
+                    inputs.update(self._chat_history(inputs))
+                    prompt_text = self._prompt_for(variant).format(**inputs)
+                
+                PROMPT_REQUESTS.labels(variant=variant.name).inc()
+                PROMPT_INSTRUCTION_TOKENS.labels(variant=variant.name).inc(variant.token_cost)
+                # Closing the stream aborts the model request when the query is cancelled or the
+                # consumer stops reading (e.g. a disconnected client closes this generator)
+                check_cancelled()
+                pieces = []
+                try:
+                    with pipeline_stage("llm_call", input_tokens=estimate_tokens(prompt_text),
+                                        prompt_variant=variant.name, instruction_tokens=variant.token_cost):
+                        with self.llm_scheduler.slot(), closing(self.llm.stream(prompt_text)) as stream:
+                            for piece in stream:
+                                check_cancelled()
+                                pieces.append(piece)
+                                yield piece
+                except Exception:
+                    log_api_request("llm_stream", request_params, False)
+                    raise
+                log_api_request("llm_stream", request_params, True)
+            
+            response = "".join(pieces)
+            self._remember(query, response)
+            
+            document_name = os.path.basename(pdf_path) if pdf_path else None
+            log_user_interaction(query, len(response), document_name)
+        
+        except OperationCancelledError:
+            raise
+        except (APIKeyError, PDFExtractionError, DocumentTooLargeError) as e:
+            yield handle_exception(e)
+        except Exception as e:
+            log_exception(e, context="stream_query")
+            yield handle_exception(e, "Failed to process your query")
+    
+    def answer_from_glossary(self, query, request_id=None):
+        """
+        Answer a definitional question ("What is indemnity?") directly from the glossary.
+        
+        Args:
+            query (str): User's legal question
+            request_id (str, optional): Id used to trace the request
+            
+        Returns:
+            Optional[str]: Formatted definition, or None if the question needs the model
+        """
+        if not Config.GLOSSARY_ANSWERS_ENABLED:
+            return None
+        
+        try:
+            with trace_request("glossary_answer", request_id) as answer_span:
+                with pipeline_stage("glossary_lookup"):
+                    entry = find_definition(query, get_glossary_store())
+                record_cache_lookup("glossary", entry is not None)
+                answer_span.set_attribute("hit", entry is not None)
+                if entry is None:
+                    return None
+                
+                term, definition = entry
+                answer_span.set_attribute("term", term)
+                response = format_definition_answer(term, definition)
+                
+                # Credit the model call that was skipped, estimated from observed model latency
+                model_latency = average_stage_latency("llm_call")
+                if model_latency is not None:
+                    GLOSSARY_LATENCY_SAVED.inc(max(model_latency - answer_span.elapsed(), 0.0))
+                
+                # Keep the answer in memory so follow-up questions have context
+                self._remember(query, response)
+                log_user_interaction(query, len(response))
+                logger.info(f"Answered definitional query from glossary: {term}")
+                return response
+        
+        except Exception as e:
+            # The glossary is only a shortcut; the caller falls back to the model
+            log_exception(e, context="answer_from_glossary")
+            return None
+    
+    def get_response(self, query, request_id=None, profile=None, use_glossary=True, active_document=None):
         """
         Process a user query and get a response.
         
+        Definitional questions are answered from the glossary when possible.
+        
         Args:
             query (str): User's legal question
+            request_id (str, optional): Id used to trace the request
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            use_glossary (bool): Answer definitional questions from the glossary; False always asks the model
+            active_document (str, optional): Name of the document the question follows up on, see process_query
             
         Returns:
             str: Response from the legal advisor
         """
         logger.info(f"Getting response for query: {query[:50]}...")
-        return self.process_query(query)
+        if use_glossary:
+            response = self.answer_from_glossary(query, request_id)
+            if response is not None:
+                return response
+        return self.process_query(query, request_id=request_id, profile=profile, active_document=active_document)
     
-    def analyze_document(self, pdf_path):
+    def prepare_document(self, pdf_path, progress_callback=None, request_id=None):
+        """
+        Prepare a document ahead of its analysis: hash, extract, classify and chunk it.
+        
+        Called speculatively as soon as a document is uploaded, so an analysis
+        started later only waits for the model. Preparing the same content
+        again does nothing.
+        
+        Args:
+            pdf_path (str): Path to the PDF document
+            progress_callback (Callable, optional): Called with (stage, fraction) as preparation progresses
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            
+        Returns:
+            str: Content hash of the document, to pass to discard_prepared
+            
+        Raises:
+            DocumentTooLargeError: If the document exceeds the size limit
+            PDFExtractionError: If no text can be extracted
+        """
+        with trace_request("prepare_document", request_id, kind="prepare"), track_query("prepare"), \
+                default_priority(PRIORITY_BATCH):
+            return self._prepare_document(pdf_path, progress_callback)["hash"]
+    
+    def discard_prepared(self, document_hash):
+        """Forget a prepared document, e.g. when its upload is removed before it is analyzed."""
+        with self._prepared_lock:
+            if self._prepared.pop(document_hash, None) is not None:
+                logger.info(f"Discarded prepared document {document_hash[:12]}")
+            self._forget_preparation(document_hash)
+    
+    def _example_key(self, question):
+        """Return the analysis store key and prompt version of a precomputed example answer."""
+        variant = get_prompt_variant(MODE_GENERAL, Config.PROMPT_STYLE)
+        question_hash = hashlib.sha256(question.strip().lower().encode("utf-8")).hexdigest()
+        return f"example:{question_hash}", f"{ANALYSIS_PROMPT_VERSION}:{variant.name}", variant
+    
+    def precompute_example(self, question):
+        """
+        Answer an example question ahead of time, outside any conversation.
+        
+        The answer is kept in memory and in the shared analysis store, so
+        pods started later reuse it instead of asking the model again.
+        
+        Args:
+            question (str): Example question offered in the app
+            
+        Returns:
+            bool: Whether the model was called (False when a stored answer was found)
+        """
+        key, prompt_version, variant = self._example_key(question)
+        if question in self._example_answers:
+            return False
+        if self.analysis_store:
+            cached = self.analysis_store.get(key, prompt_version, Config.LLM_MODEL)
+            if cached is not None:
+                self._example_answers[question] = cached
+                return False
+        
+        # Ask the model directly so the answer does not depend on, or enter, any conversation
+        with pipeline_stage("example_precompute"):
+            prompt = variant.template.format(text=f"Legal Question: {question}", chat_history="",
+                                             human_input=question)
+            with default_priority(PRIORITY_BATCH), self.llm_scheduler.slot():
+                answer = format_response(self.llm.invoke(prompt))
+        self._example_answers[question] = answer
+        if self.analysis_store:
+            self.analysis_store.put(key, prompt_version, Config.LLM_MODEL, answer)
+        return True
+    
+    def answer_example(self, question, request_id=None, profile=None):
+        """
+        Answer an example question, from its precomputed answer when there is one.
+        
+        Args:
+            question (str): Example question offered in the app
+            request_id (str, optional): Id used to trace the request
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            
+        Returns:
+            str: Response from the legal advisor
+        """
+        answer = self._example_answers.get(question)
+        record_cache_lookup("example", answer is not None)
+        if answer is None:
+            return self.get_response(question, request_id=request_id, profile=profile)
+        # Keep the conversation memory consistent with a fresh answer
+        self._remember(question, answer)
+        log_user_interaction(question, len(answer))
+        return answer
+    
+    def analyze_document(self, pdf_path, progress_callback=None, force=False, request_id=None, profile=None,
+                         preview_callback=None, raise_errors=False):
         """
         Analyze a legal document and provide a summary.
         
+        A completed analysis of a document with identical content is reused from
+        the shared analysis store unless force is set.
+        
         Args:
             pdf_path (str): Path to the PDF file
+            progress_callback (Callable, optional): Called with (stage, fraction) as analysis progresses
+            force (bool): Run a fresh analysis even if a stored one exists
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            preview_callback (Callable, optional): Called with a markdown "clauses found" preview
+                before the model is asked
+            raise_errors (bool): Raise failures instead of returning an error message, so a
+                background job is marked as failed
             
         Returns:
             str: Analysis of the legal document
         """
         try:
-            logger.info(f"Analyzing document: {pdf_path}")
+            with trace_request("analyze_document", request_id, kind="document") as analysis_span, \
+                    default_priority(PRIORITY_DOCUMENT), \
+                    self._profiler("analyze_document", profile, track_memory=True):
+                logger.info(f"Analyzing document: {pdf_path}")
+                
+                # Check if file exists
+                if not os.path.exists(pdf_path):
+                    logger.error(f"Document not found: {pdf_path}")
+                    if raise_errors:
+                        raise FileNotFoundError("Document not found")
+                    return "Error: Document not found."
+                
+                # Analyses made with different prompts are stored separately
+                variant = self._select_prompt(pdf_path)
+                prompt_version = f"{ANALYSIS_PROMPT_VERSION}:{variant.name}"
+                analysis_span.set_attribute("prompt_variant", variant.name)
+                
+                document_hash = ""
+                if self.analysis_store:
+                    with pipeline_stage("hashing"):
+                        document_hash = get_file_hash(pdf_path, "sha256")
+                
+                # Reuse a completed analysis of the same document if there is one
+                if document_hash and not force:
+                    cached = self.analysis_store.get(document_hash, prompt_version, Config.LLM_MODEL)
+                    record_cache_lookup("analysis", cached is not None)
+                    analysis_span.set_attribute("cache_hit", cached is not None)
+                    if cached is not None:
+                        logger.info(f"Reusing stored analysis for document {document_hash[:12]}")
+                        # Keep the conversation memory consistent with a fresh analysis
+                        self._remember(ANALYSIS_QUERY, cached)
+                        log_user_interaction(ANALYSIS_QUERY, len(cached), os.path.basename(pdf_path))
+                        return cached
+                
+                # Process the document with a standard analysis query
+                document_info = {"hash": document_hash} if document_hash else {}
+                with track_query("document"):
+                    # Stored analyses are shared between users, so they are written without this conversation
+                    response = self._run_query(ANALYSIS_QUERY, pdf_path, progress_callback, document_info, variant,
+                                               preview_callback, summarize=True, use_history=False)
+                
+                # List the glossary terms used in the document with their definitions
+                with pipeline_stage("glossary_terms") as glossary_span:
+                    matcher = get_glossary_matcher()
+                    document_terms = matcher.find_terms(document_info.get("text", ""))
+                    glossary_span.set_attribute("terms", len(document_terms))
+                    if document_terms:
+                        response = f"{response}\n\n{matcher.glossary_section(document_terms)}"
+                
+                if document_hash:
+                    self.analysis_store.put(document_hash, prompt_version, Config.LLM_MODEL, response)
+                return response
+        
+        except OperationCancelledError:
+            raise
+        except (APIKeyError, PDFExtractionError, DocumentTooLargeError) as e:
+            if raise_errors:
+                raise
+            return handle_exception(e)
+        except Exception as e:
+            if raise_errors:
+                raise
+            log_exception(e, context="analyze_document")
+            return handle_exception(e, "Failed to analyze document")
+    
+    def compare_documents(self, old_pdf_path, new_pdf_path, progress_callback=None, force=False,
+                          request_id=None, profile=None, raise_errors=False):
+        """
+        Review the changes between two versions of a legal document.
+        
+        Both versions are split into clauses and aligned, and only the added,
+        removed and modified clauses are sent to the model. A stored review of
+        the same pair of documents is reused unless force is set.
+        
+        Args:
+            old_pdf_path (str): Path to the earlier version
+            new_pdf_path (str): Path to the later version
+            progress_callback (Callable, optional): Called with (stage, fraction) as the comparison progresses
+            force (bool): Run a fresh review even if a stored one exists
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            raise_errors (bool): Raise failures instead of returning an error message, so a
+                background job is marked as failed
             
-            # Check if file exists
-            if not os.path.exists(pdf_path):
-                logger.error(f"Document not found: {pdf_path}")
-                return "Error: Document not found."
+        Returns:
+            str: Review of the changes
+        """
+        report = progress_callback or (lambda stage, fraction=0.0: None)
+        try:
+            with trace_request("compare_documents", request_id, kind="compare") as compare_span, \
+                    default_priority(PRIORITY_DOCUMENT), \
+                    track_query("compare"), self._profiler("compare_documents", profile, track_memory=True):
+                old_name, new_name = os.path.basename(old_pdf_path), os.path.basename(new_pdf_path)
+                logger.info(f"Comparing documents: {old_name} -> {new_name}")
+                variant = get_prompt_variant(MODE_COMPARE, Config.PROMPT_STYLE, get_request_id())
+                prompt_version = f"{ANALYSIS_PROMPT_VERSION}:{variant.name}"
+                
+                pair_hash = ""
+                if self.analysis_store:
+                    with pipeline_stage("hashing"):
+                        pair_hash = get_file_hash(old_pdf_path, "sha256") + ":" + get_file_hash(new_pdf_path, "sha256")
+                    if not force:
+                        cached = self.analysis_store.get(pair_hash, prompt_version, Config.LLM_MODEL)
+                        record_cache_lookup("analysis", cached is not None)
+                        compare_span.set_attribute("cache_hit", cached is not None)
+                        if cached is not None:
+                            logger.info("Reusing stored comparison")
+                            self._remember(COMPARE_QUERY, cached)
+                            return cached
+                
+                # Extract each version over half of the extraction stage
+                old_text = self._extract_document(old_pdf_path, lambda stage, fraction=0.0: report(stage, fraction / 2))
+                check_cancelled()
+                new_text = self._extract_document(new_pdf_path,
+                                                  lambda stage, fraction=0.0: report(stage, 0.5 + fraction / 2))
+                
+                report("chunking")
+                with pipeline_stage("clause_diff") as diff_span:
+                    old_clauses = segment_clauses(old_text)
+                    new_clauses = segment_clauses(new_text)
+                    changes = diff_clauses(old_clauses, new_clauses)
+                    counts = count_changes(changes)
+                    diff_span.set_attributes(old_clauses=len(old_clauses), new_clauses=len(new_clauses), **counts)
+                report("chunking", 1.0)
+                
+                summary_line = (f"*Compared {len(old_clauses)} clauses in {old_name} with {len(new_clauses)} in "
+                                f"{new_name}: {counts['added']} added, {counts['removed']} removed, "
+                                f"{counts['modified']} modified.*")
+                if not changes:
+                    response = f"**Summary:** The two versions contain the same clauses; no changes were found.\n\n{summary_line}"
+                else:
+                    input_text = format_changes(changes, max_chars=Config.COMPARE_MAX_PROMPT_CHARS)
+                    request_params = {"query": COMPARE_QUERY, "has_document": True, "prompt_variant": variant.name}
+                    # Stored reviews are shared between users, so they are written without this conversation
+                    review = self._invoke_chain(COMPARE_QUERY, input_text, variant, request_params, report,
+                                                use_history=False)
+                    response = f"{review}\n\n{summary_line}"
+                log_user_interaction(COMPARE_QUERY, len(response), new_name)
+                
+                if pair_hash:
+                    self.analysis_store.put(pair_hash, prompt_version, Config.LLM_MODEL, response)
+                return response
+        
+        except OperationCancelledError:
+            raise
+        except (APIKeyError, PDFExtractionError, DocumentTooLargeError) as e:
+            if raise_errors:
+                raise
+            return handle_exception(e)
+        except Exception as e:
+            if raise_errors:
+                raise
+            log_exception(e, context="compare_documents")
+            return handle_exception(e, "Failed to compare documents")
+    
+    def create_workspace(self, name=""):
+        """
+        Create an empty matter workspace.
+        
+        Args:
+            name (str): Display name of the matter
+            
+        Returns:
+            Workspace: The new workspace; its id is used to add documents and ask questions
+        """
+        # Passages are read back from the document store when it is enabled instead of held in memory,
+        # and the store keeps the pages of workspace documents until they are removed
+        store = self.document_store
+        workspace = Workspace(name, passage_chars=Config.WORKSPACE_PASSAGE_CHARS,
+                              page_reader=store.get_page if store else None,
+                              pin=store.pin if store else None, unpin=store.unpin if store else None)
+        with self._workspaces_lock:
+            self.workspaces[workspace.id] = workspace
+            evicted = []
+            while len(self.workspaces) > Config.WORKSPACES_MAX:
+                evicted.append(self.workspaces.popitem(last=False)[1])
+        for old_workspace in evicted:
+            logger.info(f"Evicted workspace {old_workspace.id} ({len(old_workspace)} documents)")
+            old_workspace.clear()
+        logger.info(f"Created workspace {workspace.id} ({name or 'unnamed'})")
+        return workspace
+    
+    def get_workspace(self, workspace_id):
+        """
+        Return a workspace by id.
+        
+        Raises:
+            KeyError: If there is no workspace with that id
+        """
+        with self._workspaces_lock:
+            workspace = self.workspaces[workspace_id]
+            self.workspaces.move_to_end(workspace_id)
+            return workspace
+    
+    def add_to_workspace(self, workspace_id, pdf_path, document_name=None, progress_callback=None, request_id=None):
+        """
+        Extract a document and add its pages to a workspace's index.
+        
+        Only the new document is indexed; documents already in the workspace are
+        not touched, and a document with the same content is not added twice.
+        
+        Args:
+            workspace_id (str): Id of the workspace
+            pdf_path (str): Path to the PDF document
+            document_name (str, optional): Name used in citations, defaults to the file name
+            progress_callback (Callable, optional): Called with (stage, fraction) as the document is processed
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            
+        Returns:
+            WorkspaceDocument: The added document
+            
+        Raises:
+            KeyError: If there is no workspace with that id
+            DocumentTooLargeError: If the document exceeds the size limit
+            PDFExtractionError: If no text can be extracted
+        """
+        report = progress_callback or (lambda stage, fraction=0.0: None)
+        workspace = self.get_workspace(workspace_id)
+        document_name = document_name or os.path.basename(pdf_path)
+        
+        with trace_request("add_to_workspace", request_id, kind="document") as add_span, track_query("workspace_index"), \
+                default_priority(PRIORITY_DOCUMENT):
+            with pipeline_stage("hashing"):
+                document_hash = get_file_hash(pdf_path, "sha256")
+            document_info = {"hash": document_hash}
+            if workspace.needs_pages(document_hash):
+                self._extract_document(pdf_path, report, document_info)
+                check_cancelled()
+            # Documents the store did not keep, e.g. with incomplete OCR, keep their passage text
+            stored = self.document_store is not None and document_hash in self.document_store
+            
+            report("indexing")
+            with pipeline_stage("workspace_indexing") as index_span:
+                document = workspace.add_document(document_hash, document_name, document_info.get("pages", []),
+                                                  stored=stored)
+                index_span.set_attributes(passages=document.passages, workspace_passages=workspace.passage_count)
+            report("indexing", 1.0)
+            add_span.set_attributes(workspace=workspace_id, documents=len(workspace))
+            logger.info(f"Workspace {workspace_id}: indexed {document.name} "
+                        f"({document.pages} pages, {document.passages} passages)")
+            return document
+    
+    def query_workspace(self, workspace_id, query, request_id=None, profile=None, raise_errors=False):
+        """
+        Answer a question across all documents of a workspace, citing document and page.
+        
+        Only the passages most relevant to the question are sent to the model,
+        however many documents the workspace holds.
+        
+        Args:
+            workspace_id (str): Id of the workspace
+            query (str): User's legal question
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            profile (bool, optional): Profile this request; None follows Config.PROFILING_ENABLED
+            raise_errors (bool): Raise failures instead of returning an error message, so a
+                background job is marked as failed
             
-            # Process the document with a standard analysis query
-            query = "Please analyze this legal document and provide a comprehensive summary."
-            return self.process_query(query, pdf_path)
+        Returns:
+            str: Answer followed by the list of cited sources
+        """
+        try:
+            with trace_request("query_workspace", request_id, kind="workspace") as query_span, \
+                    default_priority(PRIORITY_FOLLOW_UP), \
+                    track_query("workspace"), self._profiler("query_workspace", profile):
+                try:
+                    workspace = self.get_workspace(workspace_id)
+                except KeyError:
+                    if raise_errors:
+                        raise
+                    return "Error: Workspace not found."
+                if not workspace.documents:
+                    return "This workspace has no documents yet. Add documents to the workspace before asking about them."
+                
+                with pipeline_stage("workspace_retrieval") as retrieval_span:
+                    results = workspace.search(query, Config.WORKSPACE_TOP_K)
+                    retrieval_span.set_attributes(passages=len(results), documents=len(workspace))
+                query_span.set_attribute("passages", len(results))
+                if not results:
+                    return ("**Summary:** None of the documents in this workspace contain passages matching your "
+                            "question. Try rephrasing it with the terms used in the documents.")
+                
+                variant = get_prompt_variant(MODE_WORKSPACE, Config.PROMPT_STYLE, get_request_id())
+                input_text = format_passages(results)
+                request_params = {"query": query, "has_document": True, "prompt_variant": variant.name}
+                answer = self._invoke_chain(query, input_text, variant, request_params,
+                                            lambda stage, fraction=0.0: None)
+                response = f"{answer}\n\n{format_sources(results)}"
+                log_user_interaction(query, len(response), workspace.name or workspace_id)
+                return response
         
+        except OperationCancelledError:
+            raise
+        except (APIKeyError, PDFExtractionError, DocumentTooLargeError) as e:
+            if raise_errors:
+                raise
+            return handle_exception(e)
         except Exception as e:
-            return handle_exception(e, "Failed to analyze document")
+            if raise_errors:
+                raise
+            log_exception(e, context="query_workspace")
+            return handle_exception(e, "Failed to answer from the workspace")
+    
+    def generate_quiz(self, pdf_path, questions_per_chunk=None, max_chunks=None, tone="simple", request_id=None):
+        """
+        Generate a multiple choice quiz about a legal document.
+        
+        The document is chunked and a quiz is requested for each chunk, several
+        at a time; questions are validated as they stream and duplicates removed.
+        
+        Args:
+            pdf_path (str): Path to the PDF file
+            questions_per_chunk (int, optional): Questions per chunk, defaults to Config.QUIZ_QUESTIONS_PER_CHUNK
+            max_chunks (int, optional): Maximum chunks quizzed, spread over the document;
+                defaults to Config.QUIZ_MAX_CHUNKS
+            tone (str): Tone of the questions
+            request_id (str, optional): Id used to trace the request, generated if omitted
+            
+        Returns:
+            List[Dict]: Questions as {"mcq", "options", "correct"} dictionaries
+            
+        Raises:
+            DocumentTooLargeError: If the document exceeds the size limit
+            PDFExtractionError: If no text can be extracted
+        """
+        questions_per_chunk = questions_per_chunk or Config.QUIZ_QUESTIONS_PER_CHUNK
+        max_chunks = max_chunks or Config.QUIZ_MAX_CHUNKS
+        
+        with trace_request("generate_quiz", request_id, kind="quiz") as quiz_span, track_query("quiz"), \
+                default_priority(PRIORITY_DOCUMENT):
+            logger.info(f"Generating quiz for document: {pdf_path}")
+            pdf_text = self._extract_document(pdf_path)
+            chunks = chunk_text(pdf_text, Config.CHUNK_SIZE)
+            if len(chunks) > max_chunks:
+                # Spread the quizzed chunks evenly over the document
+                chunks = [chunks[i * len(chunks) // max_chunks] for i in range(max_chunks)]
+            quiz_span.set_attribute("chunks", len(chunks))
+            
+            with pipeline_stage("quiz_generation"):
+                generator = QuizGenerator(self.llm, max_workers=Config.QUIZ_MAX_WORKERS, scheduler=self.llm_scheduler)
+                questions = generator.generate_batch(chunks, questions_per_chunk, tone)
+            quiz_span.set_attribute("questions", len(questions))
+            return questions
     
-    def reset_conversation(self):
-        """Reset the conversation memory"""
-        logger.info("Resetting conversation memory")
-        self.memory.clear()
+    def open_conversation(self, session_id=None):
+        """
+        Open a conversation with its own memory for a session, or touch it if it is already open.
+        
+        Requests bound to the session (see src.scheduler.scheduling_scope) then
+        see only its history. The least recently used conversation is forgotten
+        beyond Config.CONVERSATIONS_MAX.
+        
+        Args:
+            session_id (str, optional): Id of the session, generated if omitted
+            
+        Returns:
+            str: The session id
+        """
+        session_id = session_id or uuid.uuid4().hex
+        with self._conversations_lock:
+            if session_id in self._conversations:
+                self._conversations.move_to_end(session_id)
+                return session_id
+            self._conversations[session_id] = self._new_memory()
+            while len(self._conversations) > Config.CONVERSATIONS_MAX:
+                evicted, _ = self._conversations.popitem(last=False)
+                logger.info(f"Forgot conversation {evicted}")
+        return session_id
+    
+    def has_conversation(self, session_id):
+        """Whether a session has an open conversation in this process."""
+        with self._conversations_lock:
+            return session_id in self._conversations
+    
+    def end_conversation(self, session_id):
+        """
+        Forget a session's conversation.
+        
+        Returns:
+            bool: Whether the session had an open conversation
+        """
+        with self._conversations_lock:
+            return self._conversations.pop(session_id, None) is not None
+    
+    def reset_conversation(self, session_id=None):
+        """
+        Clear the memory of a conversation.
+        
+        Args:
+            session_id (str, optional): Session whose conversation is cleared; defaults to the
+                session bound to the current context, else the conversation outside any session
+        """
+        session_id = session_id or current_scheduling()[1]
+        logger.info(f"Resetting conversation memory{f' of session {session_id}' if session_id else ''}")
+        if not session_id:
+            self.memory.clear()
+            return
+        with self._conversations_lock:
+            memory = self._conversations.get(session_id)
+        if memory is not None:
+            memory.clear()
 
 # Interactive chat function for testing
 def interactive_chat():
@@ -231,6 +1438,8 @@ def interactive_chat():
         print("Type 'reset' to clear conversation history.")
         print("Type 'analyze: [pdf_path]' to analyze a document.\n")
         
+        # Document analyzed in this conversation; later questions follow up on it
+        active_document = None
         while True:
             user_input = input("You: ")
             
@@ -241,19 +1450,27 @@ def interactive_chat():
                 
             if user_input.lower() == 'reset':
                 bot.reset_conversation()
+                active_document = None
                 print("Conversation history cleared.")
                 continue
             
+            # Each input is traced as its own request
+            request_id = new_request_id()
+            
             # Check if the user wants to analyze a document
             if user_input.lower().startswith('analyze:'):
                 pdf_path = user_input[8:].strip()
                 if os.path.exists(pdf_path):
                     print(f"Analyzing document: {pdf_path}")
-                    response = bot.analyze_document(pdf_path)
+                    response = bot.analyze_document(pdf_path, request_id=request_id)
+                    active_document = os.path.basename(pdf_path)
                 else:
                     response = f"Error: File not found at {pdf_path}"
             else:
-                response = bot.process_query(user_input)
+                response = bot.process_query(user_input, request_id=request_id, active_document=active_document)
+            
+            if Config.DEBUG_MODE:
+                print(f"[request id: {request_id}]")
             
             print(f"\nLegal Advisor: {response}\n")
     
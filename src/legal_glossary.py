@@ -35,33 +35,22 @@ LEGAL_GLOSSARY = {
     "Tort": "A civil wrong that causes someone else to suffer loss or harm, resulting in legal liability for the person who commits the act.",
 }
 
-def get_legal_glossary_html():
+def get_legal_glossary_html(page=None, page_size=20):
     """
     Generate HTML for the legal glossary.
     
+    Args:
+        page (int, optional): Zero-based page to render, None for the whole glossary
+        page_size (int): Terms per page
+        
     Returns:
         str: HTML representation of the legal glossary
     """
-    html = """
-    <div class="legal-glossary">
-        <ul style="list-style-type: none; padding-left: 0;">
-    """
-    
-    # Add each term and definition
-    for term, definition in sorted(LEGAL_GLOSSARY.items()):
-        html += f"""
-        <li style="margin-bottom: 12px;">
-            <span style="font-weight: 600; color: var(--legal-term-color);">{term}</span>: 
-            <span style="color: #333; font-size: 0.95em;">{definition}</span>
-        </li>
-        """
-    
-    html += """
-        </ul>
-    </div>
-    """
-    
-    return html
+    from src.glossary_store import get_glossary_store
+    store = get_glossary_store()
+    if page is None:
+        return store.page_html(0, max(len(store), 1))
+    return store.page_html(page, page_size)
 
 
 def get_random_legal_term():
@@ -71,6 +60,5 @@ def get_random_legal_term():
     Returns:
         tuple: (term, definition)
     """
-    import random
-    terms = list(LEGAL_GLOSSARY.items())
-    return random.choice(terms) 
\ No newline at end of file
+    from src.glossary_store import get_glossary_store
+    return get_glossary_store().random_term()
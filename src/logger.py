@@ -1,29 +1,122 @@
+import atexit
+import copy
+import glob
+import json
 import logging
+import logging.handlers
 import os
+import queue
 import sys
+import time
 from datetime import datetime
 
 # Create logs directory if it doesn't exist
 log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
 os.makedirs(log_dir, exist_ok=True)
 
-# Get current date for the log file name
-current_date = datetime.now().strftime("%Y-%m-%d")
-log_file = os.path.join(log_dir, f"legal_bot_{current_date}.log")
+# Every process (API workers, the app, OCR worker processes) writes its own file, legal_bot.<pid>.log,
+# rotated at midnight to legal_bot.<pid>.log.YYYY-MM-DD, so no two processes rotate the same file
+log_file = os.path.join(log_dir, f"legal_bot.{os.getpid()}.log")
+
+# Logging options, read from the environment so logging works before Config is loaded
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "14"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed via `extra`
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as single-line JSON objects (JSON Lines)."""
+    
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        # Include any structured fields passed via `extra`
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+def _remove_expired_logs():
+    """Delete log files, of any process, last written more than LOG_RETENTION_DAYS ago."""
+    cutoff = time.time() - LOG_RETENTION_DAYS * 86400
+    for path in glob.glob(os.path.join(log_dir, "legal_bot*.log*")):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves exception details on the record for the listener's formatter."""
+    
+    def prepare(self, record):
+        # The queue never leaves this process, so exc_info need not be pickled; only merge the arguments
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+def _build_output_handlers():
+    """Create the handlers that do the actual I/O on the listener thread."""
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        log_file,
+        when="midnight",
+        backupCount=LOG_RETENTION_DAYS,
+        encoding="utf-8",
+        delay=True
+    )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, stream_handler]
+
+# Callers only enqueue records; a dedicated listener thread formats and writes them
+_remove_expired_logs()
+log_queue = queue.Queue(-1)
+_listener = logging.handlers.QueueListener(log_queue, *_build_output_handlers(), respect_handler_level=True)
+
+# The queue handler only merges the message arguments; formatting happens on the listener
+queue_handler = _QueueHandler(log_queue)
 
 # Configure root logger
 logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler(sys.stdout)
-    ]
+    level=LOG_LEVEL,
+    handlers=[queue_handler]
 )
+_listener.start()
+
+def shutdown_logging():
+    """
+    Flush queued log records and stop the writer thread.
+    
+    Registered with atexit; safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logging)
 
 # Create a logger specific for our application
 logger = logging.getLogger("legal_bot")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 def get_logger(name):
     """
@@ -79,4 +172,4 @@ def log_user_interaction(query, response_length, document=None):
     logger.info(f"User Interaction - Query: '{query}'{doc_info} - Response Length: {response_length}")
 
 # Export the main logger
-__all__ = ["logger", "get_logger", "log_exception", "log_api_request", "log_user_interaction"] 
\ No newline at end of file
+__all__ = ["logger", "get_logger", "log_exception", "log_api_request", "log_user_interaction", "shutdown_logging"] 
\ No newline at end of file
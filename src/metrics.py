@@ -0,0 +1,416 @@
+"""
+In-process metrics with a Prometheus text exposition endpoint.
+
+Provides thread-safe counters, gauges and latency histograms, the metrics the
+bot records for each stage of a query, and a small HTTP server that serves
+them at /metrics for scraping (and /ready, once a readiness check is set).
+Each process keeps its own registry.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.logger import logger
+
+# Default latency buckets in seconds, from cheap local stages up to long model calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base class for metrics with optional labels."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """Return the child metric for the given label values."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"Metric {self.name} requires labels {self.labelnames}")
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            children = list(self._children.items())
+        for values, child in children:
+            lines.extend(self._collect_child(values, child))
+        return lines
+
+    def _collect_child(self, values, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"]
+
+
+class _Value:
+    """A single thread-safe numeric value."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+    def get(self) -> float:
+        with self._lock:
+            return self._value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+
+class _HistogramValue:
+    """Bucketed observations for one label set."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the enclosed block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, typically latencies in seconds."""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _collect_child(self, values, child) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Metrics recorded by the bot
+
+STAGE_LATENCY = Histogram(
+    "legal_bot_stage_duration_seconds",
+    "Time spent in each stage of query processing.",
+    ["stage"]
+)
+QUERIES_TOTAL = Counter(
+    "legal_bot_queries_total",
+    "Queries processed, by kind and outcome.",
+    ["kind", "status"]
+)
+QUERIES_IN_FLIGHT = Gauge(
+    "legal_bot_queries_in_flight",
+    "Queries currently being processed.",
+    ["kind"]
+)
+CACHE_REQUESTS = Counter(
+    "legal_bot_cache_requests_total",
+    "Cache lookups, by cache and result (hit or miss).",
+    ["cache", "result"]
+)
+CACHE_HIT_RATIO = Gauge(
+    "legal_bot_cache_hit_ratio",
+    "Fraction of cache lookups that were hits since process start.",
+    ["cache"]
+)
+GLOSSARY_LATENCY_SAVED = Counter(
+    "legal_bot_glossary_latency_saved_seconds_total",
+    "Estimated model latency avoided by answering definitional questions from the glossary."
+)
+PROMPT_REQUESTS = Counter(
+    "legal_bot_prompt_requests_total",
+    "Model requests, by prompt variant.",
+    ["variant"]
+)
+PROMPT_INSTRUCTION_TOKENS = Counter(
+    "legal_bot_prompt_instruction_tokens_total",
+    "Estimated tokens of prompt instructions sent to the model, by prompt variant.",
+    ["variant"]
+)
+WARMUP_STEP_SECONDS = Gauge(
+    "legal_bot_warmup_step_seconds",
+    "Time taken by each warm-up step at process start.",
+    ["step"]
+)
+READY = Gauge(
+    "legal_bot_ready",
+    "1 once the process has warmed up and can serve requests, otherwise 0."
+)
+SCHEDULER_QUEUE_WAIT = Histogram(
+    "legal_bot_scheduler_queue_wait_seconds",
+    "Time spent waiting for a model or extraction slot, by resource and priority class.",
+    ["resource", "priority"]
+)
+SCHEDULER_QUEUED = Gauge(
+    "legal_bot_scheduler_queued",
+    "Work waiting for a slot, by resource and priority class.",
+    ["resource", "priority"]
+)
+SCHEDULER_ACTIVE = Gauge(
+    "legal_bot_scheduler_active",
+    "Slots in use, by resource.",
+    ["resource"]
+)
+OCR_PAGES = Counter(
+    "legal_bot_ocr_pages_total",
+    "Pages without a text layer, by OCR outcome (recognized, cached, empty, failed, skipped).",
+    ["result"]
+)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Record the duration of a query processing stage."""
+    with STAGE_LATENCY.labels(stage=stage).time():
+        yield
+
+
+@contextmanager
+def track_query(kind: str):
+    """
+    Track a query: counts it in flight while it runs and records its outcome.
+
+    Args:
+        kind (str): Kind of query, e.g. "question" or "document"
+    """
+    in_flight = QUERIES_IN_FLIGHT.labels(kind=kind)
+    in_flight.inc()
+    status = "error"
+    try:
+        yield
+        status = "success"
+    finally:
+        in_flight.dec()
+        QUERIES_TOTAL.labels(kind=kind, status=status).inc()
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Record a cache lookup and update the cache's hit ratio."""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+    hits = CACHE_REQUESTS.labels(cache=cache, result="hit").get()
+    misses = CACHE_REQUESTS.labels(cache=cache, result="miss").get()
+    CACHE_HIT_RATIO.labels(cache=cache).set(hits / (hits + misses))
+
+
+def average_stage_latency(stage: str) -> Optional[float]:
+    """Return the mean observed duration of a stage in seconds, or None if it has not run yet."""
+    counts, total = STAGE_LATENCY.labels(stage=stage).snapshot()
+    observations = sum(counts)
+    return total / observations if observations else None
+
+
+def render_metrics() -> str:
+    """Render all registered metrics for a scrape."""
+    return REGISTRY.render()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves the registry at /metrics."""
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/ready" and _readiness_check is not None:
+            # 200 once warmed up, 503 before, so load balancers only route to ready processes
+            state = _readiness_check()
+            self._send(200 if state.get("ready") else 503, json.dumps(state).encode("utf-8"), "application/json")
+            return
+        if path != "/metrics":
+            self.send_error(404)
+            return
+        self._send(200, render_metrics().encode("utf-8"), CONTENT_TYPE)
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the application log
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+_readiness_check: Optional[Callable[[], Dict]] = None
+
+
+def set_readiness_check(check: Callable[[], Dict]):
+    """
+    Serve /ready from the metrics server.
+
+    Args:
+        check (Callable): Returns the readiness state as a dictionary with a boolean "ready"
+    """
+    global _readiness_check
+    _readiness_check = check
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", ports: int = 1) -> Optional[int]:
+    """
+    Serve /metrics on a background thread. Only the first call in a process starts a server.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Interface to bind
+        ports (int): Consecutive ports from port to try; each process of a multi-worker server
+            binds the first free one, so every worker has its own scrape target
+
+    Returns:
+        Optional[int]: The port served, or None if no server could be started
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        for candidate in range(port, port + max(1, ports)):
+            try:
+                _server = ThreadingHTTPServer((host, candidate), _MetricsHandler)
+                break
+            except OSError as e:
+                error = e
+        else:
+            logger.error(f"Could not start metrics server on ports {port}-{port + max(1, ports) - 1}: {error}")
+            return None
+        thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+        thread.start()
+        served = _server.server_address[1]
+        logger.info(f"Metrics available at http://{host}:{served}/metrics")
+        return served
@@ -0,0 +1,243 @@
+"""
+Local OCR for PDF pages without a text layer.
+
+Scanned documents have pages that are only images, so text extraction
+returns nothing for them. PageOCR rasterizes just those pages with pdfium
+and reads them with Tesseract, several pages at a time in a process pool.
+A document is limited to max_pages OCR pages and timeout seconds in total;
+each page is given only the time left, and workers still busy when the time
+is up are replaced by a fresh pool.
+
+OCR output is cached on disk by a fingerprint of the page's content stream
+and images, so a page is recognized once however many times it is uploaded,
+in whichever document.
+
+pytesseract and pypdfium2 are optional, and the tesseract binary must be
+installed; without them ocr_available() is False and scanned pages stay empty.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Sequence
+
+import PyPDF2
+
+from src.cancellation import current_token
+from src.logger import logger
+from src.metrics import OCR_PAGES, record_cache_lookup
+from src.utils import page_content_digest
+
+try:
+    import pypdfium2
+    import pytesseract
+except ImportError:
+    pypdfium2 = None
+    pytesseract = None
+
+
+def ocr_available() -> bool:
+    """Return True if the OCR libraries and the tesseract binary are installed."""
+    if pytesseract is None or pypdfium2 is None:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+def page_fingerprint(page) -> str:
+    """
+    Fingerprint a page by its content stream and the images it draws.
+
+    Args:
+        page (PyPDF2.PageObject): The page
+
+    Returns:
+        str: Hex digest identifying the page's rendered content
+    """
+    return page_content_digest(page).hexdigest()
+
+
+def _recognize_page(pdf_path: str, page_index: int, dpi: int, language: str, timeout: float) -> str:
+    """Rasterize and OCR one page; runs in a worker process."""
+    document = pypdfium2.PdfDocument(pdf_path)
+    try:
+        bitmap = document[page_index].render(scale=dpi / 72)
+        image = bitmap.to_pil()
+    finally:
+        document.close()
+    return pytesseract.image_to_string(image, lang=language, timeout=timeout)
+
+
+class PageOCR:
+    """Recognizes pages without a text layer in a process pool, with a disk cache."""
+
+    def __init__(self, cache_dir: str, max_pages: int = 50, timeout: float = 120, dpi: int = 300,
+                 language: str = "eng", max_workers: Optional[int] = None):
+        """
+        Create the OCR stage.
+
+        Args:
+            cache_dir (str): Directory for cached page text
+            max_pages (int): Maximum pages recognized per document; later pages are left empty
+            timeout (float): Seconds allowed for all OCR of one document
+            dpi (int): Rasterization resolution
+            language (str): Tesseract language, e.g. "eng" or "eng+fra"
+            max_workers (int, optional): Worker processes, defaults to the CPU count
+        """
+        self.cache_dir = cache_dir
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.dpi = dpi
+        self.language = language
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _cache_path(self, fingerprint: str) -> str:
+        # Text recognized at another resolution or language is a different entry
+        key = hashlib.sha256(f"{fingerprint}\0{self.dpi}\0{self.language}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def _cache_get(self, fingerprint: str) -> Optional[str]:
+        try:
+            with open(self._cache_path(fingerprint), "r", encoding="utf-8") as cache_file:
+                return cache_file.read()
+        except FileNotFoundError:
+            return None
+
+    def _cache_put(self, fingerprint: str, text: str):
+        path = self._cache_path(fingerprint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            cache_file.write(text)
+        os.replace(temp_path, path)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Forking a process that runs threads (Streamlit, the job manager) is unsafe
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _discard_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _recycle_executor(self, executor: ProcessPoolExecutor):
+        """Stop giving work to a pool; its workers exit once their current pages end."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def recognize(self, pdf_path: str, page_indices: Sequence[int],
+                  progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[int, str]:
+        """
+        Recognize the text of pages of a PDF.
+
+        Args:
+            pdf_path (str): Path to the PDF file
+            page_indices (Sequence[int]): Zero-based pages to recognize, normally those without text
+            progress_callback (Callable, optional): Called with (pages_done, total_pages) as pages finish
+
+        Returns:
+            Dict[int, str]: Recognized text by page index; pages that were skipped, timed out or failed are absent
+        """
+        if not ocr_available() or not page_indices:
+            return {}
+        pages = list(page_indices)
+        if len(pages) > self.max_pages:
+            logger.warning(f"OCR limited to {self.max_pages} of {len(pages)} pages without text in {pdf_path}")
+            OCR_PAGES.labels(result="skipped").inc(len(pages) - self.max_pages)
+            pages = pages[:self.max_pages]
+
+        with open(pdf_path, "rb") as pdf_file:
+            reader = PyPDF2.PdfReader(pdf_file)
+            fingerprints = {index: page_fingerprint(reader.pages[index]) for index in pages}
+
+        results = {}
+        pending = []
+        for index in pages:
+            cached = self._cache_get(fingerprints[index])
+            record_cache_lookup("ocr", cached is not None)
+            if cached is None:
+                pending.append(index)
+            else:
+                OCR_PAGES.labels(result="cached").inc()
+                results[index] = cached
+
+        done_count = len(results)
+        if progress_callback:
+            progress_callback(done_count, len(pages))
+        if not pending:
+            return results
+
+        token = current_token()
+        deadline = time.monotonic() + self.timeout
+        queued = deque(pending)
+        # future -> (page index, pool it runs in)
+        futures = {}
+        remaining = set()
+        try:
+            while (queued or remaining) and time.monotonic() < deadline:
+                # Pages are submitted as workers free up, so each is given only the time left
+                # and tesseract stops at the document's deadline rather than a full timeout later
+                while queued and len(remaining) < self.max_workers:
+                    index = queued.popleft()
+                    executor = self._get_executor()
+                    future = executor.submit(_recognize_page, pdf_path, index, self.dpi, self.language,
+                                             max(deadline - time.monotonic(), 1))
+                    futures[future] = (index, executor)
+                    remaining.add(future)
+                # Wake up regularly to notice cancellation between pages
+                finished, remaining = wait(remaining, timeout=min(max(deadline - time.monotonic(), 0), 0.5),
+                                           return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = futures[future][0]
+                    try:
+                        text = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        logger.error(f"OCR failed for page {index + 1} of {pdf_path}: {e}")
+                        OCR_PAGES.labels(result="failed").inc()
+                        continue
+                    self._cache_put(fingerprints[index], text)
+                    OCR_PAGES.labels(result="recognized" if text.strip() else "empty").inc()
+                    results[index] = text
+                    done_count += 1
+                    if progress_callback:
+                        progress_callback(done_count, len(pages))
+                if token is not None and token.cancelled:
+                    # Finished pages stay cached and queued pages never start; pages being
+                    # recognized finish in their worker process
+                    for future in remaining:
+                        future.cancel()
+                    token.raise_if_cancelled()
+            if queued or remaining:
+                logger.warning(f"OCR timed out after {self.timeout}s with {len(queued) + len(remaining)} pages "
+                               f"left in {pdf_path}")
+                OCR_PAGES.labels(result="failed").inc(len(queued) + len(remaining))
+                # Workers still busy with timed-out pages are replaced, so other documents do not wait for them
+                stuck = {futures[future][1] for future in remaining if not future.cancel()}
+                for executor in stuck:
+                    self._recycle_executor(executor)
+        except BrokenProcessPool as e:
+            logger.error(f"OCR worker pool failed: {e}")
+            self._discard_executor()
+        return results
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        self._discard_executor()
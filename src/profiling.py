@@ -0,0 +1,194 @@
+"""
+On-demand profiling of individual requests.
+
+When enabled for a request, the request is run under cProfile while a
+sampling thread records the request thread's call stacks. The result is
+written to the profile directory as:
+
+- ``<prefix>.pstats``: deterministic profile, readable with ``python -m pstats``
+- ``<prefix>.collapsed``: sampled stacks in collapsed format for flamegraph tools
+- ``<prefix>.json``: summary with duration and, for document requests, tracemalloc peak
+
+The directory is bounded: only the most recent profiles are kept.
+
+Clients may only switch profiling on for their own requests in debug mode or
+with the configured profile token (see profiling_allowed). tracemalloc is
+process-global, so only one profiled request at a time measures memory;
+concurrent ones record that the measurement was skipped.
+"""
+
+import cProfile
+import glob
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+from src.config import Config
+from src.logger import logger
+from src.tracing import get_request_id
+
+
+# Held by the profiled request measuring memory; tracemalloc peaks cannot be kept per request
+_memory_lock = threading.Lock()
+
+
+def profiling_allowed(token: Optional[str] = None) -> bool:
+    """
+    Whether a client may switch on profiling of its own requests.
+
+    Args:
+        token (str, optional): Profile token supplied by the client
+
+    Returns:
+        bool: True in debug mode, or if token matches Config.PROFILE_TOKEN
+    """
+    if Config.DEBUG_MODE:
+        return True
+    return bool(Config.PROFILE_TOKEN and token) and hmac.compare_digest(token, Config.PROFILE_TOKEN)
+
+
+class StackSampler:
+    """Periodically samples the call stack of one thread into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        """Return the samples in collapsed-stack format, one "stack count" line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _prune_profiles(directory: str, max_profiles: int):
+    """Delete the oldest profiles so at most max_profiles remain."""
+    summaries = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime)
+    for summary in summaries[:max(len(summaries) - max_profiles, 0)]:
+        prefix = summary[:-len(".json")]
+        for path in (summary, prefix + ".pstats", prefix + ".collapsed"):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+@contextmanager
+def profile_request(name: str, directory: str, max_profiles: int = 50,
+                    sample_interval: float = 0.005, track_memory: bool = False) -> Iterator[None]:
+    """
+    Profile the enclosed block and write its artifacts to directory.
+
+    Args:
+        name (str): Name of the profiled operation, used in file names
+        directory (str): Directory that profile artifacts are written to
+        max_profiles (int): Maximum number of profiles kept in the directory
+        sample_interval (float): Seconds between stack samples
+        track_memory (bool): Record the tracemalloc peak allocation during the block
+    """
+    os.makedirs(directory, exist_ok=True)
+    request_id = get_request_id() or uuid.uuid4().hex[:16]
+    prefix = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{request_id}")
+
+    # One request at a time measures memory; the peak and start/stop of tracemalloc are process-wide
+    measuring_memory = track_memory and _memory_lock.acquire(blocking=False)
+    started_tracemalloc = measuring_memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    elif measuring_memory and hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    baseline_memory = tracemalloc.get_traced_memory()[0] if measuring_memory else 0
+
+    sampler = StackSampler(threading.get_ident(), sample_interval)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        profiler.enable()
+        profiling = True
+    except ValueError:
+        # Another deterministic profiler is active (e.g. a concurrent profiled request on 3.12+)
+        logger.warning(f"cProfile unavailable for {name}, recording sampled stacks only")
+        profiling = False
+    try:
+        yield
+    finally:
+        if profiling:
+            profiler.disable()
+        sampler.stop()
+        duration = time.perf_counter() - start
+
+        summary = {
+            "name": name,
+            "request_id": request_id,
+            "duration_seconds": round(duration, 6),
+            "samples": sum(sampler.stacks.values()),
+        }
+        if measuring_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            summary["tracemalloc_peak_bytes"] = peak - baseline_memory
+            summary["tracemalloc_current_bytes"] = current - baseline_memory
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _memory_lock.release()
+        elif track_memory:
+            summary["tracemalloc_skipped"] = "another profiled request was measuring memory"
+
+        try:
+            if profiling:
+                profiler.dump_stats(prefix + ".pstats")
+            with open(prefix + ".collapsed", "w", encoding="utf-8") as collapsed_file:
+                collapsed_file.write(sampler.collapsed())
+            # The summary is written last; its presence marks a complete profile
+            with open(prefix + ".json", "w", encoding="utf-8") as summary_file:
+                json.dump(summary, summary_file, indent=2)
+            _prune_profiles(directory, max_profiles)
+            logger.info(f"Profile for {name} written to {prefix}.*")
+        except OSError as e:
+            logger.error(f"Error writing profile for {name}: {e}")
+
+
+def maybe_profile(name: str, enabled: bool, directory: str, max_profiles: int = 50,
+                  sample_interval: float = 0.005, track_memory: bool = False):
+    """
+    Return a profiling context manager if enabled, otherwise a no-op one.
+
+    Args:
+        name (str): Name of the profiled operation
+        enabled (bool): Whether to profile
+        directory (str): Directory that profile artifacts are written to
+        max_profiles (int): Maximum number of profiles kept in the directory
+        sample_interval (float): Seconds between stack samples
+        track_memory (bool): Record the tracemalloc peak allocation
+    """
+    if not enabled:
+        return nullcontext()
+    return profile_request(name, directory, max_profiles, sample_interval, track_memory)
@@ -0,0 +1,248 @@
+"""
+Prompt templates for the Legal Advisor Bot.
+
+Each request is answered with the template for its mode:
+
+- general: a legal question with no document
+- document: a question about, or analysis of, an attached document
+- followup: a question while a document discussed earlier is still in the conversation
+- compare: review of the clauses changed between two versions of a document
+- workspace: a question across the documents of a matter workspace, answered from retrieved passages
+
+Long documents are analyzed from summaries of their sections (see
+src.revisions), each written with SECTION_SUMMARY_TEMPLATE outside any
+conversation.
+
+Every mode has the original full template and a compact variant that keeps
+only the instructions that mode needs. Config.PROMPT_STYLE selects "compact",
+"full", or "ab" to split requests between the two by request id. The
+instruction cost of each variant, in estimated tokens, is measured when this
+module is imported:
+
+    python -m src.prompts
+"""
+
+import hashlib
+from typing import Dict, NamedTuple, Optional
+
+from src.utils import estimate_tokens
+
+MODE_GENERAL = "general"
+MODE_DOCUMENT = "document"
+MODE_FOLLOWUP = "followup"
+MODE_COMPARE = "compare"
+MODE_WORKSPACE = "workspace"
+
+STYLE_COMPACT = "compact"
+STYLE_FULL = "full"
+STYLE_AB = "ab"
+
+# Original template covering every mode, used by the "full" style
+LEGAL_TEMPLATE = """
+Text:{text}
+### Instruction for Legal Expert Model:
+
+You are a highly trained legal expert with in-depth knowledge of laws, regulations, and case precedents across multiple jurisdictions. Your task is to:
+- **Interpret and analyze legal documents, contracts, and agreements.**
+- **Explain complex legal jargon and clauses in simple, easy-to-understand language for a non-legal audience.**
+- **Provide expert legal advice, suggest potential risks, identify legal loopholes, and recommend actionable steps.**
+- **Understand the nuances of various legal systems including but not limited to civil law, common law, contract law, corporate law, intellectual property law, and criminal law.**
+- **Identify critical sections such as indemnity clauses, liability, arbitration, jurisdiction, and termination provisions with detailed explanations.**
+- **When a document is uploaded, summarize its key points, highlight risks, and offer practical advice to the user.**
+- **When asked a legal question, provide detailed expert advice along with relevant case laws, statutes, or precedents, if applicable.**
+- **Answer general questions about law and legal concepts in clear, accessible language.**
+
+---
+
+📚 **Document Analysis Capability:**
+- When provided with a legal document or contract, you should:
+    - Identify the core objective and key provisions of the document.
+    - Summarize in plain language, highlighting important clauses.
+    - Point out any risks, obligations, liabilities, and possible ambiguities.
+    - Suggest revisions or actions to mitigate legal risks.
+
+---
+
+### ⚖️ **Legal Question Capability:**
+- When asked a legal question or problem, you should:
+    - Analyze the legal query and determine relevant laws.
+    - Provide a step-by-step explanation in simple language.
+    - Mention any potential remedies, risks, and solutions.
+    - Support the answer with applicable laws, sections, and case precedents.
+
+---
+
+### 🎯 **Response Format:**
+- **Summary:** [Brief, easy-to-understand summary]
+- **Key Clauses and Risks:** [Bullet points with details, if relevant to the query]
+- **Expert Legal Advice:** [Detailed advice with references to laws and cases]
+- **Recommended Actions:** [Clear, actionable next steps]
+
+---
+
+### 📝 **Special Instructions:**
+- Ensure the response is accurate, concise, and formatted for easy reading.
+- Simplify complex legal language to ensure accessibility.
+- Where necessary, highlight important legal terms with definitions.
+- For general knowledge questions about law, provide clear explanations without unnecessary formality.
+
+---
+
+### ⚡️ **Fallback Behavior:**
+- If the document is unclear or incomplete, ask for clarification.
+- If the legal query involves a jurisdiction-specific issue, mention the applicable jurisdiction and possible variations.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+
+COMPACT_GENERAL_TEMPLATE = """
+{text}
+You are a legal expert. Answer the question in clear, plain language: explain the relevant law step by step,
+with remedies, risks and supporting laws or cases, and note where the answer depends on jurisdiction.
+Define legal terms you use. Format: **Summary:**, **Expert Legal Advice:**, **Recommended Actions:**.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+COMPACT_DOCUMENT_TEMPLATE = """
+Text:{text}
+You are a legal expert reviewing the document above. Identify its purpose and key provisions, summarize it in
+plain language, and point out risks, obligations, liabilities and ambiguities, suggesting revisions where useful.
+If the document is unclear or incomplete, say what is missing.
+Format: **Summary:**, **Key Clauses and Risks:** (bullet points), **Expert Legal Advice:**, **Recommended Actions:**.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+COMPACT_FOLLOWUP_TEMPLATE = """
+{text}
+You are a legal expert continuing a discussion of a document analyzed earlier in this conversation.
+Answer the follow-up in plain language from the earlier analysis in the conversation below, citing the clauses it quotes;
+say so if the analysis does not cover the question rather than guessing what the document says.
+Keep the answer focused; use **Summary:** and **Recommended Actions:** headings when helpful.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+# Comparisons only ever send the changed clauses, so both styles use this template
+COMPARE_TEMPLATE = """
+Changes:{text}
+You are a legal expert reviewing a revised version of an agreement. Above are only the clauses added, removed or
+modified between the old and new versions, each located by the heading of the clause before it.
+For each change, explain in plain language what it changes for the reader, whether it increases or reduces their
+risk, and what to negotiate. Do not comment on clauses that are not listed.
+Format: **Summary:**, **Key Changes and Risks:** (one bullet per change), **Expert Legal Advice:**, **Recommended Actions:**.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+# Workspace questions only ever send retrieved passages, so both styles use this template
+WORKSPACE_TEMPLATE = """
+Passages:{text}
+You are a legal expert answering a question about a matter made up of several documents. Above are the passages
+most relevant to the question, each numbered and labelled with its document and page. Answer in plain language
+from these passages only, citing every statement with the passage numbers it relies on, e.g. [2] or [1, 3].
+Point out where documents conflict or where a later document amends an earlier one. If the passages do not
+answer the question, say so rather than guessing.
+Format: **Summary:**, **Expert Legal Advice:**, **Recommended Actions:**.
+
+{chat_history}
+Human: {human_input}
+AI:
+"""
+
+# Summary of one section of a long document, later combined by the document template.
+# Change SECTION_SUMMARY_VERSION with the template so stored summaries are not reused.
+SECTION_SUMMARY_VERSION = "1"
+SECTION_SUMMARY_TEMPLATE = """
+Section:{text}
+You are a legal expert preparing notes for the review of a long legal document. Above is one section of it,
+which pre-screening tagged with these clause types: {tags}.
+In at most 200 words of bullet points, record the provisions of this section that matter for the review:
+parties' obligations, rights, deadlines, amounts, liabilities, risks and ambiguities, and terms it defines.
+Do not refer to page numbers. Do not give advice or a conclusion.
+"""
+
+
+class PromptVariant(NamedTuple):
+    """A prompt template for one mode and style, with its measured instruction cost."""
+    name: str
+    mode: str
+    style: str
+    template: str
+    # Estimated tokens of the template itself, excluding the inserted text, history and question
+    token_cost: int
+
+
+def _variant(mode: str, style: str, template: str) -> PromptVariant:
+    instructions = template.format(text="", chat_history="", human_input="")
+    return PromptVariant(f"{style}_{mode}", mode, style, template, estimate_tokens(instructions))
+
+
+PROMPT_VARIANTS: Dict[str, PromptVariant] = {
+    variant.name: variant for variant in (
+        _variant(MODE_GENERAL, STYLE_FULL, LEGAL_TEMPLATE),
+        _variant(MODE_DOCUMENT, STYLE_FULL, LEGAL_TEMPLATE),
+        _variant(MODE_FOLLOWUP, STYLE_FULL, LEGAL_TEMPLATE),
+        _variant(MODE_GENERAL, STYLE_COMPACT, COMPACT_GENERAL_TEMPLATE),
+        _variant(MODE_DOCUMENT, STYLE_COMPACT, COMPACT_DOCUMENT_TEMPLATE),
+        _variant(MODE_FOLLOWUP, STYLE_COMPACT, COMPACT_FOLLOWUP_TEMPLATE),
+        _variant(MODE_COMPARE, STYLE_FULL, COMPARE_TEMPLATE),
+        _variant(MODE_COMPARE, STYLE_COMPACT, COMPARE_TEMPLATE),
+        _variant(MODE_WORKSPACE, STYLE_FULL, WORKSPACE_TEMPLATE),
+        _variant(MODE_WORKSPACE, STYLE_COMPACT, WORKSPACE_TEMPLATE),
+    )
+}
+
+
+def resolve_style(style: str, request_id: Optional[str] = None) -> str:
+    """
+    Resolve the configured prompt style for one request.
+
+    Args:
+        style (str): "compact", "full" or "ab"
+        request_id (str, optional): Request id; in "ab" mode the same id always gets the same style
+
+    Returns:
+        str: "compact" or "full"
+    """
+    if style == STYLE_AB:
+        if not request_id:
+            return STYLE_COMPACT
+        bucket = int(hashlib.sha1(request_id.encode("utf-8")).hexdigest(), 16) % 2
+        return STYLE_COMPACT if bucket == 0 else STYLE_FULL
+    if style not in (STYLE_COMPACT, STYLE_FULL):
+        raise ValueError(f"Unknown prompt style: {style}")
+    return style
+
+
+def get_prompt_variant(mode: str, style: str = STYLE_COMPACT, request_id: Optional[str] = None) -> PromptVariant:
+    """
+    Return the prompt variant for a mode.
+
+    Args:
+        mode (str): "general", "document", "followup", "compare" or "workspace"
+        style (str): "compact", "full" or "ab"
+        request_id (str, optional): Request id, used to assign a style in "ab" mode
+
+    Returns:
+        PromptVariant: The variant to use
+    """
+    return PROMPT_VARIANTS[f"{resolve_style(style, request_id)}_{mode}"]
+
+
+if __name__ == "__main__":
+    print(f"{'variant':<20} {'instruction tokens':>18}")
+    for prompt_variant in PROMPT_VARIANTS.values():
+        print(f"{prompt_variant.name:<20} {prompt_variant.token_cost:>18}")
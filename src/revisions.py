@@ -0,0 +1,247 @@
+"""
+Incremental re-analysis of revised documents.
+
+Users often upload a slightly edited draft of a document analyzed before.
+The whole-document analysis cache misses on any change, so intermediate
+results are kept by content hash instead:
+
+- the extracted text of each PDF page, by a fingerprint of the page's text
+  layer (see src.utils.page_text_fingerprint), so only changed pages are
+  extracted again;
+- a summary of each section of a long document, with the clause types tagged
+  in it, by a hash of the section's page texts, so only changed sections are
+  summarized again before the final analysis is synthesized from the summaries.
+
+Sections are runs of whole pages whose boundaries depend on the content of
+the pages, not their position: a page inserted or edited near the start of a
+document changes the sections around it, and the rest keep their hashes.
+
+Results live in a SQLite database, shared between sessions and worker
+processes on the same host like the analysis store.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.logger import logger
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS page_text (
+        fingerprint TEXT PRIMARY KEY,
+        text TEXT NOT NULL,
+        last_accessed REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS section_results (
+        key TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        tags TEXT NOT NULL,
+        last_accessed REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_page_text_last_accessed ON page_text (last_accessed)",
+    "CREATE INDEX IF NOT EXISTS idx_section_results_last_accessed ON section_results (last_accessed)",
+)
+
+# SQLite limits the number of parameters of one statement
+_BATCH = 500
+
+
+class DocumentSection(NamedTuple):
+    """A run of whole pages of a document, summarized as one unit."""
+    first_page: int
+    last_page: int
+    # Character offsets of the section in the document text
+    start: int
+    end: int
+    # Hash of the section's page texts, independent of where the section sits in the document
+    content_hash: str
+
+
+def split_sections(text: str, page_starts: Sequence[Tuple[int, int]], hashes: Sequence[str],
+                   target_chars: int = 12000) -> List[DocumentSection]:
+    """
+    Split a document into sections of whole pages at content-defined boundaries.
+
+    A section ends after a page once it holds at least half of target_chars and
+    the page's hash is even, or once it reaches twice target_chars. Because
+    the decision depends on the page's own content, an edit only moves the
+    boundaries near it.
+
+    Args:
+        text (str): Document text, as produced by join_pages
+        page_starts (Sequence[Tuple[int, int]]): (offset, page number) of each page with text, see page_offsets
+        hashes (Sequence[str]): Hash of each page's text by page number - 1, see page_hashes
+        target_chars (int): Typical section length in characters
+
+    Returns:
+        List[DocumentSection]: Sections in document order, covering every page with text
+    """
+    sections = []
+    section_start = None
+    for i, (start, page) in enumerate(page_starts):
+        end = page_starts[i + 1][0] if i + 1 < len(page_starts) else len(text)
+        if section_start is None:
+            section_start, first_page, section_hashes = start, page, []
+        page_hash = hashes[page - 1]
+        section_hashes.append(page_hash)
+        length = end - section_start
+        at_boundary = length >= target_chars // 2 and int(page_hash[-1], 16) % 2 == 0
+        if at_boundary or length >= 2 * target_chars or i + 1 == len(page_starts):
+            content_hash = hashlib.sha256("\0".join(section_hashes).encode("utf-8")).hexdigest()
+            sections.append(DocumentSection(first_page, page, section_start, end, content_hash))
+            section_start = None
+    return sections
+
+
+def section_key(section: DocumentSection, prompt_version: str, model: str) -> str:
+    """Key of a section's stored results: its content, and the prompt and model that summarized it."""
+    return hashlib.sha256(f"{section.content_hash}\0{prompt_version}\0{model}".encode("utf-8")).hexdigest()
+
+
+def format_section_summaries(sections: Sequence[DocumentSection], results: Sequence[Tuple[str, List[str]]]) -> str:
+    """
+    Format section summaries for the synthesis prompt, each labelled with its pages and clause types.
+
+    Args:
+        sections (Sequence[DocumentSection]): Sections in document order
+        results (Sequence[Tuple[str, List[str]]]): (summary, clause labels) of each section
+
+    Returns:
+        str: Labelled summaries in document order
+    """
+    parts = []
+    for section, (summary, tags) in zip(sections, results):
+        pages = (f"Page {section.first_page}" if section.first_page == section.last_page
+                 else f"Pages {section.first_page}-{section.last_page}")
+        label = f"[{pages}]" + (f" (clauses: {', '.join(tags)})" if tags else "")
+        parts.append(f"{label}\n{summary.strip()}")
+    return "\n\n".join(parts)
+
+
+class RevisionCache:
+    """SQLite-backed page text and section results, with size-based LRU eviction."""
+
+    def __init__(self, path: str, max_entries: int = 50000):
+        """
+        Open (and create if needed) a revision cache.
+
+        Args:
+            path (str): Path to the SQLite database file
+            max_entries (int): Maximum pages, and maximum sections, kept; least recently used are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            # WAL lets readers in other processes proceed while one process writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _evict(self, conn: sqlite3.Connection, table: str, key: str):
+        conn.execute(
+            f"DELETE FROM {table} WHERE {key} IN ("
+            f"SELECT {key} FROM {table} ORDER BY last_accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def get_pages(self, fingerprints: Sequence[str]) -> Dict[str, str]:
+        """
+        Look up the text of pages extracted before.
+
+        Args:
+            fingerprints (Sequence[str]): Page fingerprints, see src.utils.page_text_fingerprint
+
+        Returns:
+            Dict[str, str]: Text by fingerprint, for the pages found
+        """
+        unique = list(dict.fromkeys(fingerprints))
+        found = {}
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                for i in range(0, len(unique), _BATCH):
+                    batch = unique[i:i + _BATCH]
+                    placeholders = ",".join("?" * len(batch))
+                    found.update(conn.execute(
+                        f"SELECT fingerprint, text FROM page_text WHERE fingerprint IN ({placeholders})", batch
+                    ).fetchall())
+                    conn.execute(f"UPDATE page_text SET last_accessed = ? WHERE fingerprint IN ({placeholders})",
+                                 (now, *batch))
+        except sqlite3.Error as e:
+            logger.error(f"Error reading revision cache: {e}")
+        return found
+
+    def put_pages(self, texts: Dict[str, str]):
+        """
+        Save the extracted text of pages.
+
+        Args:
+            texts (Dict[str, str]): Page text by fingerprint
+        """
+        if not texts:
+            return
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO page_text (fingerprint, text, last_accessed) VALUES (?, ?, ?)",
+                    [(fingerprint, text, now) for fingerprint, text in texts.items()]
+                )
+                self._evict(conn, "page_text", "fingerprint")
+        except sqlite3.Error as e:
+            logger.error(f"Error writing revision cache: {e}")
+
+    def get_section(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """
+        Look up the stored results of a section.
+
+        Args:
+            key (str): Section key, see section_key
+
+        Returns:
+            Optional[Tuple[str, List[str]]]: (summary, clause labels), or None if the section is not stored
+        """
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT summary, tags FROM section_results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE section_results SET last_accessed = ? WHERE key = ?", (time.time(), key))
+                return row[0], json.loads(row[1])
+        except sqlite3.Error as e:
+            logger.error(f"Error reading revision cache: {e}")
+            return None
+
+    def put_section(self, key: str, summary: str, tags: List[str]):
+        """
+        Save the results of a section.
+
+        Args:
+            key (str): Section key, see section_key
+            summary (str): Summary of the section
+            tags (List[str]): Labels of the clause types tagged in the section
+        """
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO section_results (key, summary, tags, last_accessed) VALUES (?, ?, ?, ?)",
+                    (key, summary, json.dumps(tags), time.time())
+                )
+                self._evict(conn, "section_results", "key")
+        except sqlite3.Error as e:
+            logger.error(f"Error writing revision cache: {e}")
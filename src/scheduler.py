@@ -0,0 +1,299 @@
+"""
+Fair scheduling of model requests and document extraction.
+
+One model client and a few CPU cores are shared by every session. Without
+scheduling, a burst of long document analyses takes all of them and a quick
+chat question waits behind the whole burst. A FairScheduler hands out a fixed
+number of slots for one kind of work:
+
+- Waiting work is ordered by priority class: interactive questions (chat
+  questions, including follow-ups on a document analyzed in the conversation),
+  then follow-up questions over a workspace's documents, then document
+  analysis, then batch work such as preparing uploads or precomputing examples.
+- Within a class, sessions take turns (round-robin), so one session
+  submitting many documents does not delay the others.
+- Waiting work ages: every ``aging_seconds`` spent waiting raises it by one
+  class, so lower classes are never starved.
+- ``reserved`` slots are only given to interactive work, so a question can
+  start even while long analyses hold every other slot.
+
+The priority class and session are bound to the current context with
+scheduling_scope, like the request id and cancellation token, so they follow
+the work into job threads without being passed through every call. Work that
+others may wait on (e.g. a speculative preparation holding a document's lock)
+runs under shared_priority, and its waiters raise its class to their own, so
+urgent work never waits behind a lower class than itself. Time spent
+waiting for a slot is recorded per class in
+legal_bot_scheduler_queue_wait_seconds.
+"""
+
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional, Tuple
+
+from src.cancellation import check_cancelled
+from src.metrics import SCHEDULER_ACTIVE, SCHEDULER_QUEUE_WAIT, SCHEDULER_QUEUED
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_FOLLOW_UP = "follow_up"
+PRIORITY_DOCUMENT = "document"
+PRIORITY_BATCH = "batch"
+
+# Priority classes, most urgent first
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_FOLLOW_UP, PRIORITY_DOCUMENT, PRIORITY_BATCH)
+_RANKS = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+# Seconds between cancellation checks while waiting for a slot
+_POLL_INTERVAL = 0.5
+
+# (priority class, session id) of the work running in this context
+_current: contextvars.ContextVar = contextvars.ContextVar("scheduling", default=(None, None))
+
+# SharedPriority of the work running in this context, if others may raise it
+_shared: contextvars.ContextVar = contextvars.ContextVar("shared_priority", default=None)
+
+
+def current_scheduling() -> Tuple[Optional[str], Optional[str]]:
+    """Return the (priority class, session id) bound to the current context."""
+    return _current.get()
+
+
+@contextmanager
+def scheduling_scope(priority: Optional[str] = None, session_id: Optional[str] = None):
+    """
+    Bind the priority class and session of the work in the block.
+
+    Arguments left as None keep the binding of the enclosing scope.
+    """
+    if priority is not None and priority not in _RANKS:
+        raise ValueError(f"Unknown priority class: {priority}")
+    outer_priority, outer_session = _current.get()
+    reset = _current.set((priority or outer_priority, session_id or outer_session))
+    try:
+        yield
+    finally:
+        _current.reset(reset)
+
+
+@contextmanager
+def default_priority(priority: str):
+    """Bind a priority class for the block unless the caller has already bound one."""
+    if _current.get()[0] is not None:
+        yield
+        return
+    with scheduling_scope(priority):
+        yield
+
+
+class SharedPriority:
+    """Priority class of work that other work waits on, which those waiters may raise (priority inheritance)."""
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        # (scheduler, waiter) of the slots this work is waiting for
+        self._waiting = []
+        self._lock = threading.Lock()
+
+    def raise_to(self, priority: str) -> bool:
+        """
+        Raise the class to ``priority`` if that is more urgent, moving up any slot still waited for.
+
+        Returns:
+            bool: Whether the class was raised
+        """
+        with self._lock:
+            if _RANKS[priority] >= _RANKS[self.priority]:
+                return False
+            self.priority = priority
+            waiting = list(self._waiting)
+        for scheduler, waiter in waiting:
+            scheduler._promote(waiter, priority)
+        return True
+
+
+@contextmanager
+def shared_priority():
+    """
+    Run the block under a SharedPriority, starting from the class bound to the context.
+
+    Slots requested in the block without an explicit priority take its current class.
+
+    Yields:
+        SharedPriority: Handle that waiters on this work call raise_to on
+    """
+    shared = SharedPriority(_current.get()[0] or PRIORITY_INTERACTIVE)
+    reset = _shared.set(shared)
+    try:
+        yield shared
+    finally:
+        _shared.reset(reset)
+
+
+class _Waiter:
+    """Work waiting for a slot."""
+
+    __slots__ = ("priority", "session_id", "enqueued_at", "granted", "event")
+
+    def __init__(self, priority: str, session_id: str):
+        self.priority = priority
+        self.session_id = session_id
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.event = threading.Event()
+
+
+class FairScheduler:
+    """Hands out a fixed number of slots by priority class, session turn and waiting time."""
+
+    def __init__(self, name: str, slots: int, aging_seconds: float = 15.0, reserved: int = 0):
+        """
+        Create a scheduler.
+
+        Args:
+            name (str): Kind of work scheduled, e.g. "llm"; used as the metrics label
+            slots (int): Units of work allowed to run at once
+            aging_seconds (float): Waiting time that raises work by one priority class (0 disables aging)
+            reserved (int): Slots only interactive work may take
+        """
+        self.name = name
+        self.slots = max(1, slots)
+        self.aging_seconds = aging_seconds
+        self.reserved = min(max(0, reserved), self.slots - 1)
+        self._active = 0
+        # priority class -> session id -> waiters in arrival order; sessions in turn order
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {priority: OrderedDict() for priority in PRIORITIES}
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        """Slots currently in use."""
+        return self._active
+
+    def queued(self, priority: Optional[str] = None) -> int:
+        """Number of waiters, in one priority class or in all of them."""
+        with self._lock:
+            priorities = [priority] if priority else PRIORITIES
+            return sum(len(waiters) for p in priorities for waiters in self._queues[p].values())
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Pick the waiter to run next, or None if no waiter may take a free slot. Called with the lock held."""
+        now = time.monotonic()
+        free = self.slots - self._active
+        best, best_key = None, None
+        for priority, sessions in self._queues.items():
+            if not sessions or (priority != PRIORITY_INTERACTIVE and free <= self.reserved):
+                continue
+            waited = now - min(waiters[0].enqueued_at for waiters in sessions.values())
+            effective = _RANKS[priority] - (waited / self.aging_seconds if self.aging_seconds > 0 else 0)
+            key = (effective, _RANKS[priority])
+            if best_key is None or key < best_key:
+                best, best_key = priority, key
+        if best is None:
+            return None
+
+        # The session whose turn it is goes to the back of the line
+        sessions = self._queues[best]
+        session_id, waiters = next(iter(sessions.items()))
+        waiter = waiters.popleft()
+        if waiters:
+            sessions.move_to_end(session_id)
+        else:
+            del sessions[session_id]
+        return waiter
+
+    def _dispatch(self):
+        """Grant free slots to waiters. Called with the lock held."""
+        while self._active < self.slots:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._active += 1
+            waiter.granted = True
+            SCHEDULER_QUEUED.labels(resource=self.name, priority=waiter.priority).dec()
+            waiter.event.set()
+        SCHEDULER_ACTIVE.labels(resource=self.name).set(self._active)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _withdraw(self, waiter: _Waiter):
+        """Remove a waiter that gave up, returning its slot if it was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                self._active -= 1
+                self._dispatch()
+                return
+            sessions = self._queues[waiter.priority]
+            waiters = sessions.get(waiter.session_id)
+            if waiters is not None and waiter in waiters:
+                waiters.remove(waiter)
+                if not waiters:
+                    del sessions[waiter.session_id]
+                SCHEDULER_QUEUED.labels(resource=self.name, priority=waiter.priority).dec()
+
+    def _promote(self, waiter: _Waiter, priority: str):
+        """Move a waiter to a more urgent class, keeping its waiting time."""
+        with self._lock:
+            if waiter.granted or _RANKS[priority] >= _RANKS[waiter.priority]:
+                return
+            sessions = self._queues[waiter.priority]
+            waiters = sessions.get(waiter.session_id)
+            if waiters is None or waiter not in waiters:
+                # Not queued yet; slot() queues it under the new class
+                waiter.priority = priority
+                return
+            waiters.remove(waiter)
+            if not waiters:
+                del sessions[waiter.session_id]
+            SCHEDULER_QUEUED.labels(resource=self.name, priority=waiter.priority).dec()
+            waiter.priority = priority
+            self._queues[priority].setdefault(waiter.session_id, deque()).append(waiter)
+            SCHEDULER_QUEUED.labels(resource=self.name, priority=priority).inc()
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: Optional[str] = None, session_id: Optional[str] = None):
+        """
+        Wait for a slot and hold it for the duration of the block.
+
+        Args:
+            priority (str, optional): Priority class; defaults to the shared priority bound to the context,
+                else the class bound to the context, else interactive
+            session_id (str, optional): Session the work belongs to; defaults to the one bound to the context
+
+        Raises:
+            OperationCancelledError: If the current context is cancelled while waiting
+        """
+        bound_priority, bound_session = _current.get()
+        shared = _shared.get() if priority is None else None
+        waiter = _Waiter(priority or bound_priority or PRIORITY_INTERACTIVE, session_id or bound_session or "")
+        if shared is not None:
+            with shared._lock:
+                waiter.priority = shared.priority
+                shared._waiting.append((self, waiter))
+        with self._lock:
+            self._queues[waiter.priority].setdefault(waiter.session_id, deque()).append(waiter)
+            SCHEDULER_QUEUED.labels(resource=self.name, priority=waiter.priority).inc()
+            self._dispatch()
+        try:
+            while not waiter.event.wait(_POLL_INTERVAL):
+                check_cancelled()
+        except BaseException:
+            self._withdraw(waiter)
+            raise
+        finally:
+            if shared is not None:
+                with shared._lock:
+                    shared._waiting.remove((self, waiter))
+        SCHEDULER_QUEUE_WAIT.labels(resource=self.name, priority=waiter.priority).observe(
+            time.monotonic() - waiter.enqueued_at
+        )
+        try:
+            yield
+        finally:
+            self._release()
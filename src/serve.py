@@ -0,0 +1,45 @@
+"""
+Launch the Streamlit app with warm-up at process start.
+
+`streamlit run app.py` only imports the app on the first page view, so the
+first user after a deploy waits for the bot to be built. This launcher starts
+the metrics server (which also serves /ready) and warm-up first, then runs
+Streamlit in the same process, so app.py picks up the already warmed bot:
+
+    python -m src.serve
+    python -m src.serve --port 8501 --address 0.0.0.0
+"""
+
+import argparse
+import os
+
+from streamlit.web import bootstrap
+
+from src.config import Config
+from src.logger import logger
+from src.metrics import start_metrics_server
+from src.warmup import start_warm_up
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=None, help="Streamlit port (defaults to Streamlit's own setting)")
+    parser.add_argument("--address", default=None, help="Interface Streamlit listens on")
+    args = parser.parse_args()
+
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+    else:
+        logger.warning("METRICS_PORT is 0, so /ready is not served; set it for readiness checks")
+    start_warm_up()
+
+    # Same option names as the `streamlit run` command line flags
+    flag_options = {"server_port": args.port, "server_address": args.address}
+    bootstrap.load_config_options(flag_options=flag_options)
+    bootstrap.run(APP_SCRIPT, False, [], flag_options)
+
+
+if __name__ == "__main__":
+    main()
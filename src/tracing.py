@@ -0,0 +1,313 @@
+"""
+Lightweight request-scoped tracing for the query pipeline.
+
+A request id is attached to the current context and every span opened while
+handling the request is recorded with its parent, duration and attributes.
+Finished spans are written as JSON lines to a local file by a background
+thread, so traces can be inspected offline:
+
+    python -m src.tracing logs/traces.jsonl [request_id]
+
+Only a sample of requests is exported, chosen by request id so a request is
+kept or dropped whole. Spans go to one file per day next to the configured
+path (``traces.jsonl`` -> ``traces.2024-05-01.jsonl``), and files older than
+the retention period are deleted. Every process appends each span with a
+single write to a file opened in append mode, so processes sharing the
+directory never interleave partial lines and no file is ever renamed.
+"""
+
+import atexit
+import contextvars
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+_current_request_id: contextvars.ContextVar = contextvars.ContextVar("request_id", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def new_request_id() -> str:
+    """Generate a new request id."""
+    return uuid.uuid4().hex[:16]
+
+
+def get_request_id() -> Optional[str]:
+    """Return the request id of the current context, if any."""
+    return _current_request_id.get()
+
+
+class Span:
+    """A timed operation within a request."""
+
+    def __init__(self, name: str, request_id: Optional[str], parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.request_id = request_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key: str, value: Any):
+        """Attach an attribute to the span."""
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        """Attach several attributes to the span."""
+        self.attributes.update(attributes)
+
+    def elapsed(self) -> float:
+        """Seconds since the span started, or its duration once it has ended."""
+        return self.duration if self.duration is not None else time.perf_counter() - self._start
+
+    def end(self, error: Optional[BaseException] = None):
+        """Finish the span and hand it to the exporter. Ending a span twice has no effect."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        if _exporter is not None:
+            _exporter.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def trace_files(path: str) -> List[str]:
+    """Return the trace files written for a configured trace path, oldest first."""
+    root, extension = os.path.splitext(path)
+    files = sorted(glob.glob(f"{glob.escape(root)}.????-??-??{extension}"))
+    # Files written before traces were split by day
+    if os.path.exists(path):
+        files.insert(0, path)
+    return files
+
+
+class FileSpanExporter:
+    """Writes a sample of finished spans as JSON lines, one file per day, from a background thread."""
+
+    def __init__(self, path: str, sample_rate: float = 1.0, retention_days: int = 7):
+        """
+        Start the exporter.
+
+        Args:
+            path (str): Configured trace path; daily files are named after it
+            sample_rate (float): Fraction of requests exported, from 0 to 1
+            retention_days (int): Days of trace files kept
+        """
+        self.path = path
+        self.sample_rate = sample_rate
+        self.retention_days = retention_days
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def sampled(self, request_id: Optional[str]) -> bool:
+        """Whether spans of a request are exported; the same for every span of the request."""
+        if self.sample_rate >= 1:
+            return True
+        return zlib.crc32((request_id or "").encode("utf-8")) / 2 ** 32 < self.sample_rate
+
+    def export(self, span: Span):
+        if self.sampled(span.request_id):
+            self._queue.put(span.to_dict())
+
+    def _day_path(self, day: str) -> str:
+        root, extension = os.path.splitext(self.path)
+        return f"{root}.{day}{extension}"
+
+    def _remove_expired(self):
+        cutoff = time.strftime("%Y-%m-%d", time.localtime(time.time() - self.retention_days * 86400))
+        for path in trace_files(self.path):
+            if path != self.path and path < self._day_path(cutoff):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def _run(self):
+        fd, day = None, None
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                today = time.strftime("%Y-%m-%d")
+                if today != day:
+                    if fd is not None:
+                        os.close(fd)
+                    day = today
+                    fd = os.open(self._day_path(day), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    self._remove_expired()
+                # One write per line: appends from several processes never split a line
+                os.write(fd, (json.dumps(record, default=str) + "\n").encode("utf-8"))
+        except OSError as e:
+            print(f"Trace exporter stopped: {e}", file=sys.stderr)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def shutdown(self):
+        """Write any queued spans and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_exporter: Optional[FileSpanExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def configure_tracing(path: str, sample_rate: float = 1.0, retention_days: int = 7):
+    """
+    Start exporting spans to JSON lines files. Only the first call in a process has an effect.
+
+    Args:
+        path (str): Trace path; spans are appended to one file per day named after it
+        sample_rate (float): Fraction of requests exported
+        retention_days (int): Days of trace files kept
+    """
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = FileSpanExporter(path, sample_rate, retention_days)
+            atexit.register(_exporter.shutdown)
+
+
+def start_span(name: str, **attributes) -> Span:
+    """
+    Start a span under the current span without making it current.
+
+    Useful for callbacks where start and end happen in different calls; the
+    caller must call Span.end().
+    """
+    return Span(name, get_request_id(), _current_span.get(), attributes)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Record the enclosed block as a span nested under the current span.
+
+    Args:
+        name (str): Name of the operation
+        **attributes: Initial span attributes
+    """
+    current = Span(name, get_request_id(), _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+@contextmanager
+def trace_request(name: str, request_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+    """
+    Open the root span of a request, binding a request id to the current context.
+
+    If a request is already being traced in this context, a nested span is
+    opened instead so the existing request id is kept.
+
+    Args:
+        name (str): Name of the root operation
+        request_id (str, optional): Request id to use, generated if omitted
+        **attributes: Initial span attributes
+    """
+    if get_request_id() is not None and request_id in (None, get_request_id()):
+        with span(name, **attributes) as nested:
+            yield nested
+        return
+
+    token = _current_request_id.set(request_id or new_request_id())
+    try:
+        with span(name, **attributes) as root:
+            yield root
+    finally:
+        _current_request_id.reset(token)
+
+
+def load_traces(path: str, request_id: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Load exported spans grouped by request id.
+
+    Lines that are not complete span records, e.g. cut short by a crash, are skipped.
+
+    Args:
+        path (str): Configured trace path, see trace_files, or a single trace file
+        request_id (str, optional): Only load spans of this request
+
+    Returns:
+        Dict[str, List[Dict[str, Any]]]: Spans of each request
+    """
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    for trace_path in trace_files(path):
+        with open(trace_path, "r", encoding="utf-8", errors="replace") as trace_file:
+            for line in trace_file:
+                try:
+                    record = json.loads(line)
+                    record_id = record["request_id"]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if request_id is None or record_id == request_id:
+                    traces.setdefault(record_id, []).append(record)
+    return traces
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    """Render the spans of one request as an indented tree with durations."""
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    known_ids = {record["span_id"] for record in spans}
+    for record in sorted(spans, key=lambda r: r["start_time"]):
+        parent = record["parent_id"] if record["parent_id"] in known_ids else None
+        children.setdefault(parent, []).append(record)
+
+    lines = []
+
+    def render(parent_id, depth):
+        for record in children.get(parent_id, []):
+            attributes = " ".join(f"{k}={v}" for k, v in record["attributes"].items())
+            status = "" if record["status"] == "ok" else f" [{record['status']}]"
+            lines.append(f"{'  ' * depth}{record['name']} {record['duration_ms']}ms{status} {attributes}".rstrip())
+            render(record["span_id"], depth + 1)
+
+    render(None, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m src.tracing <trace_file> [request_id]")
+        sys.exit(1)
+    for trace_id, trace_spans in load_traces(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None).items():
+        print(f"Request {trace_id}")
+        print(format_trace(trace_spans))
+        print()
@@ -2,41 +2,263 @@ import os
 import PyPDF2
 import tempfile
 import hashlib
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Tuple
 
-def extract_text_from_pdf(pdf_path: str) -> Optional[str]:
+from src.tracing import span
+from src.cancellation import check_cancelled
+from src.exceptions import OperationCancelledError
+
+def _stream_data(obj) -> bytes:
+    try:
+        return obj.get_data()
+    except Exception:
+        # Streams with filters PyPDF2 cannot decode are hashed as stored
+        return getattr(obj, "_data", b"") or b""
+
+def page_content_digest(page):
     """
-    Extract text from a PDF file.
+    Hash a page's content stream and the objects it draws (images, form XObjects).
+    
+    Scanned pages often share an identical content stream that only places an
+    image, so the drawn objects are part of the digest. Shared by the OCR cache
+    (src.ocr.page_fingerprint) and page_text_fingerprint, which adds to it.
+    
+    Args:
+        page (PyPDF2.PageObject): The page
+        
+    Returns:
+        hashlib sha256 object: Digest that callers may update further
+    """
+    digest = hashlib.sha256()
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(_stream_data(contents))
+    resources = page.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if xobjects:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            digest.update(name.encode("utf-8"))
+            digest.update(_stream_data(xobjects[name].get_object()))
+    return digest
+
+def page_text_fingerprint(page) -> str:
+    """
+    Fingerprint everything a page's text layer is extracted from.
+    
+    Covers the page's content stream, the objects it draws (form XObjects can
+    hold text of their own) and its fonts' encodings, which decide the
+    characters extracted. An unchanged page of a revised PDF keeps its
+    fingerprint, so its text can be reused instead of extracted again.
+    
+    Args:
+        page (PyPDF2.PageObject): The page
+        
+    Returns:
+        str: Hex digest identifying the page's text layer
+    """
+    digest = page_content_digest(page)
+    resources = page.get("/Resources")
+    fonts = resources.get_object().get("/Font") if resources else None
+    if fonts:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(f"{name}\0{font.get('/BaseFont')}\0{font.get('/Subtype')}".encode("utf-8"))
+            encoding = font.get("/Encoding")
+            if encoding is not None:
+                digest.update(repr(encoding.get_object()).encode("utf-8"))
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(_stream_data(to_unicode.get_object()))
+    return digest.hexdigest()
+
+def page_hashes(pages: List[str]) -> List[str]:
+    """
+    Hash the text of each page, so the pages of two versions of a document can be compared.
+    
+    Args:
+        pages (List[str]): Text of each page
+        
+    Returns:
+        List[str]: Hex digest of each page's text, in page order
+    """
+    return [hashlib.sha256(page_text.encode("utf-8")).hexdigest() for page_text in pages]
+
+def extract_pages_from_pdf(pdf_path: str, progress_callback: Optional[Callable[[int, int], None]] = None,
+                           page_cache=None) -> Optional[List[str]]:
+    """
+    Extract the text layer of each page of a PDF file.
+    
+    Pages PyPDF2 finds no text on are retried with pdfplumber, if it can read
+    the file. Pages that are still empty, such as scanned images, are returned
+    as empty strings so an OCR stage can fill them in.
     
     Args:
         pdf_path (str): Path to the PDF file
+        progress_callback (Callable, optional): Called with (pages_done, total_pages) after each page
+        page_cache (optional): Text of pages extracted before, by page_text_fingerprint, with
+            get_pages(fingerprints) and put_pages(texts) methods (see src.revisions.RevisionCache);
+            pages found there are not extracted again, and newly extracted pages are added
         
     Returns:
-        str: Extracted text from the PDF or None if extraction fails
+        List[str]: Text of each page, or None if the file cannot be read
     """
-    text = ""
     try:
-        # Open the PDF file
-        with open(pdf_path, 'rb') as file:
-            # Create a PDF reader object
-            pdf_reader = PyPDF2.PdfReader(file)
+        with span("extract_text_from_pdf") as extraction_span:
+            # Open the PDF file
+            with open(pdf_path, 'rb') as file:
+                # Create a PDF reader object
+                pdf_reader = PyPDF2.PdfReader(file)
+                
+                # Get the number of pages
+                num_pages = len(pdf_reader.pages)
+                
+                # Look up pages whose text layer is unchanged since an earlier upload
+                fingerprints = []
+                known = {}
+                if page_cache is not None:
+                    try:
+                        fingerprints = [page_text_fingerprint(page) for page in pdf_reader.pages]
+                        known = page_cache.get_pages(fingerprints)
+                    except Exception as e:
+                        from src.logger import logger
+                        logger.warning(f"Could not fingerprint pages of {pdf_path}, extracting all: {e}")
+                        fingerprints = []
+                
+                # Extract text from each page
+                pages = []
+                for page_num in range(num_pages):
+                    check_cancelled()
+                    if fingerprints and fingerprints[page_num] in known:
+                        pages.append(known[fingerprints[page_num]])
+                    else:
+                        page = pdf_reader.pages[page_num]
+                        pages.append(page.extract_text() or "")
+                    if progress_callback:
+                        progress_callback(page_num + 1, num_pages)
+            
+            empty_pages = [i for i, page_text in enumerate(pages) if not page_text.strip()]
+            if empty_pages:
+                # A pdfplumber failure keeps the pages PyPDF2 extracted; pages still empty are left to OCR
+                try:
+                    import pdfplumber
+                    with pdfplumber.open(pdf_path) as pdf:
+                        for i in empty_pages:
+                            check_cancelled()
+                            pages[i] = pdf.pages[i].extract_text() or ""
+                except OperationCancelledError:
+                    raise
+                except Exception as e:
+                    from src.logger import logger
+                    logger.warning(f"pdfplumber could not read the empty pages of {pdf_path}: {e}")
             
-            # Get the number of pages
-            num_pages = len(pdf_reader.pages)
+            # Empty pages are left to OCR, which has its own cache
+            if fingerprints:
+                page_cache.put_pages({
+                    fingerprint: page_text for fingerprint, page_text in zip(fingerprints, pages)
+                    if fingerprint not in known and page_text.strip()
+                })
             
-            # Extract text from each page
-            for page_num in range(num_pages):
-                page = pdf_reader.pages[page_num]
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n\n"  # Add spacing between pages
-                    
-        return text if text.strip() else None
+            extraction_span.set_attributes(pages=num_pages, chars=sum(len(page_text) for page_text in pages),
+                                           empty_pages=sum(1 for page_text in pages if not page_text.strip()),
+                                           reused_pages=sum(1 for fingerprint in fingerprints if fingerprint in known))
+        return pages
+    except OperationCancelledError:
+        raise
     except Exception as e:
         from src.logger import logger
         logger.error(f"Error extracting text from PDF: {e}")
         return None
 
+def join_pages(pages: List[str]) -> Optional[str]:
+    """
+    Join page texts into the document text, skipping empty pages.
+    
+    Args:
+        pages (List[str]): Text of each page
+        
+    Returns:
+        str: Document text, or None if no page has text
+    """
+    text = "".join(page_text + "\n\n" for page_text in pages if page_text)  # Add spacing between pages
+    return text if text.strip() else None
+
+def page_offsets(pages: List[str]) -> List[Tuple[int, int]]:
+    """
+    Locate each page in the text produced by join_pages.
+    
+    Args:
+        pages (List[str]): Text of each page
+        
+    Returns:
+        List[Tuple[int, int]]: (character offset, page number) of each page with text, page numbers from 1
+    """
+    offsets = []
+    position = 0
+    for number, page_text in enumerate(pages, 1):
+        if page_text:
+            offsets.append((position, number))
+            position += len(page_text) + 2
+    return offsets
+
+def extract_text_from_pdf(pdf_path: str, progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[str]:
+    """
+    Extract text from a PDF file.
+    
+    Args:
+        pdf_path (str): Path to the PDF file
+        progress_callback (Callable, optional): Called with (pages_done, total_pages) after each page
+        
+    Returns:
+        str: Extracted text from the PDF or None if extraction fails
+    """
+    pages = extract_pages_from_pdf(pdf_path, progress_callback)
+    return join_pages(pages) if pages is not None else None
+
+def chunk_text(text: str, chunk_size: int = 4000) -> List[str]:
+    """
+    Split text into contiguous chunks of roughly chunk_size characters.
+    
+    Chunks break on paragraph boundaries where possible and do not overlap,
+    so joining them reproduces the original text exactly.
+    
+    Args:
+        text (str): Text to split
+        chunk_size (int): Target maximum size of each chunk in characters
+        
+    Returns:
+        List[str]: List of text chunks
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            # Prefer to break at a paragraph, then a line, then a space
+            for separator in ("\n\n", "\n", " "):
+                split_at = text.rfind(separator, start + chunk_size // 2, end)
+                if split_at != -1:
+                    end = split_at + len(separator)
+                    break
+        chunks.append(text[start:end])
+        start = end
+    return chunks
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text without calling the model.
+    
+    Uses the common approximation of four characters per token for English text.
+    
+    Args:
+        text (str): Text to measure
+        
+    Returns:
+        int: Estimated token count
+    """
+    return (len(text) + 3) // 4
+
 def save_uploaded_file(uploaded_file) -> str:
     """
     Save an uploaded file to a temporary location.
@@ -76,23 +298,24 @@ def clean_temporary_file(file_path: str) -> bool:
         logger.error(f"Error deleting temporary file: {e}")
         return False
 
-def get_file_hash(file_path: str) -> str:
+def get_file_hash(file_path: str, algorithm: str = "md5") -> str:
     """
     Generate a hash of a file for caching purposes.
     
     Args:
         file_path (str): Path to the file
+        algorithm (str): Name of the hashlib algorithm to use
         
     Returns:
         str: Hash value of the file
     """
     try:
-        md5_hash = hashlib.md5()
+        file_hash = hashlib.new(algorithm)
         with open(file_path, "rb") as f:
-            # Read and update hash in chunks of 4K
-            for byte_block in iter(lambda: f.read(4096), b""):
-                md5_hash.update(byte_block)
-        return md5_hash.hexdigest()
+            # Read and update hash in chunks of 64K
+            for byte_block in iter(lambda: f.read(65536), b""):
+                file_hash.update(byte_block)
+        return file_hash.hexdigest()
     except Exception as e:
         from src.logger import logger
         logger.error(f"Error generating file hash: {e}")
@@ -0,0 +1,187 @@
+"""
+Process warm-up and readiness.
+
+Building the bot (model client, stores, prompt chains) and loading the
+glossary take seconds, and without warm-up the first user after a deploy or
+scale-out pays for them. warm_up runs these steps when the process starts,
+optionally sends a tiny probe request to the model to open its connection,
+and precomputes the answers to the example questions offered in the app.
+
+The process reports ready only once warm-up has finished. Readiness is served
+at /ready by the HTTP API and by the metrics server, so a load balancer or
+container health check routes traffic only to warmed processes.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from src.config import Config
+from src.glossary_matcher import get_glossary_matcher
+from src.glossary_store import get_glossary_store
+from src.legal_bot import LegalAdvisorBot
+from src.logger import logger, log_exception
+from src.metrics import READY, WARMUP_STEP_SECONDS, set_readiness_check
+
+STATE_PENDING = "pending"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+# Tiny request that opens the model connection without costing a real answer
+PROBE_PROMPT = "Reply with the single word OK."
+
+_bot = None
+_bot_lock = threading.Lock()
+
+
+def get_bot() -> LegalAdvisorBot:
+    """Return the process-wide LegalAdvisorBot, creating it on first use."""
+    global _bot
+    if _bot is None:
+        with _bot_lock:
+            if _bot is None:
+                _bot = LegalAdvisorBot()
+    return _bot
+
+
+class Readiness:
+    """Warm-up progress of this process."""
+
+    def __init__(self):
+        self.state = STATE_PENDING
+        # (step, seconds, error) of each finished step, in order
+        self.steps: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == STATE_READY
+
+    def _set_state(self, state: str, error: Optional[str] = None):
+        with self._lock:
+            self.state = state
+            if state == STATE_WARMING:
+                self.started_at = time.time()
+            elif state == STATE_READY:
+                self.ready_at = time.time()
+            if error:
+                self.error = error
+        READY.set(1 if state == STATE_READY else 0)
+
+    @contextmanager
+    def step(self, name: str, required: bool = True):
+        """
+        Time a warm-up step. A failed required step fails warm-up; other failures are only logged.
+
+        Args:
+            name (str): Step name, reported in the readiness state and metrics
+            required (bool): Whether the process can serve without this step
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            log_exception(e, context=f"warm-up step {name}")
+            if required:
+                raise
+        finally:
+            seconds = time.perf_counter() - start
+            WARMUP_STEP_SECONDS.labels(step=name).set(seconds)
+            with self._lock:
+                self.steps.append({"step": name, "seconds": round(seconds, 3), "error": error})
+            logger.info(f"Warm-up step {name} took {seconds:.2f}s" + (f" and failed: {error}" if error else ""))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Snapshot of the readiness state, served at /ready."""
+        with self._lock:
+            return {
+                "ready": self.state == STATE_READY,
+                "state": self.state,
+                "steps": list(self.steps),
+                "error": self.error,
+                "warmup_seconds": round(self.ready_at - self.started_at, 3)
+                if self.ready_at and self.started_at else None,
+            }
+
+
+_readiness = Readiness()
+set_readiness_check(_readiness.to_dict)
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def get_readiness() -> Readiness:
+    """Return the readiness state of this process."""
+    return _readiness
+
+
+def warm_up(probe: Optional[bool] = None, examples: Optional[bool] = None) -> Readiness:
+    """
+    Warm up this process and mark it ready.
+
+    Args:
+        probe (bool, optional): Send a probe request to the model; defaults to Config.WARMUP_PROBE
+        examples (bool, optional): Precompute the example answers; defaults to Config.WARMUP_EXAMPLES
+
+    Returns:
+        Readiness: The final readiness state
+    """
+    probe = Config.WARMUP_PROBE if probe is None else probe
+    examples = Config.WARMUP_EXAMPLES if examples is None else examples
+    _readiness._set_state(STATE_WARMING)
+    logger.info("Warming up")
+    try:
+        with _readiness.step("bot"):
+            bot = get_bot()
+        with _readiness.step("prompts"):
+            bot.prepare_prompts()
+        with _readiness.step("glossary"):
+            get_glossary_store()
+            get_glossary_matcher()
+        if probe:
+            # A failing probe means the model cannot be reached, so the process is not ready
+            with _readiness.step("probe"):
+                bot.llm.invoke(PROBE_PROMPT)
+        if examples:
+            # Without precomputed answers the examples still work, just at normal speed
+            for i, question in enumerate(Config.EXAMPLE_QUESTIONS):
+                with _readiness.step(f"example_{i}", required=False):
+                    bot.precompute_example(question)
+    except Exception as e:
+        _readiness._set_state(STATE_FAILED, f"{type(e).__name__}: {e}")
+        logger.error(f"Warm-up failed: {e}")
+        return _readiness
+
+    _readiness._set_state(STATE_READY)
+    logger.info(f"Warm-up complete in {_readiness.to_dict()['warmup_seconds']}s")
+    return _readiness
+
+
+def start_warm_up() -> Optional[threading.Thread]:
+    """
+    Start warm-up on a background thread. Only the first call in a process starts it.
+
+    With Config.WARMUP_ENABLED off, the process is marked ready at once and the
+    bot is built on first use.
+
+    Returns:
+        threading.Thread: The warm-up thread, or None if warm-up is disabled
+    """
+    global _thread
+    with _thread_lock:
+        if not Config.WARMUP_ENABLED:
+            if not _readiness.ready:
+                logger.info("Warm-up disabled; the bot is built on first use")
+                _readiness._set_state(STATE_READY)
+            return None
+        if _thread is None:
+            _thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+            _thread.start()
+    return _thread
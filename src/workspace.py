@@ -0,0 +1,267 @@
+"""
+Matter workspaces: many documents searched as one.
+
+A workspace holds the documents of a matter (master agreement, amendments,
+statements of work). Each page is split into passages, and passages are
+indexed in an in-memory BM25 inverted index. The index is incremental:
+adding a document appends its postings, and removing one drops only its own
+postings. Document frequencies and the average passage length are kept as
+running totals, so other documents are never re-indexed.
+
+A question retrieves the best passages across all documents. Only those
+passages are sent to the model, each labelled with its document and page so
+the answer can cite them.
+"""
+
+import math
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.logger import logger
+from src.utils import chunk_text
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall that the this to was were will with "
+    "which who whom any all such may not no".split()
+)
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words of a text, without stopwords."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+
+class Passage(NamedTuple):
+    """A span of one page of a workspace document."""
+    document_hash: str
+    document_name: str
+    page: int
+    start: int
+    end: int
+    # Kept unless the page text can be re-read from the document store
+    text: Optional[str]
+
+
+class WorkspaceDocument(NamedTuple):
+    """A document added to a workspace."""
+    document_hash: str
+    name: str
+    pages: int
+    passages: int
+    added_at: float
+
+
+class Workspace:
+    """Documents of one matter with an incremental BM25 index over their passages."""
+
+    def __init__(self, name: str = "", passage_chars: int = 1500,
+                 page_reader: Optional[Callable[[str, int], str]] = None,
+                 pin: Optional[Callable[[str], None]] = None, unpin: Optional[Callable[[str], None]] = None):
+        """
+        Create an empty workspace.
+
+        Args:
+            name (str): Display name of the matter
+            passage_chars (int): Target passage length in characters
+            page_reader (Callable, optional): Returns the text of (document hash, page number); when given,
+                passages keep offsets instead of their text, and the text is read back only for answers
+            pin (Callable, optional): Called with a document hash when the document is added, so the
+                store behind page_reader keeps its pages
+            unpin (Callable, optional): Called with a document hash when the document is removed
+        """
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.passage_chars = passage_chars
+        self.page_reader = page_reader
+        self._pin = pin
+        self._unpin = unpin
+        self.created_at = time.time()
+        self.documents: Dict[str, WorkspaceDocument] = {}
+        self._passages: Dict[int, Passage] = {}
+        self._lengths: Dict[int, int] = {}
+        # term -> {passage id: term frequency}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        # document hash -> passage ids, so a document can be removed without scanning the index
+        self._document_passages: Dict[str, List[int]] = {}
+        # Documents whose stored pages could not be read back; adding them again re-indexes them
+        self._stale = set()
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def passage_count(self) -> int:
+        return len(self._passages)
+
+    def needs_pages(self, document_hash: str) -> bool:
+        """Whether add_document would index the document, i.e. it is new or its stored pages were lost."""
+        with self._lock:
+            return document_hash not in self.documents or document_hash in self._stale
+
+    def add_document(self, document_hash: str, name: str, pages: Sequence[str],
+                     stored: bool = True) -> WorkspaceDocument:
+        """
+        Index a document's pages. Adding a document that is already present does nothing,
+        unless its stored pages could no longer be read, in which case it is indexed again.
+
+        Args:
+            document_hash (str): Content hash of the document
+            name (str): Display name used in citations
+            pages (Sequence[str]): Text of each page, empty for pages without text
+            stored (bool): Whether page_reader can read the document's pages; when not,
+                passages keep their text
+
+        Returns:
+            WorkspaceDocument: The added (or existing) document
+        """
+        with self._lock:
+            if document_hash in self.documents and document_hash not in self._stale:
+                return self.documents[document_hash]
+
+        # Tokenize outside the lock; only the postings update needs it
+        indexed = []
+        for page_number, page_text in enumerate(pages, 1):
+            start = 0
+            for chunk in chunk_text(page_text, self.passage_chars):
+                end = start + len(chunk)
+                terms = Counter(tokenize(chunk))
+                if terms:
+                    text = None if self.page_reader and stored else chunk
+                    indexed.append((Passage(document_hash, name, page_number, start, end, text), terms))
+                start = end
+
+        with self._lock:
+            if document_hash in self._stale:
+                self.remove_document(document_hash)
+            if document_hash in self.documents:
+                return self.documents[document_hash]
+            ids = []
+            for passage, terms in indexed:
+                passage_id = self._next_id
+                self._next_id += 1
+                self._passages[passage_id] = passage
+                length = sum(terms.values())
+                self._lengths[passage_id] = length
+                self._total_length += length
+                for term, frequency in terms.items():
+                    self._postings[term][passage_id] = frequency
+                ids.append(passage_id)
+            self._document_passages[document_hash] = ids
+            document = WorkspaceDocument(document_hash, name, len(pages), len(ids), time.time())
+            self.documents[document_hash] = document
+            if self._pin:
+                self._pin(document_hash)
+            return document
+
+    def remove_document(self, document_hash: str) -> bool:
+        """
+        Remove a document and its postings.
+
+        Returns:
+            bool: Whether the document was in the workspace
+        """
+        with self._lock:
+            self._stale.discard(document_hash)
+            if self.documents.pop(document_hash, None) is None:
+                return False
+            if self._unpin:
+                self._unpin(document_hash)
+            passage_ids = set(self._document_passages.pop(document_hash, []))
+            for passage_id in passage_ids:
+                del self._passages[passage_id]
+                self._total_length -= self._lengths.pop(passage_id)
+            # The removed text may no longer be readable, so find its postings from the index side
+            for term in list(self._postings):
+                postings = self._postings[term]
+                for passage_id in passage_ids & postings.keys():
+                    del postings[passage_id]
+                if not postings:
+                    del self._postings[term]
+            return True
+
+    def clear(self):
+        """Remove every document, releasing their pins."""
+        with self._lock:
+            for document_hash in list(self.documents):
+                self.remove_document(document_hash)
+
+    def _passage_text(self, passage: Passage) -> str:
+        if passage.text is not None:
+            return passage.text
+        return self.page_reader(passage.document_hash, passage.page)[passage.start:passage.end]
+
+    def search(self, query: str, limit: int = 8) -> List[Tuple[float, Passage, str]]:
+        """
+        Find the passages that best match a question, across all documents.
+
+        Args:
+            query (str): The question
+            limit (int): Maximum passages returned
+
+        Returns:
+            List[Tuple[float, Passage, str]]: (BM25 score, passage, passage text), best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._passages)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self._lengths[passage_id] / average_length)
+                    scores[passage_id] += idf * frequency * (K1 + 1) / (frequency + norm)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            passages = [(score, self._passages[passage_id]) for passage_id, score in best]
+        results = []
+        for score, passage in passages:
+            try:
+                results.append((score, passage, self._passage_text(passage)))
+            except (KeyError, IndexError):
+                # The page was pruned from the document store; adding the document again re-indexes it
+                with self._lock:
+                    if passage.document_hash in self.documents:
+                        self._stale.add(passage.document_hash)
+                logger.warning(f"Workspace passage of document {passage.document_hash[:12]} "
+                               f"page {passage.page} is no longer stored; add the document again")
+        return results
+
+
+def format_passages(results: List[Tuple[float, Passage, str]]) -> str:
+    """
+    Format retrieved passages for the prompt, each labelled for citation.
+
+    Args:
+        results (List[Tuple[float, Passage, str]]): Results of Workspace.search
+
+    Returns:
+        str: Numbered passages with their document and page
+    """
+    return "\n\n".join(
+        f"[{number}] {passage.document_name}, page {passage.page}:\n{text.strip()}"
+        for number, (_, passage, text) in enumerate(results, 1)
+    )
+
+
+def format_sources(results: List[Tuple[float, Passage, str]]) -> str:
+    """List the documents and pages the passages came from, in citation order."""
+    lines = [f"[{number}] {passage.document_name}, page {passage.page}"
+             for number, (_, passage, _) in enumerate(results, 1)]
+    return "**Sources:**\n" + "\n".join(f"- {line}" for line in lines)